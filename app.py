@@ -3,23 +3,159 @@ Backend Sistema AutoPrime - Loja de Veículos
 Porta: 8080
 """
 
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, g, request, jsonify, render_template, send_from_directory, url_for
 from werkzeug.utils import secure_filename
 from flask_cors import CORS
 import os
+import atexit
+import hashlib
+import hmac
 import json
+import math
+import mimetypes
+import sqlite3
+import tempfile
+import threading
 import time
+from dataclasses import asdict
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector.errors import InterfaceError, OperationalError, PoolError
 from contextlib import contextmanager
+from db_pool import ConnectionPool
+from cache import CarroCache, MISS, normalize_modelo
+import catalog
+from change_feed import ChangeFeed, sse_message
+from compression import AssetManifest, Compressor
+from health import CachedProbe, StartupCheck
+from json_provider import AppJSONProvider
+import metrics
+import migrations
+import price_history
+from query_stats import QueryStats
+from rate_limit import AdmissionControl, Rejected, parse_limit, parse_routes
+from repository import Carro, CarroRepository
+from resilience import CircuitBreaker, CircuitOpen, StaleResponses, UNAVAILABLE_ERRNOS
+from search_index import CarroSearchIndex, SORT_FIELDS
+from snapshot import SnapshotReader, SnapshotUnavailable
+import images
+from write_behind import WriteBehindQueue
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
+app.json = AppJSONProvider(app)
 CORS(app)
 
-# Configurações
+# Configurações (a pasta de uploads é criada no primeiro upload)
 UPLOAD_FOLDER = 'static/uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 10 * 1024 * 1024))
+
+# Rejeita corpos grandes antes de parsear o multipart (margem para os headers)
+app.config['MAX_CONTENT_LENGTH'] = UPLOAD_MAX_BYTES + 64 * 1024
+
+# Variantes (thumb/card) geradas em segundo plano
+image_worker = images.VariantWorker(max_workers=int(os.environ.get('IMAGE_WORKERS', 2)))
+
+# Paginação por cursor (keyset) e streaming da listagem
+LIST_DEFAULT_LIMIT = int(os.environ.get('LIST_DEFAULT_LIMIT', 100))
+LIST_MAX_LIMIT = int(os.environ.get('LIST_MAX_LIMIT', 1000))
+LIST_STREAM_CHUNK = int(os.environ.get('LIST_STREAM_CHUNK', 500))
+# Carga em lote (/api/bulkCarros)
+BULK_CHUNK_SIZE = int(os.environ.get('BULK_CHUNK_SIZE', 500))
+BULK_MAX_CHUNK_SIZE = int(os.environ.get('BULK_MAX_CHUNK_SIZE', 5000))
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', 50000))
+# Consulta de preços em lote (/api/getCarros)
+GETCARROS_MAX_KEYS = int(os.environ.get('GETCARROS_MAX_KEYS', 1000))
+GETCARROS_CHUNK = int(os.environ.get('GETCARROS_CHUNK', 200))
+# Busca (/api/searchCarros)
+SEARCH_DEFAULT_LIMIT = int(os.environ.get('SEARCH_DEFAULT_LIMIT', 50))
+SEARCH_MAX_LIMIT = int(os.environ.get('SEARCH_MAX_LIMIT', 500))
+# Histórico de preços (/api/precoHistorico): modelos por consulta, pontos do
+# bucket automático e máximo de pontos sem stream
+PRECO_HISTORICO_MAX_MODELOS = int(os.environ.get('PRECO_HISTORICO_MAX_MODELOS', 100))
+PRECO_HISTORICO_POINTS = int(os.environ.get('PRECO_HISTORICO_POINTS', 200))
+PRECO_HISTORICO_MAX_POINTS = int(os.environ.get('PRECO_HISTORICO_MAX_POINTS', 20000))
+# Health checks: intervalo do ping de readiness e da recontagem do /health?verbose=1
+READY_CACHE_SECONDS = float(os.environ.get('READY_CACHE_SECONDS', 2))
+HEALTH_COUNT_TTL = float(os.environ.get('HEALTH_COUNT_TTL', 30))
+# Intervalo para refazer a verificação inicial do banco quando ela falha
+STARTUP_RETRY_SECONDS = float(os.environ.get('STARTUP_RETRY_SECONDS', 5))
+# Intervalo para conferir se o feed foi reiniciado por uma carga externa (carros_io.py)
+FEED_CHECK_INTERVAL = float(os.environ.get('FEED_CHECK_INTERVAL', 1.0))
+# Por quanto tempo a versão da tabela (ETag) é reaproveitada se não houve escrita
+LIST_VERSION_TTL = float(os.environ.get('LIST_VERSION_TTL', 1.0))
+# Write-behind do updateCarro: responde 202 + ticket e aplica em lote
+WRITE_BEHIND = os.environ.get('WRITE_BEHIND', '0') == '1'
+WRITE_BEHIND_BATCH = int(os.environ.get('WRITE_BEHIND_BATCH', 500))
+WRITE_BEHIND_INTERVAL = float(os.environ.get('WRITE_BEHIND_INTERVAL', 0.5))
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.environ.get('WRITE_BEHIND_MAX_ATTEMPTS', 5))
+WRITE_BEHIND_RETENTION = float(os.environ.get('WRITE_BEHIND_RETENTION', 3600))
+# Modo somente leitura: leituras vêm de um snapshot local (sem banco)
+READ_SNAPSHOT = os.environ.get('READ_SNAPSHOT')
+SNAPSHOT_CHECK_INTERVAL = float(os.environ.get('SNAPSHOT_CHECK_INTERVAL', 1.0))
+# Stream SSE de alterações (/api/events)
+SSE_POLL_INTERVAL = float(os.environ.get('SSE_POLL_INTERVAL', 0.5))
+SSE_HEARTBEAT = float(os.environ.get('SSE_HEARTBEAT', 15))
+SSE_MAX_SECONDS = float(os.environ.get('SSE_MAX_SECONDS', 300))
+SSE_RETRY_MS = int(os.environ.get('SSE_RETRY_MS', 2000))
+# Streams SSE abertos ao mesmo tempo por worker (0 = sem limite; no modo sync
+# cada um ocupa uma thread e o gunicorn.conf.py define metade das threads)
+SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', 0))
+SSE_FULL_RETRY_AFTER = int(os.environ.get('SSE_FULL_RETRY_AFTER', 30))
+# Estatísticas de SQL por fingerprint e log de queries lentas (/debug/queries)
+QUERY_STATS_ENABLED = os.environ.get('QUERY_STATS', '1') != '0'
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+# Endpoints /debug/* só respondem com este token no header X-Debug-Token
+DEBUG_TOKEN = os.environ.get('DEBUG_TOKEN', '')
+# Compressão gzip/brotli das respostas dinâmicas acima de COMPRESS_MIN_SIZE bytes
+COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', '1') != '0'
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
+# Assets com hash no nome (build_assets.py) são imutáveis: cache de um ano
+ASSETS_MAX_AGE = 365 * 24 * 3600
+# Timeouts do banco em segundos (0 = sem limite). O de conexão, no driver puro,
+# vale também para cada leitura do socket; o de query é o max_execution_time
+# (só SELECT) e o de lock o innodb_lock_wait_timeout da sessão
+DB_CONNECT_TIMEOUT = int(os.environ.get('DB_CONNECT_TIMEOUT', 5))
+DB_QUERY_TIMEOUT = float(os.environ.get('DB_QUERY_TIMEOUT', 10))
+DB_LOCK_WAIT_TIMEOUT = int(os.environ.get('DB_LOCK_WAIT_TIMEOUT', 10))
+# Circuit breaker: abre com BREAKER_FAILURE_RATE de falhas em BREAKER_WINDOW
+# segundos (mínimo de BREAKER_MIN_CALLS chamadas) e testa de novo depois de
+# BREAKER_OPEN_SECONDS; enquanto aberto as leituras usam os últimos dados bons
+BREAKER_ENABLED = os.environ.get('BREAKER_ENABLED', '1') != '0'
+BREAKER_FAILURE_RATE = float(os.environ.get('BREAKER_FAILURE_RATE', 0.5))
+BREAKER_MIN_CALLS = int(os.environ.get('BREAKER_MIN_CALLS', 10))
+BREAKER_WINDOW = float(os.environ.get('BREAKER_WINDOW', 10))
+BREAKER_OPEN_SECONDS = float(os.environ.get('BREAKER_OPEN_SECONDS', 5))
+# Memória (por worker) para as últimas listagens boas
+STALE_MAX_BYTES = int(os.environ.get('STALE_MAX_BYTES', 64 * 1024 * 1024))
+
+# Limite por cliente: token bucket por rota (<quantidade>/<s|m|h>[:<rajada>]),
+# compartilhado entre os workers. RATE_LIMIT_ROUTES=/rota=5/s:10,... sobrescreve
+# os limites das rotas pesadas abaixo; a chave do X-API-Key só identifica o
+# cliente se estiver em RATE_LIMIT_API_KEYS, senão vale o IP (o do
+# X-Forwarded-For atrás de RATE_LIMIT_PROXY_HOPS proxies)
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') != '0'
+RATE_LIMIT_DEFAULT = os.environ.get('RATE_LIMIT_DEFAULT', '20/s:40')
+RATE_LIMIT_ROUTES = os.environ.get('RATE_LIMIT_ROUTES', '')
+RATE_LIMIT_API_KEYS = [key for key in os.environ.get('RATE_LIMIT_API_KEYS', '').split(',') if key]
+RATE_LIMIT_PROXY_HOPS = int(os.environ.get('RATE_LIMIT_PROXY_HOPS', 0))
+HEAVY_ROUTE_LIMITS = {
+    '/listarCarros': '5/s:10',
+    '/api/listarCarros': '5/s:10',
+    '/api/searchCarros': '5/s:10',
+    '/api/getCarros': '5/s:10',
+    '/api/precoHistorico': '2/s:5',
+    '/api/bulkCarros': '10/m:2',
+    '/api/uploadImage': '10/m:3',
+}
+# Máximo de requisições em andamento somando os workers; acima dele responde
+# 503 (0 = sem limite; o gunicorn.conf.py define um padrão abaixo de workers x threads)
+MAX_IN_FLIGHT = int(os.environ.get('MAX_IN_FLIGHT', 0))
+
+# Migrações do schema aplicadas pelo init_database (migrations.py)
+DB_MIGRATE = os.environ.get('DB_MIGRATE', '1') != '0'
 
 # Configuração do Banco de Dados MySQL
 DB_CONFIG = {
@@ -31,49 +167,827 @@ DB_CONFIG = {
     'charset': 'utf8mb4',
     'collation': 'utf8mb4_unicode_ci'
 }
+if DB_CONNECT_TIMEOUT:
+    DB_CONFIG['connection_timeout'] = DB_CONNECT_TIMEOUT
+
+# Timeouts aplicados em cada sessão nova (init_command)
+DB_SESSION_TIMEOUTS = ', '.join(
+    f"SESSION {name} = {value}" for name, value in (
+        ('max_execution_time', int(DB_QUERY_TIMEOUT * 1000)),
+        ('innodb_lock_wait_timeout', DB_LOCK_WAIT_TIMEOUT),
+    ) if value
+)
+if DB_SESSION_TIMEOUTS:
+    DB_CONFIG['init_command'] = f"SET {DB_SESSION_TIMEOUTS}"
+
+# Pool de conexões (um por processo, conexões criadas após o fork)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_POOL_MAX_OVERFLOW = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_POOL_PING_IDLE = float(os.environ.get('DB_POOL_PING_IDLE', 5))
+
+db_pool = ConnectionPool(
+    DB_CONFIG,
+    size=DB_POOL_SIZE,
+    max_overflow=DB_POOL_MAX_OVERFLOW,
+    timeout=DB_POOL_TIMEOUT,
+    recycle=DB_POOL_RECYCLE,
+    ping_idle=DB_POOL_PING_IDLE,
+)
+
+# Falha rápido quando o banco está fora (por processo, como o pool)
+db_breaker = CircuitBreaker(
+    failure_rate=BREAKER_FAILURE_RATE,
+    min_calls=BREAKER_MIN_CALLS,
+    window=BREAKER_WINDOW,
+    open_seconds=BREAKER_OPEN_SECONDS,
+    enabled=BREAKER_ENABLED,
+)
+# Últimas listagens boas, servidas com o circuito aberto
+stale_responses = StaleResponses(STALE_MAX_BYTES)
+
+# Cache de consultas por modelo (LRU + TTL, invalidado nas escritas)
+carro_cache = CarroCache(
+    maxsize=int(os.environ.get('CACHE_MAXSIZE', 10000)),
+    ttl=float(os.environ.get('CACHE_TTL', 60)),
+    negative_ttl=float(os.environ.get('CACHE_NEGATIVE_TTL', 10)),
+    enabled=os.environ.get('CACHE_ENABLED', '1') != '0',
+)
+
+# Snapshot mapeado antes do fork (páginas compartilhadas entre os workers)
+snapshot = SnapshotReader(READ_SNAPSHOT, check_interval=SNAPSHOT_CHECK_INTERVAL) if READ_SNAPSHOT else None
+
+# Métricas Prometheus (requisições via hooks do Flask, queries via hook do pool)
+if metrics.ENABLED:
+    db_pool.query_hooks.append(metrics.observe_query)
+metrics.install(app, db_pool)
+
+# Controle de admissão (buckets e contagem em memória compartilhada, antes do fork)
+admission = AdmissionControl(
+    parse_limit(RATE_LIMIT_DEFAULT),
+    {**{route: parse_limit(spec) for route, spec in HEAVY_ROUTE_LIMITS.items()},
+     **parse_routes(RATE_LIMIT_ROUTES)},
+    max_in_flight=MAX_IN_FLIGHT,
+    api_keys=RATE_LIMIT_API_KEYS,
+    proxy_hops=RATE_LIMIT_PROXY_HOPS,
+    enabled=RATE_LIMIT_ENABLED,
+    on_reject=metrics.observe_rejection,
+)
+
+# Agregados por fingerprint do SQL (por worker), com a rota que executou
+query_stats = QueryStats(slow_ms=SLOW_QUERY_MS, route_of=metrics.current_route, enabled=QUERY_STATS_ENABLED)
+if QUERY_STATS_ENABLED:
+    db_pool.query_hooks.append(query_stats.hook)
+
+compressor = Compressor(
+    min_size=COMPRESS_MIN_SIZE,
+    gzip_level=COMPRESS_GZIP_LEVEL,
+    brotli_quality=COMPRESS_BROTLI_QUALITY,
+    enabled=COMPRESS_ENABLED,
+)
+compressor.install(app)
+
+# Manifest do build_assets.py (vazio sem build: usa os arquivos de static/)
+asset_manifest = AssetManifest(os.path.join(app.static_folder, 'dist'))
+
+
+@app.template_global()
+def asset_url(path):
+    """URL do asset com hash (build) ou do arquivo original em static/"""
+    hashed = asset_manifest.get(path)
+    if hashed:
+        return url_for('assets', filename=hashed)
+    return url_for('static', filename=path)
+
+# Feed de alterações compartilhado pelos workers (arquivo local, append-only)
+change_feed = ChangeFeed(
+    os.environ.get('CHANGE_FEED_PATH') or os.path.join(
+        tempfile.gettempdir(), f"autoprime-{DB_CONFIG['database']}-changes.log"
+    ),
+    max_bytes=int(os.environ.get('CHANGE_FEED_MAX_BYTES', 8 * 1024 * 1024)),
+)
+
+
+def db_unavailable(e):
+    """Erro de conexão, timeout ou pool esgotado (conta no circuit breaker)"""
+    return isinstance(e, (InterfaceError, OperationalError, PoolError)) or \
+        getattr(e, 'errno', None) in UNAVAILABLE_ERRNOS
 
 
 @contextmanager
 def get_db_connection():
-    """Context manager para conexões ao banco de dados"""
-    connection = None
+    """Context manager para conexões ao banco de dados (via pool e circuit breaker)"""
+    db_breaker.allow()
+    ok = None
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        yield connection
+        start = time.perf_counter()
+        with db_pool.connection() as connection:
+            metrics.observe_checkout(time.perf_counter() - start)
+            yield connection
+        ok = True
     except Error as e:
+        # erros de SQL/dados mostram que o banco respondeu
+        ok = not db_unavailable(e)
         print(f"Erro ao conectar ao MySQL: {e}")
         raise
     finally:
-        if connection and connection.is_connected():
-            connection.close()
+        db_breaker.record(ok)
 
 
-def init_database():
-    """Verifica a conexão com o banco de dados"""
+# Acesso à tabela carro (statements preparados) usado por todas as rotas
+carro_repo = CarroRepository(get_db_connection, in_chunk=GETCARROS_CHUNK)
+
+
+def degraded(e):
+    """O erro permite responder com dados antigos (circuito aberto ou banco fora)"""
+    return isinstance(e, CircuitOpen) or (isinstance(e, Error) and db_unavailable(e))
+
+
+def mark_stale(age):
+    """Marca a resposta desta requisição como montada com dados antigos"""
+    g.stale_age = max(age, g.get('stale_age', 0))
+
+
+def stale_carro(modelo, error):
+    """Último valor conhecido do modelo no cache; sem ele, repassa o erro"""
+    stale = carro_cache.get_stale(modelo) if degraded(error) else MISS
+    if stale is MISS:
+        raise error
+    carro, age = stale
+    mark_stale(age)
+    return carro
+
+
+def init_database(verbose=True):
+    """
+    Verifica a conexão com o banco de dados e aplica as migrações pendentes.
+    Com verbose=False só avisos, erros e migrações aplicadas vão para o log.
+    """
+    if snapshot is not None:
+        if verbose:
+            print(f"✓ Modo somente leitura: snapshot '{READ_SNAPSHOT}' (versão {snapshot.stats()['version']})")
+        return
     try:
-        # Conectar ao banco de dados existente
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            print(f"✓ Conectado ao banco de dados '{DB_CONFIG['database']}'")
+        # conexão própria, fora do pool e dos timeouts de sessão das queries
+        conn = mysql.connector.connect(**migrations.session_config(DB_CONFIG))
+        try:
+            if verbose:
+                print(f"✓ Conectado ao banco de dados '{DB_CONFIG['database']}'")
+            if DB_MIGRATE:
+                if not migrations.apply_migrations(conn) and verbose:
+                    print("✓ Schema atualizado (schema_migrations)")
             
             # Verificar se a tabela existe
+            cursor = conn.cursor()
             cursor.execute("SHOW TABLES LIKE 'carro'")
             if cursor.fetchone():
-                print("✓ Tabela 'carro' encontrada")
+                if verbose:
+                    print("✓ Tabela 'carro' encontrada")
             else:
                 print("⚠ Aviso: Tabela 'carro' não encontrada no banco")
             cursor.close()
-    except Error as e:
+        finally:
+            conn.close()
+    except (Error, migrations.MigrationError) as e:
         print(f"✗ Erro ao conectar ao banco de dados: {e}")
         print(f"✗ Certifique-se que o banco '{DB_CONFIG['database']}' e a tabela 'carro' existem no MySQL")
         raise
 
 
+def validate_carro_input(modelo, preco):
+    """Valida modelo e preço; retorna (preço convertido, mensagem de erro)"""
+    if not modelo or preco is None:
+        return None, 'Modelo e preço são obrigatórios'
+    
+    # Converter preço para número
+    try:
+        preco = float(preco)
+    except (ValueError, TypeError):
+        return None, 'Preço inválido'
+    if not math.isfinite(preco):
+        return None, 'Preço inválido'
+    return preco, None
+
+
+def buscar_carro(modelo):
+    """Busca um Carro pelo modelo (read-through no cache); None se não existir"""
+    if snapshot is not None:
+        row = snapshot.get(modelo)
+        return Carro(**row) if row else None
+    sync_external_writes()
+    carro = carro_cache.get(modelo)
+    if carro is MISS:
+        generation = carro_cache.generation(modelo)
+        try:
+            carro = carro_repo.get(modelo)
+        except (CircuitOpen, Error) as e:
+            carro = stale_carro(modelo, e)
+        else:
+            carro_cache.set(modelo, carro, generation)
+    return carro
+
+
+def buscar_carros(modelos):
+    """
+    Busca vários modelos de uma vez: cache primeiro, o resto em consultas
+    WHERE modelo IN (...) de até GETCARROS_CHUNK chaves.
+    Retorna {chave normalizada: Carro ou None}.
+    """
+    chaves = {}
+    for modelo in modelos:
+        chaves.setdefault(normalize_modelo(modelo), modelo)
+    
+    if snapshot is not None:
+        rows = {chave: snapshot.get(modelo) for chave, modelo in chaves.items()}
+        return {chave: Carro(**row) if row else None for chave, row in rows.items()}
+    
+    sync_external_writes()
+    encontrados = {}
+    pendentes = []
+    for chave, modelo in chaves.items():
+        carro = carro_cache.get(modelo)
+        if carro is MISS:
+            # geração lida antes da consulta, como em buscar_carro
+            pendentes.append((chave, modelo, carro_cache.generation(modelo)))
+        else:
+            encontrados[chave] = carro
+    
+    if pendentes:
+        try:
+            encontrados.update(carro_repo.get_many([modelo for _, modelo, _ in pendentes]))
+        except (CircuitOpen, Error) as e:
+            for chave, modelo, _ in pendentes:
+                encontrados[chave] = stale_carro(modelo, e)
+            pendentes = []
+        for chave, modelo, generation in pendentes:
+            encontrados.setdefault(chave, None)
+            carro_cache.set(modelo, encontrados[chave], generation)
+    
+    return encontrados
+
+
+def notify_carro_changed(action, modelo, carro=None):
+    """
+    Propaga uma escrita já confirmada (commit) no modelo: invalida o cache e
+    publica o evento (created, updated ou deleted) no feed de alterações.
+    """
+    carro_cache.invalidate(modelo)
+    event = {'action': action, 'modelo': modelo}
+    if carro:
+        event.update((k, v) for k, v in carro.items() if k in ('id', 'preco', 'image') and v is not None)
+    try:
+        change_feed.publish(event)
+    except OSError as e:
+        print(f"Erro ao publicar alteração no feed: {e}")
+
+
+_feed_file = {'inode': None, 'checked_at': None}
+
+
+def sync_external_writes():
+    """
+    Cargas feitas por fora do app (carros_io.py) trocam o arquivo do feed:
+    ao ver outro inode, invalida o cache e a versão da tabela em todos os
+    workers. Confere no máximo a cada FEED_CHECK_INTERVAL segundos.
+    """
+    now = time.monotonic()
+    checked_at = _feed_file['checked_at']
+    if checked_at is not None and now - checked_at < FEED_CHECK_INTERVAL:
+        return
+    _feed_file['checked_at'] = now
+    try:
+        inode = os.stat(change_feed.path).st_ino
+    except OSError:
+        inode = None
+    if checked_at is not None and inode != _feed_file['inode']:
+        carro_cache.invalidate_all()
+    _feed_file['inode'] = inode
+
+
+# Escritas compartilhadas pelas rotas legadas e /api: gravam pelo repositório
+# e propagam a alteração; cada rota só monta a sua resposta
+
+def salvar_carro(modelo, preco, image=None):
+    """Insere o carro; levanta IntegrityError se o modelo já existir"""
+    carro = carro_repo.insert(modelo, preco, image)
+    notify_carro_changed('created', modelo, {'id': carro.id, 'preco': preco, 'image': image})
+    return carro
+
+
+def atualizar_preco(modelo, preco, returning=False):
+    """
+    Atualiza o preço; retorna se o modelo existia ou, com returning=True,
+    o Carro atualizado (None se não existir).
+    """
+    resultado = carro_repo.update_preco(modelo, preco, returning)
+    if resultado:
+        notify_carro_changed('updated', modelo, {'preco': preco})
+    return resultado
+
+
+def remover_carro(modelo):
+    """Remove o carro; retorna False se não existir"""
+    removido = carro_repo.delete(modelo)
+    if removido:
+        notify_carro_changed('deleted', modelo)
+    return removido
+
+
+_table_version = {'value': None, 'write_generation': None, 'expires_at': 0.0}
+
+
+def cached_table_version(generation):
+    """Versão memorizada da tabela, se ainda válida para a geração de escritas"""
+    cached = _table_version
+    if cached['value'] is not None and cached['write_generation'] == generation \
+            and time.monotonic() < cached['expires_at']:
+        return cached['value']
+    return None
+
+
+def store_table_version(total, last_modified, generation):
+    """Monta e memoriza a versão da tabela; retorna (versão, last_modified)"""
+    version = f"{total}:{last_modified.isoformat() if last_modified else '-'}:{generation}"
+    _table_version.update(value=(version, last_modified), write_generation=generation,
+                          expires_at=time.monotonic() + LIST_VERSION_TTL)
+    return version, last_modified
+
+
+def carro_table_version():
+    """
+    Versão barata da tabela carro: COUNT(*), MAX(updated_at) e o contador
+    compartilhado de escritas (que também muda com deletes).
+    Retorna (versão, last_modified).
+    """
+    sync_external_writes()
+    generation = carro_cache.write_generation()
+    cached = cached_table_version(generation)
+    if cached:
+        return cached
+    
+    total, last_modified = carro_repo.table_version()
+    return store_table_version(total, last_modified, generation)
+
+
+def list_etag(version, full_path):
+    """ETag da listagem: versão da tabela + caminho com query string"""
+    return hashlib.sha1(f"{version}|{full_path}".encode('utf-8')).hexdigest()[:20]
+
+
+def listar_carros_response():
+    """
+    Lista os carros em ordem de id.
+    Sem parâmetros devolve a tabela inteira (compatível com os clientes atuais);
+    com after_id/limit devolve uma página e o cursor da próxima nos headers
+    Link e X-Next-After-Id; com stream=json|ndjson envia as linhas em blocos.
+    Com sort/order/min_preco/max_preco/updated_since/q a listagem é sempre
+    paginada por cursor (X-Next-Cursor), usando os índices do catálogo.
+    Respostas não-streaming levam ETag e respondem 304 a If-None-Match.
+    """
+    after_id = request.args.get('after_id', type=int)
+    limit = request.args.get('limit', type=int)
+    if ('after_id' in request.args and after_id is None) or ('limit' in request.args and limit is None):
+        return jsonify({'error': 'after_id e limit devem ser inteiros'}), 400
+    if after_id is not None and after_id < 0:
+        return jsonify({'error': 'after_id inválido'}), 400
+    if limit is not None and not 1 <= limit <= LIST_MAX_LIMIT:
+        return jsonify({'error': f'limit deve estar entre 1 e {LIST_MAX_LIMIT}'}), 400
+    
+    query = None
+    if any(name in request.args for name in catalog.PARAMS):
+        if after_id is not None or 'stream' in request.args:
+            return jsonify({'error': 'Ordenação e filtros usam cursor (sem after_id ou stream)'}), 400
+        query, erro = catalog.parse_args(request.args)
+        if erro:
+            return jsonify({'error': erro}), 400
+        if snapshot is not None and (query['sort'] == 'updated_at' or query['updated_since']):
+            return jsonify({'error': 'updated_at não está disponível no modo snapshot'}), 400
+    
+    stream = request.args.get('stream')
+    if stream:
+        if stream not in ('json', 'ndjson'):
+            return jsonify({'error': 'stream deve ser json ou ndjson'}), 400
+        mimetype = 'application/json' if stream == 'json' else 'application/x-ndjson'
+        if snapshot is None and db_breaker.is_open():
+            # o stream só abre a conexão depois de enviar o status 200
+            raise CircuitOpen(db_breaker.retry_after())
+        return Response(stream_carros(after_id or 0, limit, stream), mimetype=mimetype)
+    
+    paginated = after_id is not None or limit is not None or query is not None
+    if paginated and limit is None:
+        limit = LIST_DEFAULT_LIMIT
+    
+    try:
+        # posição do feed antes da leitura: o cliente assina /api/events a partir dela
+        feed_position = change_feed.position()
+        # GET condicional: responde 304 sem buscar as linhas se nada mudou
+        if snapshot is not None:
+            version, last_modified = snapshot.table_version()
+        else:
+            version, last_modified = carro_table_version()
+        etag = list_etag(version, request.full_path)
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'no-cache'
+            response.headers['X-Change-Feed-Position'] = feed_position
+            return response
+        
+        if query is not None:
+            carros = fetch_catalog_page(query, limit + 1)
+        elif snapshot is not None:
+            # busca um a mais para saber se existe próxima página
+            carros = snapshot.page(after_id or 0, limit + 1 if paginated else None)
+        else:
+            carros = fetch_carros_page(after_id, limit, paginated)
+    except (CircuitOpen, Error) as e:
+        stale = stale_responses.get(request.full_path) if degraded(e) else None
+        if stale is not None:
+            body, headers, age = stale
+            mark_stale(age)
+            return Response(body, headers=headers), 200
+        if isinstance(e, CircuitOpen):
+            raise
+        return jsonify({'error': f'Erro no banco de dados: {str(e)}'}), 500
+    
+    has_more = paginated and len(carros) > limit
+    if has_more:
+        carros = carros[:limit]
+    
+    response = jsonify(carros)
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Change-Feed-Position'] = feed_position
+    if has_more and query is not None:
+        next_cursor = catalog.encode_cursor(carros[-1], query['sort'])
+        args = dict(request.args.items(), cursor=next_cursor, limit=limit)
+        response.headers['Link'] = f'<{url_for(request.endpoint, **args)}>; rel="next"'
+        response.headers['X-Next-Cursor'] = next_cursor
+    elif has_more:
+        next_id = carros[-1]['id']
+        next_url = url_for(request.endpoint, after_id=next_id, limit=limit)
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+        response.headers['X-Next-After-Id'] = str(next_id)
+    if snapshot is None:
+        # última versão boa desta URL, para quando o banco cair
+        stale_responses.put(request.full_path, response.get_data(),
+                            [(k, v) for k, v in response.headers.items() if k != 'Content-Length'])
+    return response, 200
+
+
+def fetch_carros_page(after_id, limit, paginated):
+    """Linhas da listagem no banco (uma a mais que limit quando paginada)"""
+    if paginated:
+        # busca um a mais para saber se existe próxima página
+        return carro_repo.page(after_id or 0, limit + 1)
+    return carro_repo.all()
+
+
+def fetch_catalog_page(query, limit):
+    """Página do catálogo (sort/filtros) no banco ou no snapshot"""
+    if snapshot is not None:
+        return snapshot.select(query, limit)
+    sql, params = catalog.build_sql(query, limit)
+    with get_db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(sql, params)
+        carros = cursor.fetchall()
+        cursor.close()
+    return carros
+
+
+def encode_stream(chunks, fmt):
+    """Serializa blocos de linhas como um array JSON ou NDJSON"""
+    if fmt == 'json':
+        yield b'['
+    separator = b''
+    for rows in chunks:
+        if fmt == 'ndjson':
+            yield b'\n'.join(map(app.json.dumpb, rows)) + b'\n'
+        else:
+            # o array do bloco sem os colchetes
+            yield separator + app.json.dumpb(rows)[1:-1]
+            separator = b','
+    if fmt == 'json':
+        yield b']\n'
+
+
+def stream_carros(after_id, limit, fmt):
+    """Gera a listagem em blocos a partir de um cursor não bufferizado"""
+    if snapshot is not None:
+        rows = snapshot.page(after_id, limit)
+        yield from encode_stream(
+            (rows[i:i + LIST_STREAM_CHUNK] for i in range(0, len(rows), LIST_STREAM_CHUNK)), fmt
+        )
+        return
+    
+    sql = "SELECT id, modelo, preco, image FROM carro WHERE id > %s ORDER BY id"
+    params = (after_id,)
+    if limit:
+        sql += " LIMIT %s"
+        params += (limit,)
+    yield from stream_query(sql, params, fmt)
+
+
+def stream_query(sql, params, fmt):
+    """Executa a consulta num cursor não bufferizado e envia as linhas em blocos"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor(dictionary=True, buffered=False)
+        try:
+            cursor.execute(sql, params)
+            yield from encode_stream(iter(lambda: cursor.fetchmany(LIST_STREAM_CHUNK), []), fmt)
+        finally:
+            if conn.unread_result:
+                # cliente desconectou no meio: descarta a conexão em vez de ler o resto
+                conn.close()
+            else:
+                cursor.close()
+
+
+# Vagas de stream SSE deste worker (as threads não são compartilhadas entre processos)
+sse_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS) if SSE_MAX_STREAMS else None
+
+
+class SSEFull(RuntimeError):
+    """Todas as vagas de stream SSE do worker estão ocupadas"""
+
+    def __init__(self):
+        self.retry_after = SSE_FULL_RETRY_AFTER
+        super().__init__(f"Limite de {SSE_MAX_STREAMS} streams de eventos por worker atingido; "
+                         f"tente em {SSE_FULL_RETRY_AFTER}s")
+
+
+def acquire_sse_slot():
+    """Reserva uma vaga de stream SSE; levanta SSEFull sem vaga. Libere com release_sse_slot()"""
+    if sse_slots is not None and not sse_slots.acquire(blocking=False):
+        raise SSEFull()
+
+
+def release_sse_slot():
+    if sse_slots is not None:
+        sse_slots.release()
+
+
+def stream_events(reader):
+    """
+    Gera o stream SSE a partir de um leitor do feed. Encerra depois de
+    SSE_MAX_SECONDS (o EventSource reconecta com Last-Event-ID).
+    """
+    yield f"retry: {SSE_RETRY_MS}\n\n".encode('utf-8')
+    deadline = time.monotonic() + SSE_MAX_SECONDS
+    last_sent = time.monotonic()
+    while time.monotonic() < deadline:
+        entries, reset = reader.poll_entries()
+        if reset:
+            # eventos podem ter sido perdidos: o cliente recarrega a lista
+            yield sse_message({'position': reader.position}, 'reset', reader.position)
+        for event_id, event in entries:
+            yield sse_message(app.json.dumps(event), event.get('action'), event_id)
+        now = time.monotonic()
+        if entries or reset:
+            last_sent = now
+        elif now - last_sent >= SSE_HEARTBEAT:
+            # comentário SSE: mantém proxies abertos e detecta clientes que saíram
+            yield b': ping\n\n'
+            last_sent = now
+        time.sleep(SSE_POLL_INTERVAL)
+
+
+def _load_search_rows(modelos=None):
+    """Linhas para o índice de busca: a tabela toda ou só os modelos pedidos"""
+    if snapshot is not None:
+        if modelos is None:
+            return snapshot.rows()
+        return [row for row in map(snapshot.get, modelos) if row]
+    carros = carro_repo.all() if modelos is None else carro_repo.get_many(list(modelos)).values()
+    # o índice guarda e completa as linhas com os eventos do feed: dicts
+    return [asdict(carro) for carro in carros]
+
+
+search_index = CarroSearchIndex(_load_search_rows, _load_search_rows, change_feed)
+if snapshot is not None:
+    snapshot.on_reload.append(search_index.invalidate)
+
+
+def _ping_database():
+    with get_db_connection() as conn:
+        conn.ping(reconnect=False)
+    return True
+
+
+def _count_carros():
+    if snapshot is not None:
+        return snapshot.stats()['count']
+    return carro_repo.count()
+
+
+def check_database():
+    """
+    Verificação inicial, em segundo plano: migrações (init_database) e uma
+    conexão já aberta no pool para a primeira requisição não esperar o connect
+    """
+    init_database(verbose=False)
+    if snapshot is None:
+        with get_db_connection():
+            pass
+
+
+# Iniciada depois do fork (post_worker_init no Gunicorn) ou pelo primeiro probe;
+# as migrações de workers concorrentes são serializadas pelo GET_LOCK
+startup_check = StartupCheck(check_database, retry=STARTUP_RETRY_SECONDS)
+
+
+def _check_ready():
+    startup_check.require()
+    if snapshot is not None:
+        return snapshot.check()
+    return _ping_database()
+
+
+readiness_probe = CachedProbe(_check_ready, READY_CACHE_SECONDS)
+startup_check.on_ready.append(readiness_probe.invalidate)
+carro_count_probe = CachedProbe(_count_carros, HEALTH_COUNT_TTL)
+
+
+# Estatísticas extras no /health (ex.: pool assíncrono do asgi.py)
+health_extras = {'startup': startup_check.stats, 'admission': admission.stats}
+if snapshot is not None:
+    health_extras['snapshot'] = snapshot.stats
+else:
+    health_extras['circuit_breaker'] = db_breaker.stats
+    health_extras['stale_responses'] = stale_responses.stats
+
+
+def apply_price_batch(items):
+    """
+    Aplica um lote da fila write-behind numa única transação.
+    items: [(chave, modelo, preço)], no máximo um por modelo.
+    Retorna {chave: 'applied' | 'not_found'}.
+    """
+    existentes = carro_repo.update_precos([(modelo, preco) for _, modelo, preco in items])
+    for chave, modelo, preco in items:
+        if chave in existentes:
+            notify_carro_changed('updated', modelo, {'preco': preco})
+    return {chave: 'applied' if chave in existentes else 'not_found' for chave, _, _ in items}
+
+
+# Journal local compartilhado pelos workers; a thread de flush sobe no primeiro request
+write_queue = None
+if WRITE_BEHIND:
+    write_queue = WriteBehindQueue(
+        os.environ.get('WRITE_BEHIND_JOURNAL') or os.path.join(
+            tempfile.gettempdir(), f"autoprime-{DB_CONFIG['database']}-writes.sqlite3"
+        ),
+        apply_price_batch,
+        batch_size=WRITE_BEHIND_BATCH,
+        interval=WRITE_BEHIND_INTERVAL,
+        max_attempts=WRITE_BEHIND_MAX_ATTEMPTS,
+        retention=WRITE_BEHIND_RETENTION,
+        # com o circuito aberto os tickets esperam (sem gastar tentativas)
+        paused=db_breaker.is_open,
+    )
+    app.before_request(write_queue.start)
+    atexit.register(write_queue.stop)
+    health_extras['write_behind'] = write_queue.stats
+
+
+def enqueue_price_update(modelo, preco):
+    """Resposta 202 com o ticket da atualização enfileirada"""
+    try:
+        ticket = write_queue.enqueue(modelo, preco)
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Erro na fila de escrita: {str(e)}'}), 500
+    status_url = url_for('api_write_status', ticket=ticket)
+    response = jsonify({'queued': True, 'ticket': ticket, 'modelo': modelo, 'preco': preco,
+                        'status_url': status_url})
+    response.headers['Location'] = status_url
+    return response, 202
+
+
+def request_data():
+    """Corpo da requisição: JSON ou form-data (as rotas legadas aceitam os dois)"""
+    if request.is_json:
+        return request.get_json()
+    return request.form
+
+
 def allowed_file(filename):
     """Verifica se a extensão do arquivo é permitida"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+# Rotas que escrevem no banco (recusadas no modo snapshot)
+WRITE_ENDPOINTS = {
+    'save_carro', 'delete_carro', 'update_carro', 'api_save_carro', 'api_update_carro',
+    'api_delete_carro', 'api_bulk_carros', 'api_upload_image',
+}
+
+
+# Fora do controle de admissão: probes, métricas e arquivos estáticos
+ADMISSION_EXEMPT_ENDPOINTS = {'static', 'assets', 'livez', 'readyz', 'health', 'metrics_endpoint', 'debug_queries'}
+# Conexões longas (SSE): limitadas por cliente, mas fora da contagem de requisições em andamento
+LONG_LIVED_ENDPOINTS = {'api_events'}
+
+
+# Atendidas antes de a verificação inicial terminar (não dependem do schema)
+STARTUP_EXEMPT_ENDPOINTS = ADMISSION_EXEMPT_ENDPOINTS | {'index'}
+
+
+@app.before_request
+def require_startup():
+    """
+    Cada worker aplica as migrações depois do fork: até a verificação inicial
+    passar, as rotas do banco respondem 503 em vez de falhar sem o schema
+    """
+    if startup_check.ready or request.endpoint in STARTUP_EXEMPT_ENDPOINTS or request.endpoint is None:
+        return
+    try:
+        startup_check.require()
+    except RuntimeError as e:
+        response = jsonify({'error': f'Servidor iniciando: {e}'})
+        response.headers['Retry-After'] = str(max(1, math.ceil(STARTUP_RETRY_SECONDS)))
+        return response, 503
+
+
+@app.before_request
+def admission_control():
+    """Token bucket do cliente na rota e limite global de requisições em andamento"""
+    if request.endpoint in ADMISSION_EXEMPT_ENDPOINTS:
+        return
+    client = admission.client_id(request.headers.get('X-API-Key'), request.remote_addr,
+                                 request.headers.get('X-Forwarded-For'))
+    track = request.endpoint not in LONG_LIVED_ENDPOINTS
+    admission.admit(metrics.current_route(), client, track)
+    g.admitted = track
+
+
+@app.after_request
+def admission_streamed(response):
+    """
+    O teardown roda antes de o corpo de um stream (listagem/histórico com
+    stream=) ser enviado: a requisição só sai da contagem quando ele fecha
+    """
+    if response.is_streamed and g.pop('admitted', False):
+        response.call_on_close(admission.done)
+    return response
+
+
+@app.teardown_request
+def admission_done(exc):
+    if g.pop('admitted', False):
+        admission.done()
+
+
+@app.errorhandler(Rejected)
+def rejected(e):
+    """429 (limite do cliente) ou 503 (servidor no limite de requisições), com Retry-After"""
+    response = jsonify({'error': str(e)})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, e.status
+
+
+@app.before_request
+def reject_writes_on_snapshot():
+    """No modo snapshot o nó é somente leitura"""
+    if snapshot is not None and request.endpoint in WRITE_ENDPOINTS:
+        return jsonify({'error': 'Nó somente leitura (snapshot): escritas não são aceitas'}), 503
+
+
+@app.errorhandler(SnapshotUnavailable)
+def snapshot_unavailable(e):
+    return jsonify({'error': str(e)}), 503
+
+
+@app.errorhandler(CircuitOpen)
+def circuit_open(e):
+    """Sem dados antigos para servir (ou escrita): falha rápido com Retry-After"""
+    response = jsonify({'error': str(e)})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+
+@app.errorhandler(SSEFull)
+def sse_full(e):
+    """Sem vaga de stream SSE no worker: 503 com Retry-After"""
+    response = jsonify({'error': str(e)})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+
+@app.after_request
+def add_stale_headers(response):
+    """Respostas montadas com dados antigos levam Warning, X-Stale e Age"""
+    age = g.get('stale_age')
+    if age is not None:
+        response.headers['Warning'] = '110 - "Response is Stale"'
+        response.headers['X-Stale'] = 'true'
+        response.headers['Age'] = str(int(age))
+    return response
+
+
 # Endpoints principais da API
 
 @app.route('/getCarro', methods=['POST'])
@@ -84,27 +998,15 @@ def get_carro():
     Entrada: modelo (string)
     Saída: preço do carro
     """
-    
-    # Aceitar tanto JSON quanto form-data para compatibilidade
-    if request.is_json:
-        data = request.get_json()
-        modelo = data.get('modelo')
-    else:
-        modelo = request.form.get('modelo')
-    
+    modelo = request_data().get('modelo')
     if not modelo:
         return jsonify({'error': 'Modelo não informado'}), 400
     
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT id, modelo, preco FROM carro WHERE modelo = %s", (modelo,))
-            carro = cursor.fetchone()
-            cursor.close()
-            
-            if carro:
-                return jsonify({'preco': float(carro['preco'])}), 200
-            return jsonify({'error': 'Carro não encontrado'}), 404
+        carro = buscar_carro(modelo)
+        if carro:
+            return jsonify({'preco': carro.preco}), 200
+        return jsonify({'error': 'Carro não encontrado'}), 404
     except Error as e:
         return jsonify({'error': f'Erro no banco de dados: {str(e)}'}), 500
 
@@ -117,35 +1019,15 @@ def save_carro():
     Entrada: modelo, preço (ex: BWM,350000)
     Saída: não tem
     """
+    data = request_data()
+    modelo = data.get('modelo')
+    preco, erro = validate_carro_input(modelo, data.get('preco'))
+    if erro:
+        return jsonify({'error': erro}), 400
     
-    # Aceitar tanto JSON quanto form-data
-    if request.is_json:
-        data = request.get_json()
-        modelo = data.get('modelo')
-        preco = data.get('preco')
-    else:
-        modelo = request.form.get('modelo')
-        preco = request.form.get('preco')
-    
-    if not modelo or preco is None:
-        return jsonify({'error': 'Modelo e preço são obrigatórios'}), 400
-    
-    # Converter preço para número
     try:
-        preco = float(preco)
-    except (ValueError, TypeError):
-        return jsonify({'error': 'Preço inválido'}), 400
-    
-    try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO carro (modelo, preco) VALUES (%s, %s)",
-                (modelo, preco)
-            )
-            conn.commit()
-            cursor.close()
-            return jsonify({'success': True, 'id': cursor.lastrowid}), 201
+        carro = salvar_carro(modelo, preco)
+        return jsonify({'success': True, 'id': carro.id}), 201
     except mysql.connector.IntegrityError:
         return jsonify({'error': 'Modelo já existe. Use updateCarro para atualizar'}), 409
     except Error as e:
@@ -160,28 +1042,14 @@ def delete_carro():
     Entrada: modelo (ex: BWM)
     Saída: não tem
     """
-    
-    # Aceitar tanto JSON quanto form-data
-    if request.is_json:
-        data = request.get_json()
-        modelo = data.get('modelo')
-    else:
-        modelo = request.form.get('modelo')
-    
+    modelo = request_data().get('modelo')
     if not modelo:
         return jsonify({'error': 'Modelo não informado'}), 400
     
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM carro WHERE modelo = %s", (modelo,))
-            conn.commit()
-            rows_affected = cursor.rowcount
-            cursor.close()
-            
-            if rows_affected > 0:
-                return jsonify({'success': True}), 200
-            return jsonify({'error': 'Carro não encontrado'}), 404
+        if remover_carro(modelo):
+            return jsonify({'success': True}), 200
+        return jsonify({'error': 'Carro não encontrado'}), 404
     except Error as e:
         return jsonify({'error': f'Erro no banco de dados: {str(e)}'}), 500
 
@@ -194,39 +1062,18 @@ def update_carro():
     Entrada: modelo, preço (ex: BWM,375000)
     Saída: não tem
     """
+    data = request_data()
+    modelo = data.get('modelo')
+    preco, erro = validate_carro_input(modelo, data.get('preco'))
+    if erro:
+        return jsonify({'error': erro}), 400
+    if write_queue is not None:
+        return enqueue_price_update(modelo, preco)
     
-    # Aceitar tanto JSON quanto form-data
-    if request.is_json:
-        data = request.get_json()
-        modelo = data.get('modelo')
-        preco = data.get('preco')
-    else:
-        modelo = request.form.get('modelo')
-        preco = request.form.get('preco')
-    
-    if not modelo or preco is None:
-        return jsonify({'error': 'Modelo e preço são obrigatórios'}), 400
-    
-    # Converter preço para número
     try:
-        preco = float(preco)
-    except (ValueError, TypeError):
-        return jsonify({'error': 'Preço inválido'}), 400
-    
-    try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "UPDATE carro SET preco = %s WHERE modelo = %s",
-                (preco, modelo)
-            )
-            conn.commit()
-            rows_affected = cursor.rowcount
-            cursor.close()
-            
-            if rows_affected > 0:
-                return jsonify({'success': True}), 200
-            return jsonify({'error': 'Carro não encontrado'}), 404
+        if atualizar_preco(modelo, preco):
+            return jsonify({'success': True}), 200
+        return jsonify({'error': 'Carro não encontrado'}), 404
     except Error as e:
         return jsonify({'error': f'Erro no banco de dados: {str(e)}'}), 500
 
@@ -236,24 +1083,10 @@ def listar_carros():
     """
     Endpoint: listarCarros
     Método: GET
-    Entrada: não tem
+    Entrada: opcional after_id, limit (paginação) e stream (json | ndjson)
     Saída: lista de carros com preços
     """
-    try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT id, modelo, preco FROM carro ORDER BY id")
-            carros = cursor.fetchall()
-            cursor.close()
-            
-            # Converter Decimal para float
-            for carro in carros:
-                if carro.get('preco'):
-                    carro['preco'] = float(carro['preco'])
-            
-            return jsonify(carros), 200
-    except Error as e:
-        return jsonify({'error': f'Erro no banco de dados: {str(e)}'}), 500
+    return listar_carros_response()
 
 
 
@@ -267,6 +1100,21 @@ def index():
     return render_template('index.html')
 
 
+@app.route('/assets/<path:filename>')
+def assets(filename):
+    """Assets do build: imutáveis, servidos já comprimidos (.br/.gz) quando aceito"""
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    served, encoding = asset_manifest.precompressed(filename, request.headers.get('Accept-Encoding'))
+    response = send_from_directory(asset_manifest.folder, served, mimetype=mimetype,
+                                   max_age=ASSETS_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
 @app.route('/api/getCarro', methods=['POST'])
 def api_get_carro():
     """Wrapper para compatibilidade com frontend - retorna objeto completo"""
@@ -278,46 +1126,97 @@ def api_get_carro():
         return jsonify([]), 200
     
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT id, modelo, preco, image FROM carro WHERE modelo = %s", (modelo,))
-            matches = cursor.fetchall()
-            cursor.close()
-            
-            for carro in matches:
-                if carro.get('preco'):
-                    carro['preco'] = float(carro['preco'])
-            
-            return jsonify(matches), 200
+        carro = buscar_carro(modelo)
+        return jsonify([carro] if carro else []), 200
     except Error as e:
         return jsonify({'error': f'Erro no banco de dados: {str(e)}'}), 500
 
 
+@app.route('/api/getCarros', methods=['POST'])
+def api_get_carros():
+    """
+    Preços de vários modelos numa requisição.
+    Entrada: {"modelos": ["Civic", "Corolla", ...]} (ou o array direto)
+    Saída: {modelo: preço ou null}, na ordem da entrada, sem repetições
+    """
+    data = request.get_json(silent=True)
+    modelos = data.get('modelos') if isinstance(data, dict) else data
+    if not isinstance(modelos, list) or not all(isinstance(m, str) and m for m in modelos):
+        return jsonify({'error': 'Informe modelos como uma lista de strings'}), 400
+    if len(modelos) > GETCARROS_MAX_KEYS:
+        return jsonify({'error': f'Máximo de {GETCARROS_MAX_KEYS} modelos por requisição'}), 413
+    
+    try:
+        carros = buscar_carros(modelos)
+    except Error as e:
+        return jsonify({'error': f'Erro no banco de dados: {str(e)}'}), 500
+    
+    precos = {}
+    for modelo in modelos:
+        if modelo not in precos:
+            carro = carros[normalize_modelo(modelo)]
+            precos[modelo] = carro.preco if carro else None
+    return jsonify(precos), 200
+
+
+@app.route('/api/precoHistorico', methods=['GET'])
+def api_preco_historico():
+    """
+    Série do preço agregada (min, max, média) por bucket de tempo.
+    Query string: modelo (repetido para vários), from e to (ISO 8601 ou
+    segundos Unix; padrão: últimos 90 dias), bucket (3600, 15m, 1h, 1d, 1w)
+    e stream (json | ndjson) para intervalos grandes.
+    Saída: [{modelo, t, min, max, avg, count}] em ordem de modelo e t;
+    duração do bucket no header X-Bucket-Seconds
+    """
+    if snapshot is not None:
+        return jsonify({'error': 'Histórico de preços não está disponível no modo snapshot'}), 503
+    query, erro = price_history.parse_args(request.args, PRECO_HISTORICO_MAX_MODELOS, PRECO_HISTORICO_POINTS)
+    if erro:
+        return jsonify({'error': erro}), 400
+    sql, params = price_history.build_sql(query)
+    
+    stream = request.args.get('stream')
+    if stream:
+        if stream not in ('json', 'ndjson'):
+            return jsonify({'error': 'stream deve ser json ou ndjson'}), 400
+        if db_breaker.is_open():
+            raise CircuitOpen(db_breaker.retry_after())
+        mimetype = 'application/json' if stream == 'json' else 'application/x-ndjson'
+        response = Response(stream_query(sql, params, stream), mimetype=mimetype)
+    else:
+        if price_history.estimated_points(query) > PRECO_HISTORICO_MAX_POINTS:
+            return jsonify({'error': f'Mais de {PRECO_HISTORICO_MAX_POINTS} pontos: '
+                                     'use um bucket maior ou stream=ndjson'}), 400
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute(sql, params)
+                pontos = cursor.fetchall()
+                cursor.close()
+        except Error as e:
+            return jsonify({'error': f'Erro no banco de dados: {str(e)}'}), 500
+        response = jsonify(pontos)
+    response.headers['X-Bucket-Seconds'] = str(query['bucket'])
+    return response, 200
+
+
 @app.route('/api/saveCarro', methods=['POST'])
 def api_save_carro():
     """Wrapper para compatibilidade com frontend"""
     
     payload = request.get_json()
     modelo = payload.get('modelo')
-    preco = payload.get('preco')
+    image = payload.get('image') or None
     
-    if not modelo or preco is None:
-        return jsonify({'error': 'Modelo e preço são obrigatórios'}), 400
+    preco, erro = validate_carro_input(modelo, payload.get('preco'))
+    if erro:
+        return jsonify({'error': erro}), 400
+    if not images.valid_image_name(image):
+        return jsonify({'error': 'Imagem inválida'}), 400
     
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute(
-                "INSERT INTO carro (modelo, preco) VALUES (%s, %s)",
-                (modelo, preco)
-            )
-            conn.commit()
-            new_id = cursor.lastrowid
-            cursor.close()
-            
-            novo_carro = {'id': new_id, 'modelo': modelo, 'preco': preco}
-            
-            return jsonify(novo_carro), 201
+        return jsonify(salvar_carro(modelo, preco, image)), 201
     except mysql.connector.IntegrityError:
         return jsonify({'error': 'Modelo já existe. Use updateCarro para atualizar'}), 409
     except Error as e:
@@ -330,34 +1229,18 @@ def api_update_carro():
     
     payload = request.get_json()
     modelo = payload.get('modelo')
-    novo_preco = payload.get('preco')
     
-    if not modelo or novo_preco is None:
-        return jsonify({'error': 'Modelo e preço são obrigatórios'}), 400
+    novo_preco, erro = validate_carro_input(modelo, payload.get('preco'))
+    if erro:
+        return jsonify({'error': erro}), 400
+    if write_queue is not None:
+        return enqueue_price_update(modelo, novo_preco)
     
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-            
-            cursor.execute(
-                "UPDATE carro SET preco = %s WHERE modelo = %s",
-                (novo_preco, modelo)
-            )
-            
-            conn.commit()
-            
-            if cursor.rowcount > 0:
-                cursor.execute("SELECT id, modelo, preco FROM carro WHERE modelo = %s", (modelo,))
-                carro = cursor.fetchone()
-                cursor.close()
-                
-                if carro and carro.get('preco'):
-                    carro['preco'] = float(carro['preco'])
-                
-                return jsonify(carro), 200
-            
-            cursor.close()
-            return jsonify({'error': 'Carro não encontrado'}), 404
+        carro = atualizar_preco(modelo, novo_preco, returning=True)
+        if carro:
+            return jsonify({'id': carro.id, 'modelo': carro.modelo, 'preco': carro.preco}), 200
+        return jsonify({'error': 'Carro não encontrado'}), 404
     except Error as e:
         return jsonify({'error': f'Erro no banco de dados: {str(e)}'}), 500
 
@@ -373,16 +1256,9 @@ def api_delete_carro():
         return jsonify({'error': 'Modelo não informado'}), 400
     
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM carro WHERE modelo = %s", (modelo,))
-            conn.commit()
-            rows_affected = cursor.rowcount
-            cursor.close()
-            
-            if rows_affected > 0:
-                return jsonify({'deleted': True}), 200
-            return jsonify({'deleted': False, 'message': 'Carro não encontrado'}), 404
+        if remover_carro(modelo):
+            return jsonify({'deleted': True}), 200
+        return jsonify({'deleted': False, 'message': 'Carro não encontrado'}), 404
     except Error as e:
         return jsonify({'error': f'Erro no banco de dados: {str(e)}'}), 500
 
@@ -390,20 +1266,232 @@ def api_delete_carro():
 @app.route('/api/listarCarros', methods=['GET'])
 def api_listar_carros():
     """Wrapper para compatibilidade com frontend"""
-    try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT id, modelo, preco FROM carro ORDER BY id")
-            carros = cursor.fetchall()
+    return listar_carros_response()
+
+
+@app.route('/api/bulkCarros', methods=['POST'])
+def api_bulk_carros():
+    """
+    Carga em lote de preços.
+    Entrada: array JSON (ou NDJSON com Content-Type application/x-ndjson) de
+    {modelo, preco, image?} (upsert) ou {op: "delete", modelo}.
+    Query string: chunk_size (itens por transação) e dry_run=1.
+    Saída: resultado por item (created, updated, deleted, not_found, invalid, error)
+    """
+    chunk_size = request.args.get('chunk_size', BULK_CHUNK_SIZE, type=int)
+    if not 1 <= chunk_size <= BULK_MAX_CHUNK_SIZE:
+        return jsonify({'error': f'chunk_size deve estar entre 1 e {BULK_MAX_CHUNK_SIZE}'}), 400
+    dry_run = request.args.get('dry_run', '0').lower() in ('1', 'true', 'yes')
+    
+    if request.mimetype == 'application/x-ndjson':
+        items = []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(None)
+    else:
+        items = request.get_json(silent=True)
+        if not isinstance(items, list):
+            return jsonify({'error': 'Envie um array de operações'}), 400
+    
+    if len(items) > BULK_MAX_ITEMS:
+        return jsonify({'error': f'Máximo de {BULK_MAX_ITEMS} operações por requisição'}), 413
+    
+    results = [None] * len(items)
+    operations = []
+    for index, item in enumerate(items):
+        op = parse_bulk_item(item)
+        if isinstance(op, str):
+            results[index] = {'index': index, 'status': 'invalid', 'error': op}
+            if isinstance(item, dict) and item.get('modelo'):
+                results[index]['modelo'] = item.get('modelo')
+        else:
+            operations.append((index, op))
+    
+    changed = {}
+    for start in range(0, len(operations), chunk_size):
+        chunk = operations[start:start + chunk_size]
+        try:
+            chunk_results = apply_bulk_chunk(chunk, dry_run)
+        except Error as e:
+            for index, op in chunk:
+                results[index] = {'index': index, 'modelo': op['modelo'], 'status': 'error',
+                                  'error': f'Erro no banco de dados: {str(e)}'}
+            continue
+        for index, op, status in chunk_results:
+            results[index] = {'index': index, 'modelo': op['modelo'], 'status': status}
+            if status in ('created', 'updated', 'deleted') and not dry_run:
+                # vale a última operação de cada modelo
+                changed.pop(op['modelo'], None)
+                changed[op['modelo']] = (status, op)
+    
+    for modelo, (status, op) in changed.items():
+        notify_carro_changed(status, modelo, op if status != 'deleted' else None)
+    
+    summary = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    
+    return jsonify({'dry_run': dry_run, 'summary': summary, 'results': results}), 200
+
+
+def parse_bulk_item(item):
+    """Valida uma operação do lote; retorna a operação ou a mensagem de erro"""
+    if not isinstance(item, dict):
+        return 'Operação inválida'
+    op = item.get('op', 'upsert')
+    modelo = item.get('modelo')
+    if modelo is not None and not isinstance(modelo, str):
+        return 'Modelo inválido'
+    
+    if op == 'delete':
+        if not modelo:
+            return 'Modelo não informado'
+        return {'op': 'delete', 'modelo': modelo}
+    if op != 'upsert':
+        return f'Operação desconhecida: {op}'
+    
+    preco, erro = validate_carro_input(modelo, item.get('preco'))
+    if erro:
+        return erro
+    image = item.get('image') or None
+    if not images.valid_image_name(image):
+        return 'Imagem inválida'
+    return {'op': 'upsert', 'modelo': modelo, 'preco': preco, 'image': image}
+
+
+def apply_bulk_chunk(chunk, dry_run):
+    """
+    Aplica um bloco de operações numa única transação.
+    Os modelos já existentes são lidos (e travados) antes, para classificar
+    cada item; sequências de operações do mesmo tipo viram um executemany.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        modelos = list({op['modelo'] for _, op in chunk})
+        placeholders = ', '.join(['%s'] * len(modelos))
+        lock = '' if dry_run else ' FOR UPDATE'
+        cursor.execute(f"SELECT modelo FROM carro WHERE modelo IN ({placeholders}){lock}", modelos)
+        existing = {normalize_modelo(row[0]) for row in cursor.fetchall()}
+        
+        results = []
+        runs = []
+        for index, op in chunk:
+            key = normalize_modelo(op['modelo'])
+            if op['op'] == 'upsert':
+                status = 'updated' if key in existing else 'created'
+                existing.add(key)
+                params = (op['modelo'], op['preco'], op['image'])
+            else:
+                status = 'deleted' if key in existing else 'not_found'
+                existing.discard(key)
+                params = (op['modelo'],) if status == 'deleted' else None
+            results.append((index, op, status))
+            if params is None:
+                continue
+            if runs and runs[-1][0] == op['op']:
+                runs[-1][1].append(params)
+            else:
+                runs.append((op['op'], [params]))
+        
+        if dry_run:
+            conn.rollback()
             cursor.close()
-            
-            for carro in carros:
-                if carro.get('preco'):
-                    carro['preco'] = float(carro['preco'])
-            
-            return jsonify(carros), 200
+            return results
+        
+        try:
+            for kind, params in runs:
+                if kind == 'upsert':
+                    cursor.executemany(
+                        "INSERT INTO carro (modelo, preco, image) VALUES (%s, %s, %s) "
+                        "ON DUPLICATE KEY UPDATE preco = VALUES(preco), image = COALESCE(VALUES(image), image)",
+                        params
+                    )
+                else:
+                    cursor.executemany("DELETE FROM carro WHERE modelo = %s", params)
+            conn.commit()
+        except Error:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+        return results
+
+
+@app.route('/api/events', methods=['GET'])
+def api_events():
+    """
+    Stream SSE das alterações (created, updated, deleted) feitas em qualquer worker.
+    Entrada: header Last-Event-ID ou last_event_id (posição do X-Change-Feed-Position)
+    Saída: eventos com id = posição no feed; 'reset' pede recarga da lista
+    """
+    position = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    acquire_sse_slot()
+    try:
+        response = Response(stream_events(change_feed.reader(position)), mimetype='text/event-stream')
+    except BaseException:
+        release_sse_slot()
+        raise
+    # chamado quando o servidor fecha a resposta, mesmo sem iterar o stream
+    response.call_on_close(release_sse_slot)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@app.route('/api/writeStatus', methods=['GET'])
+def api_write_status():
+    """
+    Estado dos tickets do write-behind.
+    Entrada: ticket (um ou mais, repetido ou separado por vírgula)
+    Saída: {tickets: [...], unknown: [...]}; 404 se nenhum for conhecido
+    """
+    if write_queue is None:
+        return jsonify({'error': 'Write-behind desativado (WRITE_BEHIND=1)'}), 404
+    tickets = [t for value in request.args.getlist('ticket') for t in value.split(',') if t]
+    if not tickets:
+        return jsonify({'error': 'Ticket não informado'}), 400
+    try:
+        found = write_queue.status(tickets)
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Erro na fila de escrita: {str(e)}'}), 500
+    known = {item['ticket'] for item in found}
+    body = {'tickets': found, 'unknown': [t for t in tickets if t not in known]}
+    return jsonify(body), 200 if found else 404
+
+
+@app.route('/api/searchCarros', methods=['GET'])
+def api_search_carros():
+    """
+    Busca por modelo ou id no índice em memória.
+    Query string: q, limit, min_preco, max_preco, sort (modelo | preco | id), order (asc | desc)
+    Saída: lista de carros (total de resultados no header X-Total-Count)
+    """
+    q = request.args.get('q', '')
+    limit = request.args.get('limit', SEARCH_DEFAULT_LIMIT, type=int)
+    min_preco = request.args.get('min_preco', type=float)
+    max_preco = request.args.get('max_preco', type=float)
+    sort = request.args.get('sort', 'modelo')
+    order = request.args.get('order', 'asc')
+    
+    if not 1 <= limit <= SEARCH_MAX_LIMIT:
+        return jsonify({'error': f'limit deve estar entre 1 e {SEARCH_MAX_LIMIT}'}), 400
+    if ('min_preco' in request.args and min_preco is None) or ('max_preco' in request.args and max_preco is None):
+        return jsonify({'error': 'Preço inválido'}), 400
+    if sort not in SORT_FIELDS or order not in ('asc', 'desc'):
+        return jsonify({'error': f'sort deve ser um de {", ".join(SORT_FIELDS)} e order asc ou desc'}), 400
+    
+    try:
+        total, carros = search_index.search(q, limit, min_preco, max_preco, sort, order == 'desc')
     except Error as e:
         return jsonify({'error': f'Erro no banco de dados: {str(e)}'}), 500
+    
+    response = jsonify(carros)
+    response.headers['X-Total-Count'] = str(total)
+    return response, 200
 
 
 @app.route('/api/uploadImage', methods=['POST'])
@@ -417,41 +1505,120 @@ def api_upload_image():
         return jsonify({'error': 'Arquivo sem nome'}), 400
     
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        # Adicionar timestamp para evitar conflitos
-        filename = f"{int(time.time())}_{filename}"
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
+        extension = secure_filename(file.filename).rsplit('.', 1)[1].lower()
+        # Nome pelo hash do conteúdo: o mesmo arquivo é gravado uma vez só
+        try:
+            filename, created = images.store_upload(file.stream, extension, UPLOAD_FOLDER, UPLOAD_MAX_BYTES)
+        except images.UploadTooLarge as e:
+            return jsonify({'error': str(e)}), 413
+        image_worker.submit(os.path.join(UPLOAD_FOLDER, filename))
+        variants, srcset = images.variant_urls(filename, '/static/uploads')
         return jsonify({
             'filename': filename,
-            'url': f"/static/uploads/{filename}"
+            'url': f"/static/uploads/{filename}",
+            'variants': variants,
+            'srcset': srcset,
+            'duplicate': not created
         }), 200
     
     return jsonify({'error': 'Tipo de arquivo não permitido'}), 400
 
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Métricas Prometheus agregadas de todos os workers"""
+    if not metrics.ENABLED:
+        return jsonify({'error': 'prometheus_client não instalado'}), 503
+    data, content_type = metrics.render()
+    return Response(data, content_type=content_type)
+
+
+@app.route('/debug/queries', methods=['GET', 'DELETE'])
+def debug_queries():
+    """
+    Estatísticas de SQL deste worker (requer o header X-Debug-Token).
+    GET: agregados por fingerprint e queries lentas recentes;
+    ?explain=<id> executa o EXPLAIN da última amostra do fingerprint.
+    DELETE: zera os agregados.
+    """
+    if not DEBUG_TOKEN or not hmac.compare_digest(request.headers.get('X-Debug-Token', ''), DEBUG_TOKEN):
+        return jsonify({'error': 'Não encontrado'}), 404
+    if request.method == 'DELETE':
+        query_stats.reset()
+        return jsonify({'reset': True, 'pid': os.getpid()}), 200
+    
+    fingerprint_id = request.args.get('explain')
+    if fingerprint_id:
+        if query_stats.sample(fingerprint_id) is None:
+            return jsonify({'error': 'Fingerprint não encontrado neste worker'}), 404
+        try:
+            with get_db_connection() as conn:
+                plan = query_stats.explain(conn, fingerprint_id)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Error as e:
+            return jsonify({'error': f'Erro no banco de dados: {str(e)}'}), 500
+        return jsonify({'id': fingerprint_id, 'pid': os.getpid(), 'explain': plan}), 200
+    
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify(dict(query_stats.snapshot(limit), pid=os.getpid(), enabled=query_stats.enabled)), 200
+
+
+@app.route('/livez')
+def livez():
+    """Liveness: o processo está respondendo (nunca consulta o banco)"""
+    return jsonify({'status': 'ok'}), 200
+
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: verificação inicial do banco concluída e ping via pool, com resultado em cache"""
+    ok, _, error, age = readiness_probe.result()
+    if ok:
+        return jsonify({'status': 'ok', 'database': 'snapshot' if snapshot is not None else 'connected',
+                        'checked_seconds_ago': age}), 200
+    return jsonify({'status': 'error', 'database': 'disconnected', 'error': error,
+                    'checked_seconds_ago': age}), 503
+
+
 @app.route('/health')
 def health():
-    """Endpoint de health check"""
-    try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) as total FROM carro")
-            result = cursor.fetchone()
-            cursor.close()
-            total = result[0] if result else 0
-            
-            return jsonify({
-                'status': 'ok',
-                'database': 'connected',
-                'carros': total
-            }), 200
-    except Error as e:
-        return jsonify({
-            'status': 'error',
-            'database': 'disconnected',
-            'error': str(e)
-        }), 500
+    """
+    Endpoint de health check (estado do banco em cache, pool e cache).
+    Com ?verbose=1 inclui o total de carros, recontado periodicamente.
+    """
+    ok, _, error, age = readiness_probe.result()
+    body = {
+        'status': 'ok' if ok else 'error',
+        'database': 'snapshot' if snapshot is not None else 'connected' if ok else 'disconnected',
+        'checked_seconds_ago': age,
+        'pool': db_pool.stats(),
+        'cache': carro_cache.stats()
+    }
+    if not ok:
+        body['error'] = error
+    for name, stats in health_extras.items():
+        body[name] = stats()
+    
+    if request.args.get('verbose', '0').lower() in ('1', 'true', 'yes'):
+        count_ok, total, count_error, count_age = carro_count_probe.result()
+        body['carros'] = total
+        body['carros_seconds_ago'] = count_age
+        if not count_ok:
+            body['carros_error'] = count_error
+        body['search'] = search_index.stats()
+    
+    return jsonify(body), 200 if ok else 500
+
+
+def warm_up():
+    """
+    Adianta o que a primeira requisição faria (mapa de rotas e templates).
+    No Gunicorn roda no master, antes do fork: os workers já nascem prontos.
+    """
+    app.url_map.update()
+    for template in ('index.html', 'login.html'):
+        app.jinja_env.get_template(template)
 
 
 if __name__ == '__main__':
@@ -459,12 +1626,14 @@ if __name__ == '__main__':
     print(f"📊 Conectando ao banco MySQL: {DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}")
     
     try:
-        init_database()
+        warm_up()
+        # o servidor sobe sem esperar o banco; /readyz responde 503 até a verificação passar
+        startup_check.on_ready.append(lambda: print("✓ Banco de dados verificado"))
+        startup_check.start()
         port = int(os.environ.get('PORT', 8080))
         print(f"\n✓ Backend AutoPrime iniciado na porta {port}")
         print(f"📍 Acesse: http://localhost:{port}\n")
         app.run(host='0.0.0.0', port=port, debug=False)
     except Exception as e:
         print(f"\n✗ Erro ao iniciar aplicação: {e}")
-        print("Verifique se o MySQL está rodando e as credenciais estão corretas.\n")
         exit(1)
\ No newline at end of file
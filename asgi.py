@@ -0,0 +1,663 @@
+"""
+ASGI entry point (modo assíncrono) para Gunicorn + Uvicorn
+
+As rotas que passam a maior parte do tempo esperando o MySQL são atendidas
+aqui com aiomysql e um pool assíncrono, então um único worker atende
+centenas de consultas concorrentes. Qualquer outra rota (health checks,
+upload, busca, lote), ou requisição que o caminho assíncrono não cobre
+(form-data, JSON inválido, paginação, streaming), é repassada ao app Flask
+para que as respostas sejam idênticas. O SQL é o mesmo do repository.py
+(o aiomysql não usa prepared statements no servidor).
+
+Uso: SERVER_MODE=async gunicorn -c gunicorn.conf.py
+"""
+
+import asyncio
+import contextvars
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import parse_qs
+
+import aiomysql
+from a2wsgi import WSGIMiddleware
+from werkzeug.http import http_date, parse_etags, quote_etag
+
+import app as backend
+import images
+import metrics
+from app import app as flask_app, carro_cache, change_feed, notify_carro_changed, validate_carro_input
+from cache import MISS
+from change_feed import sse_message
+from rate_limit import Rejected
+from repository import Carro, DELETE, INSERT, SELECT_ALL, SELECT_BY_MODELO, UPDATE_PRECO
+from resilience import CircuitOpen, UNAVAILABLE_ERRNOS
+
+ASYNC_DB_POOL_SIZE = int(os.environ.get('ASYNC_DB_POOL_SIZE', 50))
+ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 10))
+
+# sinaliza que a requisição deve ser atendida pelo app Flask
+DELEGATE = object()
+
+# rota da requisição em andamento (para as estatísticas de SQL)
+current_route = contextvars.ContextVar('current_route', default='background')
+# idade dos dados antigos usados na resposta (como g.stale_age no Flask)
+stale_age = contextvars.ContextVar('stale_age', default=None)
+
+wsgi = WSGIMiddleware(flask_app, workers=ASGI_WSGI_THREADS)
+
+_pool = None
+_pool_lock = None
+
+
+async def get_pool():
+    """Pool aiomysql do worker, criado no primeiro uso (dentro do event loop)"""
+    global _pool, _pool_lock
+    if _pool is None:
+        if _pool_lock is None:
+            _pool_lock = asyncio.Lock()
+        async with _pool_lock:
+            if _pool is None:
+                config = backend.DB_CONFIG
+                init_command = f"SET NAMES {config['charset']} COLLATE {config['collation']}"
+                if backend.DB_SESSION_TIMEOUTS:
+                    init_command += f", {backend.DB_SESSION_TIMEOUTS}"
+                _pool = await aiomysql.create_pool(
+                    host=config['host'],
+                    port=config['port'],
+                    user=config['user'],
+                    password=config['password'],
+                    db=config['database'],
+                    charset=config['charset'],
+                    init_command=init_command,
+                    connect_timeout=backend.DB_CONNECT_TIMEOUT or None,
+                    autocommit=True,
+                    minsize=0,
+                    maxsize=ASYNC_DB_POOL_SIZE,
+                    pool_recycle=backend.DB_POOL_RECYCLE,
+                )
+    return _pool
+
+
+def db_unavailable(e):
+    """Mesmo critério de app.db_unavailable para os erros do aiomysql"""
+    return isinstance(e, (aiomysql.OperationalError, aiomysql.InterfaceError)) or \
+        (bool(e.args) and e.args[0] in UNAVAILABLE_ERRNOS)
+
+
+@asynccontextmanager
+async def db_connection():
+    """Empresta uma conexão do pool assíncrono (atrás do circuit breaker do worker)"""
+    backend.db_breaker.allow()
+    ok = None
+    try:
+        pool = await get_pool()
+        try:
+            conn = await asyncio.wait_for(pool.acquire(), backend.DB_POOL_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise aiomysql.OperationalError(
+                f"Tempo esgotado aguardando conexão do pool ({backend.DB_POOL_TIMEOUT}s)"
+            )
+        try:
+            yield conn
+        finally:
+            pool.release(conn)
+        ok = True
+    except aiomysql.MySQLError as e:
+        ok = not db_unavailable(e)
+        raise
+    finally:
+        backend.db_breaker.record(ok)
+
+
+async def run(cursor, sql, params=()):
+    """cursor.execute com registro nas estatísticas de SQL (como o hook do pool)"""
+    start = time.perf_counter()
+    error = None
+    try:
+        await cursor.execute(sql, params)
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        backend.query_stats.record(sql, params, time.perf_counter() - start,
+                                   cursor.rowcount if error is None else -1, current_route.get(), error)
+
+
+async def fetchone(sql, params=()):
+    async with db_connection() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await run(cursor, sql, params)
+            return await cursor.fetchone()
+
+
+async def fetchall(sql, params=()):
+    async with db_connection() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await run(cursor, sql, params)
+            return await cursor.fetchall()
+
+
+async def execute(sql, params=()):
+    """Executa uma escrita (autocommit); retorna (rowcount, lastrowid)"""
+    async with db_connection() as conn:
+        async with conn.cursor() as cursor:
+            await run(cursor, sql, params)
+            return cursor.rowcount, cursor.lastrowid
+
+
+def stale_carro(modelo, error):
+    """Como app.stale_carro: último valor conhecido do modelo no cache; sem ele, repassa o erro"""
+    degraded = isinstance(error, CircuitOpen) or db_unavailable(error)
+    stale = carro_cache.get_stale(modelo) if degraded else MISS
+    if stale is MISS:
+        raise error
+    carro, age = stale
+    stale_age.set(max(age, stale_age.get() or 0))
+    return carro
+
+
+async def buscar_carro(modelo):
+    """Mesmo read-through de app.buscar_carro, com o driver assíncrono"""
+    backend.sync_external_writes()
+    carro = carro_cache.get(modelo)
+    if carro is MISS:
+        generation = carro_cache.generation(modelo)
+        try:
+            row = await fetchone(SELECT_BY_MODELO, (modelo,))
+        except (CircuitOpen, aiomysql.MySQLError) as e:
+            carro = stale_carro(modelo, e)
+        else:
+            carro = Carro(**row) if row else None
+            carro_cache.set(modelo, carro, generation)
+    return carro
+
+
+async def notify_changed(action, modelo, carro=None):
+    """app.notify_carro_changed numa thread: a publicação no feed grava em arquivo"""
+    await asyncio.get_running_loop().run_in_executor(None, notify_carro_changed, action, modelo, carro)
+
+
+async def carro_table_version():
+    """Mesma versão de app.carro_table_version, com o driver assíncrono"""
+    backend.sync_external_writes()
+    generation = carro_cache.write_generation()
+    cached = backend.cached_table_version(generation)
+    if cached:
+        return cached
+    row = await fetchone("SELECT COUNT(*) AS total, MAX(updated_at) AS last_modified FROM carro")
+    return backend.store_table_version(row['total'], row['last_modified'], generation)
+
+
+class Request:
+    """Requisição HTTP mínima montada a partir do scope ASGI"""
+
+    def __init__(self, scope, body, receive=None):
+        self.receive = receive
+        self.method = scope['method']
+        self.path = scope['path']
+        self.query_string = scope.get('query_string', b'').decode('latin-1')
+        self.args = {k: v[0] for k, v in parse_qs(self.query_string, keep_blank_values=True).items()}
+        self.headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope['headers']}
+        self.body = body
+
+    @property
+    def full_path(self):
+        # mesmo formato de flask.Request.full_path
+        return f"{self.path}?{self.query_string}"
+
+    @property
+    def is_json(self):
+        mimetype = self.headers.get('content-type', '').split(';')[0].strip().lower()
+        return mimetype == 'application/json' or (
+            mimetype.startswith('application/') and mimetype.endswith('+json')
+        )
+
+    def json_object(self):
+        """Corpo JSON como dict, ou DELEGATE se o Flask responderia outra coisa"""
+        if not self.is_json:
+            return DELEGATE
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            return DELEGATE
+        return data if isinstance(data, dict) else DELEGATE
+
+
+class JSONResponse:
+    """Resposta JSON serializada exatamente como o jsonify do Flask"""
+
+    def __init__(self, payload, status=200, headers=None):
+        self.body = b'' if status == 304 else flask_app.json.dumpb(payload) + b'\n'
+        self.status = status
+        self.headers = dict(headers or {})
+
+    async def __call__(self, request, send):
+        body = self.body
+        headers = []
+        vary = []
+        if self.status == 200:
+            # mesma negociação gzip/brotli do after_request do Flask
+            vary.append('Accept-Encoding')
+            body, encoding = backend.compressor.negotiate(body, 'application/json',
+                                                          request.headers.get('accept-encoding'))
+            if encoding is not None:
+                headers.append((b'content-encoding', encoding.encode()))
+        if self.status != 304:
+            headers.append((b'content-length', str(len(body)).encode()))
+        if body:
+            headers.append((b'content-type', b'application/json'))
+        for name, value in self.headers.items():
+            headers.append((name.lower().encode('latin-1'), str(value).encode('latin-1')))
+        origin = cors_origin(request)
+        headers.append((b'access-control-allow-origin', origin))
+        if origin != b'*':
+            vary.insert(0, 'Origin')
+        if vary:
+            headers.append((b'vary', ', '.join(vary).encode()))
+        await send({'type': 'http.response.start', 'status': self.status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+def cors_origin(request):
+    """Access-Control-Allow-Origin igual ao do flask_cors na configuração padrão"""
+    origin = request.headers.get('origin')
+    return origin.encode('latin-1') if origin else b'*'
+
+
+class EventStream:
+    """Resposta SSE: acompanha o feed de alterações até o cliente sair (libera a vaga SSE no fim)"""
+
+    status = 200
+
+    def __init__(self, reader):
+        self.reader = reader
+
+    async def __call__(self, request, send):
+        try:
+            await self._respond(request, send)
+        finally:
+            backend.release_sse_slot()
+
+    async def _respond(self, request, send):
+        headers = [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+            (b'access-control-allow-origin', cors_origin(request)),
+        ]
+        if request.headers.get('origin'):
+            headers.append((b'vary', b'Origin'))
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+
+        disconnected = asyncio.Event()
+
+        async def watch():
+            while (await request.receive())['type'] != 'http.disconnect':
+                pass
+            disconnected.set()
+
+        watcher = asyncio.create_task(watch())
+        try:
+            await self._stream(send, disconnected)
+        finally:
+            watcher.cancel()
+
+    async def _stream(self, send, disconnected):
+        async def emit(chunk):
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+
+        await emit(f"retry: {backend.SSE_RETRY_MS}\n\n".encode('utf-8'))
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + backend.SSE_MAX_SECONDS
+        last_sent = loop.time()
+        while not disconnected.is_set() and loop.time() < deadline:
+            # leitura do arquivo do feed fora do event loop
+            entries, reset = await loop.run_in_executor(None, self.reader.poll_entries)
+            if reset:
+                await emit(sse_message({'position': self.reader.position}, 'reset', self.reader.position))
+            for event_id, event in entries:
+                await emit(sse_message(flask_app.json.dumps(event), event.get('action'), event_id))
+            if entries or reset:
+                last_sent = loop.time()
+            elif loop.time() - last_sent >= backend.SSE_HEARTBEAT:
+                await emit(b': ping\n\n')
+                last_sent = loop.time()
+            try:
+                await asyncio.wait_for(disconnected.wait(), backend.SSE_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+        if not disconnected.is_set():
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+
+def add_stale_headers(response):
+    """Como o after_request add_stale_headers do Flask: Warning, X-Stale e Age"""
+    age = stale_age.get()
+    if age is not None and isinstance(response, JSONResponse):
+        response.headers.update({'Warning': '110 - "Response is Stale"', 'X-Stale': 'true', 'Age': int(age)})
+
+
+def db_error(e):
+    if db_unavailable(e) and backend.db_breaker.is_open():
+        # a falha abriu o circuito: o Flask responde com dados antigos ou 503
+        return DELEGATE
+    return JSONResponse({'error': f'Erro no banco de dados: {str(e)}'}, 500)
+
+
+# Endpoints principais da API
+
+async def get_carro(request):
+    data = request.json_object()
+    if data is DELEGATE:
+        return DELEGATE
+    modelo = data.get('modelo')
+    if not modelo:
+        return JSONResponse({'error': 'Modelo não informado'}, 400)
+    try:
+        carro = await buscar_carro(modelo)
+    except aiomysql.MySQLError as e:
+        return db_error(e)
+    if carro:
+        return JSONResponse({'preco': carro.preco}, 200)
+    return JSONResponse({'error': 'Carro não encontrado'}, 404)
+
+
+async def save_carro(request):
+    data = request.json_object()
+    if data is DELEGATE:
+        return DELEGATE
+    modelo = data.get('modelo')
+    preco, erro = validate_carro_input(modelo, data.get('preco'))
+    if erro:
+        return JSONResponse({'error': erro}, 400)
+    try:
+        _, new_id = await execute(INSERT, (modelo, preco, None))
+    except aiomysql.IntegrityError:
+        return JSONResponse({'error': 'Modelo já existe. Use updateCarro para atualizar'}, 409)
+    except aiomysql.MySQLError as e:
+        return db_error(e)
+    await notify_changed('created', modelo, {'id': new_id, 'preco': preco})
+    return JSONResponse({'success': True, 'id': new_id}, 201)
+
+
+async def delete_carro(request):
+    data = request.json_object()
+    if data is DELEGATE:
+        return DELEGATE
+    modelo = data.get('modelo')
+    if not modelo:
+        return JSONResponse({'error': 'Modelo não informado'}, 400)
+    try:
+        rows_affected, _ = await execute(DELETE, (modelo,))
+    except aiomysql.MySQLError as e:
+        return db_error(e)
+    if rows_affected > 0:
+        await notify_changed('deleted', modelo)
+        return JSONResponse({'success': True}, 200)
+    return JSONResponse({'error': 'Carro não encontrado'}, 404)
+
+
+async def update_carro(request):
+    data = request.json_object()
+    if data is DELEGATE:
+        return DELEGATE
+    if backend.write_queue is not None:
+        return DELEGATE  # write-behind fica no Flask
+    modelo = data.get('modelo')
+    preco, erro = validate_carro_input(modelo, data.get('preco'))
+    if erro:
+        return JSONResponse({'error': erro}, 400)
+    try:
+        rows_affected, _ = await execute(UPDATE_PRECO, (preco, modelo))
+    except aiomysql.MySQLError as e:
+        return db_error(e)
+    if rows_affected > 0:
+        await notify_changed('updated', modelo, {'preco': preco})
+        return JSONResponse({'success': True}, 200)
+    return JSONResponse({'error': 'Carro não encontrado'}, 404)
+
+
+async def api_events(request):
+    position = request.headers.get('last-event-id') or request.args.get('last_event_id')
+    try:
+        backend.acquire_sse_slot()
+    except backend.SSEFull as e:
+        return JSONResponse({'error': str(e)}, 503, {'Retry-After': e.retry_after})
+    try:
+        reader = await asyncio.get_running_loop().run_in_executor(None, change_feed.reader, position)
+        return EventStream(reader)
+    except BaseException:
+        backend.release_sse_slot()
+        raise
+
+
+async def listar_carros(request):
+    # paginação e streaming ficam com o Flask
+    if request.query_string:
+        return DELEGATE
+    try:
+        feed_position = change_feed.position()
+        version, last_modified = await carro_table_version()
+        etag = backend.list_etag(version, request.full_path)
+        headers = {'ETag': quote_etag(etag, weak=True), 'Cache-Control': 'no-cache',
+                   'X-Change-Feed-Position': feed_position}
+        if parse_etags(request.headers.get('if-none-match')).contains_weak(etag):
+            return JSONResponse(None, 304, headers)
+        carros = await fetchall(SELECT_ALL)
+    except aiomysql.MySQLError as e:
+        return db_error(e)
+
+    if last_modified:
+        headers['Last-Modified'] = http_date(last_modified)
+    response = JSONResponse(carros, 200, headers)
+    backend.stale_responses.put(request.full_path, response.body,
+                                dict(headers, **{'Content-Type': 'application/json'}))
+    return response
+
+
+# Endpoints do frontend
+
+async def api_get_carro(request):
+    data = request.json_object()
+    if data is DELEGATE:
+        return DELEGATE
+    modelo = data.get('modelo')
+    if not modelo:
+        return JSONResponse([], 200)
+    try:
+        carro = await buscar_carro(modelo)
+    except aiomysql.MySQLError as e:
+        return db_error(e)
+    return JSONResponse([carro] if carro else [], 200)
+
+
+async def api_save_carro(request):
+    payload = request.json_object()
+    if payload is DELEGATE:
+        return DELEGATE
+    modelo = payload.get('modelo')
+    image = payload.get('image') or None
+    preco, erro = validate_carro_input(modelo, payload.get('preco'))
+    if erro:
+        return JSONResponse({'error': erro}, 400)
+    if not images.valid_image_name(image):
+        return JSONResponse({'error': 'Imagem inválida'}, 400)
+    try:
+        _, new_id = await execute(INSERT, (modelo, preco, image))
+    except aiomysql.IntegrityError:
+        return JSONResponse({'error': 'Modelo já existe. Use updateCarro para atualizar'}, 409)
+    except aiomysql.MySQLError as e:
+        return db_error(e)
+    await notify_changed('created', modelo, {'id': new_id, 'preco': preco, 'image': image})
+    return JSONResponse(Carro(new_id, modelo, preco, image), 201)
+
+
+async def api_update_carro(request):
+    payload = request.json_object()
+    if payload is DELEGATE:
+        return DELEGATE
+    if backend.write_queue is not None:
+        return DELEGATE  # write-behind fica no Flask
+    modelo = payload.get('modelo')
+    novo_preco, erro = validate_carro_input(modelo, payload.get('preco'))
+    if erro:
+        return JSONResponse({'error': erro}, 400)
+    try:
+        async with db_connection() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await run(cursor, UPDATE_PRECO, (novo_preco, modelo))
+                if cursor.rowcount == 0:
+                    return JSONResponse({'error': 'Carro não encontrado'}, 404)
+                await notify_changed('updated', modelo, {'preco': novo_preco})
+                await run(cursor, SELECT_BY_MODELO, (modelo,))
+                carro = await cursor.fetchone()
+    except aiomysql.MySQLError as e:
+        return db_error(e)
+    if carro is None:
+        return JSONResponse({'error': 'Carro não encontrado'}, 404)
+    return JSONResponse({k: carro[k] for k in ('id', 'modelo', 'preco')}, 200)
+
+
+async def api_delete_carro(request):
+    data = request.json_object()
+    if data is DELEGATE:
+        return DELEGATE
+    modelo = data.get('modelo')
+    if not modelo:
+        return JSONResponse({'error': 'Modelo não informado'}, 400)
+    try:
+        rows_affected, _ = await execute(DELETE, (modelo,))
+    except aiomysql.MySQLError as e:
+        return db_error(e)
+    if rows_affected > 0:
+        await notify_changed('deleted', modelo)
+        return JSONResponse({'deleted': True}, 200)
+    return JSONResponse({'deleted': False, 'message': 'Carro não encontrado'}, 404)
+
+
+def pool_stats():
+    """Estatísticas do pool assíncrono deste worker"""
+    if _pool is None:
+        return {'pid': os.getpid(), 'mode': 'async', 'open': 0, 'idle': 0, 'in_use': 0,
+                'maxsize': ASYNC_DB_POOL_SIZE}
+    return {
+        'pid': os.getpid(),
+        'mode': 'async',
+        'open': _pool.size,
+        'idle': _pool.freesize,
+        'in_use': _pool.size - _pool.freesize,
+        'maxsize': _pool.maxsize,
+    }
+
+
+ROUTES = {
+    ('POST', '/getCarro'): get_carro,
+    ('POST', '/saveCarro'): save_carro,
+    ('POST', '/deleteCarro'): delete_carro,
+    ('POST', '/updateCarro'): update_carro,
+    ('GET', '/listarCarros'): listar_carros,
+    ('POST', '/api/getCarro'): api_get_carro,
+    ('POST', '/api/saveCarro'): api_save_carro,
+    ('POST', '/api/updateCarro'): api_update_carro,
+    ('POST', '/api/deleteCarro'): api_delete_carro,
+    ('GET', '/api/listarCarros'): listar_carros,
+    ('GET', '/api/events'): api_events,
+}
+
+# /health, /readyz e /livez ficam com o Flask (probes em cache); o pool
+# assíncrono deste worker aparece no /health
+backend.health_extras['async_pool'] = pool_stats
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    return body
+
+
+def replay(body):
+    """receive() que reentrega o corpo já lido ao app WSGI"""
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        return {'type': 'http.disconnect'}
+    return receive
+
+
+async def lifespan(receive, send):
+    global _pool
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if _pool is not None:
+                _pool.close()
+                await _pool.wait_closed()
+                _pool = None
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """Aplicação ASGI: rotas assíncronas com fallback para o Flask"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+
+    handler = ROUTES.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+    if (handler is None or backend.snapshot is not None or backend.db_breaker.is_open()
+            or not backend.startup_check.ready):
+        # no modo snapshot não há banco: o Flask lê do arquivo mapeado;
+        # com o circuito aberto o Flask serve dados antigos ou 503, e antes
+        # de as migrações terminarem responde 503 (before_request require_startup)
+        await wsgi(scope, receive, send)
+        return
+
+    body = await read_body(receive)
+    request = Request(scope, body, receive)
+    current_route.set(request.path)
+    start = time.perf_counter()
+    metrics.track_in_progress(request.path, 1)
+    # mesmo controle de admissão do before_request do Flask (SSE fora da contagem)
+    client = backend.admission.client_id(request.headers.get('x-api-key'), (scope.get('client') or ('',))[0],
+                                         request.headers.get('x-forwarded-for'))
+    tracked = handler is not api_events
+    try:
+        try:
+            backend.admission.admit(request.path, client, tracked)
+        except Rejected as e:
+            tracked = False
+            response = JSONResponse({'error': str(e)}, e.status, {'Retry-After': e.retry_after})
+        else:
+            try:
+                response = await handler(request)
+            except CircuitOpen:
+                response = DELEGATE
+        if response is DELEGATE:
+            # o Flask admite de novo e registra as métricas dessa requisição
+            backend.admission.refund(request.path, client)
+            if tracked:
+                tracked = False
+                backend.admission.done()
+            await wsgi(scope, replay(body), send)
+            return
+        add_stale_headers(response)
+        await response(request, send)
+        metrics.observe_request(request.path, request.method, response.status, time.perf_counter() - start)
+    finally:
+        if tracked:
+            backend.admission.done()
+        metrics.track_in_progress(request.path, -1)
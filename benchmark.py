@@ -0,0 +1,594 @@
+#!/usr/bin/env python3
+"""
+Benchmark de carga dos endpoints de carro
+
+Roda totalmente offline contra um MySQL/MariaDB local (container ou binário):
+
+    # 1. banco local descartável (qualquer MySQL 8 / MariaDB 10.6+)
+    docker run -d --name autoprime-bench -p 3307:3306 -e MYSQL_ROOT_PASSWORD=root mariadb:11
+
+    # 2. popular a tabela carro do banco do benchmark (BENCH_DB_NAME, padrão
+    #    carros_bench; schema aplicado pelo migrations.py). Com linhas na
+    #    tabela o seed recusa apagar sem --force
+    DB_PORT=3307 python benchmark.py seed --rows 100000
+
+    # 3. subir o app com o gunicorn.conf.py e medir
+    DB_PORT=3307 python benchmark.py run --concurrency 1,8,32 --duration 20 --out bench/atual.json
+
+    # 4. comparar duas execuções (ex.: release anterior x atual)
+    python benchmark.py compare bench/anterior.json bench/atual.json
+
+    # micro-benchmark da serialização JSON da listagem (sem banco)
+    python benchmark.py json --rows 100000
+
+    # linhas como dict (cursor dictionary) x Carro com __slots__ (sem banco)
+    python benchmark.py rows --rows 100000
+
+    # startup: tempo de import do app e até a primeira resposta
+    # (python app.py, Gunicorn e, com --exe, o executável do build_executable.py)
+    python benchmark.py startup --repeat 5 --exe dist/AutoPrime
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': int(os.environ.get('DB_PORT', 3306)),
+    'user': os.environ.get('DB_USER', 'root'),
+    'password': os.environ.get('DB_PASSWORD', 'root'),
+}
+# banco próprio: o seed apaga as tabelas e a carga escreve nelas (nunca o DB_NAME do app)
+DB_NAME = os.environ.get('BENCH_DB_NAME', 'carros_bench')
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# peso de cada operação no mix padrão
+DEFAULT_MIX = 'getCarro=60,listarCarros=10,saveCarro=10,updateCarro=15,deleteCarro=5'
+
+SEED_MODELO = 'Bench {:07d}'
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+# Seed
+
+def seed(args):
+    import mysql.connector
+
+    import migrations
+
+    print(f"🌱 Populando '{DB_NAME}.carro' com {args.rows} linhas em {DB_CONFIG['host']}:{DB_CONFIG['port']}")
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{DB_NAME}` "
+                   "CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+    cursor.execute(f"USE `{DB_NAME}`")
+    # mesmo schema do app (idempotente: roda de novo sem erro num banco já migrado)
+    migrations.apply_migrations(conn)
+    cursor.execute("SELECT 1 FROM carro LIMIT 1")
+    if cursor.fetchone() is not None and not args.force:
+        print(f"✗ '{DB_NAME}.carro' já tem linhas; use --force para apagá-las (ou outro BENCH_DB_NAME)")
+        cursor.close()
+        conn.close()
+        return 1
+    # sem os triggers durante a carga: o histórico recebe um ponto por carro no fim
+    migrations.drop_history_triggers(cursor)
+    cursor.execute("TRUNCATE TABLE carro")
+    cursor.execute("TRUNCATE TABLE carro_preco_historico")
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    batch = []
+    for i in range(args.rows):
+        batch.append((SEED_MODELO.format(i), round(rng.uniform(20000, 2000000), 2)))
+        if len(batch) >= args.batch:
+            cursor.executemany("INSERT INTO carro (modelo, preco) VALUES (%s, %s)", batch)
+            conn.commit()
+            batch = []
+            print(f"   {i + 1}/{args.rows}", end='\r', flush=True)
+    if batch:
+        cursor.executemany("INSERT INTO carro (modelo, preco) VALUES (%s, %s)", batch)
+        conn.commit()
+    migrations.backfill_history(cursor)
+    migrations.create_history_triggers(cursor)
+    conn.commit()
+    cursor.execute("ANALYZE TABLE carro")
+    cursor.fetchall()
+    cursor.close()
+    conn.close()
+    print(f"\n   ✓ {args.rows} linhas em {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+# Carga
+
+class Client:
+    """Cliente HTTP por thread (reaproveita a conexão quando o servidor permite)"""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method, path, payload=None):
+        body = json.dumps(payload) if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                if response.getheader('Connection', '').lower() == 'close':
+                    self.conn.close()
+                    self.conn = None
+                return response.status, data
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+
+class Workload:
+    """Gera as operações do mix sobre os modelos semeados"""
+
+    def __init__(self, rows, mix, list_mode, rng):
+        self.rows = max(rows, 1)
+        self.list_mode = list_mode
+        self.rng = rng
+        self.created = []
+        names, weights = [], []
+        for part in mix.split(','):
+            name, weight = part.split('=')
+            names.append(name.strip())
+            weights.append(float(weight))
+        self.names = names
+        self.weights = weights
+
+    def modelo(self):
+        # distribuição enviesada: poucos modelos "quentes" recebem mais tráfego
+        index = min(int(self.rng.paretovariate(1.2)) - 1, self.rows - 1)
+        return SEED_MODELO.format((index * 7919) % self.rows)
+
+    def next(self):
+        name = self.rng.choices(self.names, self.weights)[0]
+        if name == 'getCarro':
+            return name, 'POST', '/api/getCarro', {'modelo': self.modelo()}
+        if name == 'listarCarros':
+            if self.list_mode == 'full':
+                return name, 'GET', '/api/listarCarros', None
+            after_id = self.rng.randrange(self.rows)
+            return name, 'GET', f'/api/listarCarros?after_id={after_id}&limit=100', None
+        if name == 'saveCarro':
+            modelo = f"Bench novo {os.getpid()}-{threading.get_ident()}-{self.rng.getrandbits(48)}"
+            self.created.append(modelo)
+            return name, 'POST', '/api/saveCarro', {'modelo': modelo, 'preco': round(self.rng.uniform(20000, 2000000), 2)}
+        if name == 'updateCarro':
+            return name, 'POST', '/api/updateCarro', {'modelo': self.modelo(), 'preco': round(self.rng.uniform(20000, 2000000), 2)}
+        if name == 'deleteCarro':
+            # apaga só o que o próprio benchmark criou
+            modelo = self.created.pop() if self.created else 'Bench inexistente'
+            return name, 'POST', '/api/deleteCarro', {'modelo': modelo}
+        raise ValueError(f"Operação desconhecida no mix: {name}")
+
+
+def run_level(base_url, concurrency, duration, warmup, rows, mix, list_mode, seed_value, timeout):
+    """Executa um nível de concorrência e devolve as estatísticas por endpoint"""
+    samples = {}
+    errors = {}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + warmup + duration
+    measure_from = time.perf_counter() + warmup
+
+    def worker(n):
+        client = Client(base_url, timeout)
+        workload = Workload(rows, mix, list_mode, random.Random(seed_value * 1000 + n))
+        local, local_errors = {}, {}
+        while True:
+            name, method, path, payload = workload.next()
+            start = time.perf_counter()
+            if start >= stop_at:
+                break
+            try:
+                status, _ = client.request(method, path, payload)
+                ok = status < 500
+            except (OSError, http.client.HTTPException):
+                ok = False
+            elapsed = time.perf_counter() - start
+            if start < measure_from:
+                continue
+            local.setdefault(name, []).append(elapsed)
+            if not ok:
+                local_errors[name] = local_errors.get(name, 0) + 1
+        with lock:
+            for name, values in local.items():
+                samples.setdefault(name, []).extend(values)
+            for name, count in local_errors.items():
+                errors[name] = errors.get(name, 0) + count
+
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    endpoints = {}
+    total = 0
+    for name, values in sorted(samples.items()):
+        values.sort()
+        total += len(values)
+        endpoints[name] = {
+            'requests': len(values),
+            'errors': errors.get(name, 0),
+            'rps': round(len(values) / duration, 2),
+            'p50_ms': round(percentile(values, 50) * 1000, 3),
+            'p95_ms': round(percentile(values, 95) * 1000, 3),
+            'p99_ms': round(percentile(values, 99) * 1000, 3),
+            'max_ms': round(values[-1] * 1000, 3),
+        }
+    return {'concurrency': concurrency, 'rps': round(total / duration, 2), 'endpoints': endpoints}
+
+
+def wait_ready(base_url, timeout=30):
+    client = Client(base_url, 2)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            status, _ = client.request('GET', '/livez')
+            if status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Servidor não respondeu em {base_url}/livez")
+
+
+def start_server(port, mode):
+    # o app sobe no banco do benchmark, o mesmo do seed
+    env = dict(os.environ, PORT=str(port), SERVER_MODE=mode, DB_NAME=DB_NAME)
+    # a carga vem de um só IP: sem rate limit nem limite de requisições em andamento
+    env.setdefault('RATE_LIMIT_ENABLED', '0')
+    env.setdefault('MAX_IN_FLIGHT', '0')
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--access-logfile', '/dev/null'],
+        cwd=ROOT, env=env,
+    )
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    server = None
+    base_url = args.url
+    if not base_url:
+        base_url = f"http://127.0.0.1:{args.port}"
+        print(f"🚀 Subindo Gunicorn ({args.mode}) em {base_url}")
+        server = start_server(args.port, args.mode)
+    try:
+        wait_ready(base_url)
+        levels = []
+        for concurrency in [int(c) for c in args.concurrency.split(',')]:
+            print(f"⏱  concorrência {concurrency}: {args.duration}s (+{args.warmup}s de aquecimento)")
+            result = run_level(base_url, concurrency, args.duration, args.warmup, args.rows,
+                               args.mix, args.list_mode, args.seed, args.timeout)
+            levels.append(result)
+            for name, stats in result['endpoints'].items():
+                print(f"   {name:<14} {stats['rps']:>9.1f} req/s  p50 {stats['p50_ms']:>8.2f}ms  "
+                      f"p95 {stats['p95_ms']:>8.2f}ms  p99 {stats['p99_ms']:>8.2f}ms  erros {stats['errors']}")
+            print(f"   {'total':<14} {result['rps']:>9.1f} req/s")
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+
+    report = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'git_revision': git_revision(),
+        'server_mode': args.mode if not args.url else None,
+        'url': base_url,
+        'rows': args.rows,
+        'mix': args.mix,
+        'list_mode': args.list_mode,
+        'duration': args.duration,
+        'levels': levels,
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Resultado salvo em {args.out}")
+
+
+def compare(args):
+    with open(args.before, encoding='utf-8') as f:
+        before = json.load(f)
+    with open(args.after, encoding='utf-8') as f:
+        after = json.load(f)
+    before_levels = {level['concurrency']: level for level in before['levels']}
+    for level in after['levels']:
+        old = before_levels.get(level['concurrency'])
+        if old is None:
+            continue
+        print(f"concorrência {level['concurrency']}:")
+        for name, stats in level['endpoints'].items():
+            previous = old['endpoints'].get(name)
+            if not previous:
+                continue
+            deltas = []
+            for key in ('rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+                change = (stats[key] - previous[key]) / previous[key] * 100 if previous[key] else 0.0
+                deltas.append(f"{key} {previous[key]:.2f} → {stats[key]:.2f} ({change:+.1f}%)")
+            print(f"   {name:<14} " + '  '.join(deltas))
+
+
+# Serialização JSON
+
+def json_bench(args):
+    """Serializa uma listagem de N linhas (preço Decimal) nos caminhos antigo e novo"""
+    from decimal import Decimal
+
+    from flask import Flask
+    from flask.json.provider import DefaultJSONProvider
+
+    import json_provider
+
+    rng = random.Random(args.seed)
+    rows = [
+        {'id': i, 'modelo': SEED_MODELO.format(i),
+         'preco': Decimal(rng.randrange(1_000_000, 100_000_000)) / 100,
+         'image': None if i % 3 else f'{i:064x}.webp'}
+        for i in range(1, args.rows + 1)
+    ]
+
+    app = Flask(__name__)
+    default = DefaultJSONProvider(app)
+
+    def legacy():
+        # como era: float() linha a linha e o provider padrão do Flask
+        carros = [dict(row) for row in rows]
+        for carro in carros:
+            if carro.get('preco'):
+                carro['preco'] = float(carro['preco'])
+        return default.dumps(carros).encode('utf-8')
+
+    cases = [('flask padrão + float()', legacy),
+             (f'AppJSONProvider ({json_provider.BACKEND})', lambda: json_provider.dumpb(rows))]
+    if json_provider.orjson is not None:
+        encoder = json.JSONEncoder(default=json_provider._default, ensure_ascii=False, separators=(',', ':'))
+        cases.append(('AppJSONProvider (json, fallback)', lambda: encoder.encode(rows).encode('utf-8')))
+
+    print(f"🧪 Serializando {args.rows} linhas, {args.repeat} repetições")
+    baseline = None
+    for name, func in cases:
+        size = len(func())
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        best = min(timings) * 1000
+        baseline = baseline or best
+        print(f"   {name:<36} {best:9.1f} ms  {size / 1024 / 1024:6.2f} MiB  {baseline / best:5.1f}x")
+
+
+# Linhas tipadas
+
+def rows_bench(args):
+    """Monta N linhas como dict (cursor dictionary) e como Carro: tempo e memória"""
+    import tracemalloc
+    from decimal import Decimal
+
+    from repository import Carro
+
+    rng = random.Random(args.seed)
+    columns = ('id', 'modelo', 'preco', 'image')
+    raw = [
+        (i, SEED_MODELO.format(i), Decimal(rng.randrange(1_000_000, 100_000_000)) / 100,
+         None if i % 3 else f'{i:064x}.webp')
+        for i in range(1, args.rows + 1)
+    ]
+    cases = [('dict (cursor dictionary)', lambda: [dict(zip(columns, row)) for row in raw]),
+             ('Carro (__slots__)', lambda: [Carro(*row) for row in raw])]
+
+    print(f"🧪 Montando {args.rows} linhas, {args.repeat} repetições")
+    baseline = None
+    for name, func in cases:
+        tracemalloc.start()
+        rows = func()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del rows
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        best = min(timings) * 1000
+        baseline = baseline or best
+        print(f"   {name:<36} {best:9.1f} ms  {size / 1024 / 1024:6.2f} MiB  {baseline / best:5.1f}x")
+
+
+# Startup
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def import_times():
+    """Um import do app num processo novo: (total em ms, {módulo de 1º nível: ms})"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    total, modules = None, {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative = int(match.group(2)) / 1000
+        if match.group(4) == 'app' and len(match.group(3)) == 1:
+            total = cumulative
+        elif len(match.group(3)) == 3:
+            # importados direto pelo app (indentação de um nível)
+            modules[match.group(4)] = cumulative
+    return total, modules
+
+
+def time_to_first_request(command, port, timeout, ready_timeout):
+    """Sobe o comando e mede (ms até o /livez responder 200, ms até o /readyz)"""
+    env = dict(os.environ, PORT=str(port))
+    start = time.perf_counter()
+    server = subprocess.Popen(command, cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    client = Client(f"http://127.0.0.1:{port}", 1)
+    try:
+        first = poll_status(client, '/livez', start + timeout, server)
+        ready = None
+        if first is not None:
+            ready = poll_status(client, '/readyz', time.perf_counter() + ready_timeout, server)
+        return tuple(None if t is None else round((t - start) * 1000, 1) for t in (first, ready))
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def poll_status(client, path, deadline, server):
+    """Instante (perf_counter) da primeira resposta 200 em path; None se não veio"""
+    while time.perf_counter() < deadline and server.poll() is None:
+        try:
+            status, _ = client.request('GET', path)
+            if status == 200:
+                return time.perf_counter()
+        except OSError:
+            pass
+        time.sleep(0.01)
+    return None
+
+
+def startup(args):
+    print(f"🧪 Import do app: {args.repeat} processos")
+    runs = [import_times() for _ in range(args.repeat)]
+    totals = sorted(total for total, _ in runs)
+    print(f"   import app    mín {totals[0]:8.1f} ms  mediana {totals[len(totals) // 2]:8.1f} ms")
+    _, modules = min(runs, key=lambda run: run[0])
+    for name, ms in sorted(modules.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"   {name:<24} {ms:8.1f} ms")
+
+    targets = [('python app.py', [sys.executable, 'app.py']),
+               (f'gunicorn ({args.workers} workers)',
+                [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--workers', str(args.workers),
+                 '--access-logfile', '/dev/null'])]
+    if args.exe:
+        targets.append((os.path.basename(args.exe), [os.path.abspath(args.exe)]))
+
+    print(f"\n⏱  Até a primeira resposta (/livez) e o readiness (/readyz), {args.repeat} execuções")
+    for name, command in targets:
+        first, ready = [], []
+        for _ in range(args.repeat):
+            livez, readyz = time_to_first_request(command, args.port, args.timeout, args.ready_timeout)
+            if livez is None:
+                break
+            first.append(livez)
+            if readyz is not None:
+                ready.append(readyz)
+        if not first:
+            print(f"   {name:<24} não respondeu em {args.timeout}s")
+            continue
+        first.sort()
+        ready.sort()
+        line = f"   {name:<24} livez mín {first[0]:8.1f} ms  mediana {first[len(first) // 2]:8.1f} ms"
+        if ready:
+            line += f"  readyz mediana {ready[len(ready) // 2]:8.1f} ms"
+        else:
+            line += "  readyz sem resposta 200 (banco indisponível?)"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dos endpoints de carro')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('seed', help='cria o schema e popula a tabela carro')
+    p.add_argument('--rows', type=int, default=10000)
+    p.add_argument('--batch', type=int, default=5000)
+    p.add_argument('--seed', type=int, default=42)
+    p.add_argument('--force', action='store_true', help='apaga as linhas que já estão na tabela carro')
+    p.set_defaults(func=seed)
+
+    p = sub.add_parser('run', help='executa a carga e mede latência/throughput')
+    p.add_argument('--url', help='servidor já em execução, apontado para o BENCH_DB_NAME '
+                                 '(a carga cria, altera e apaga carros; senão sobe o Gunicorn)')
+    p.add_argument('--port', type=int, default=8099)
+    p.add_argument('--mode', choices=('sync', 'async'), default='sync')
+    p.add_argument('--rows', type=int, default=10000, help='linhas semeadas (mesmo valor do seed)')
+    p.add_argument('--concurrency', default='1,8,32')
+    p.add_argument('--duration', type=float, default=20)
+    p.add_argument('--warmup', type=float, default=3)
+    p.add_argument('--mix', default=DEFAULT_MIX)
+    p.add_argument('--list-mode', choices=('page', 'full'), default='page')
+    p.add_argument('--timeout', type=float, default=30)
+    p.add_argument('--seed', type=int, default=42)
+    p.add_argument('--out', help='arquivo JSON de saída')
+    p.set_defaults(func=run)
+
+    p = sub.add_parser('compare', help='compara dois resultados JSON')
+    p.add_argument('before')
+    p.add_argument('after')
+    p.set_defaults(func=compare)
+
+    p = sub.add_parser('json', help='micro-benchmark da serialização JSON da listagem')
+    p.add_argument('--rows', type=int, default=100000)
+    p.add_argument('--repeat', type=int, default=5)
+    p.add_argument('--seed', type=int, default=42)
+    p.set_defaults(func=json_bench)
+
+    p = sub.add_parser('rows', help='micro-benchmark das linhas dict x Carro (__slots__)')
+    p.add_argument('--rows', type=int, default=100000)
+    p.add_argument('--repeat', type=int, default=5)
+    p.add_argument('--seed', type=int, default=42)
+    p.set_defaults(func=rows_bench)
+
+    p = sub.add_parser('startup', help='tempo de import e até a primeira resposta')
+    p.add_argument('--repeat', type=int, default=5)
+    p.add_argument('--top', type=int, default=10, help='módulos mais lentos listados')
+    p.add_argument('--port', type=int, default=8098)
+    p.add_argument('--workers', type=int, default=2)
+    p.add_argument('--exe', help='executável do build_executable.py (ex.: dist/AutoPrime)')
+    p.add_argument('--timeout', type=float, default=30, help='espera máxima pelo /livez')
+    p.add_argument('--ready-timeout', type=float, default=10, help='espera máxima pelo /readyz')
+    p.set_defaults(func=startup)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
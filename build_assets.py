@@ -0,0 +1,81 @@
+"""
+Build dos assets estáticos do frontend
+
+Copia static/css e static/js para static/dist com o hash do conteúdo no nome
+(ex.: css/styles.3f2a9c1b7d4e.css), grava os irmãos .gz e .br (se o módulo
+brotli estiver instalado) e o manifest.json que o app usa para montar as URLs
+em /assets/, servidas com cache de um ano.
+
+Uso: python build_assets.py [--clean]
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+from compression import brotli
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC = os.path.join(ROOT, 'static')
+DIST = os.path.join(STATIC, 'dist')
+SOURCES = ('css', 'js')
+
+
+def hashed_name(path, data):
+    base, ext = os.path.splitext(path)
+    return f"{base}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def build(clean=False):
+    if clean and os.path.isdir(DIST):
+        shutil.rmtree(DIST)
+
+    manifest = {}
+    for folder in SOURCES:
+        for dirpath, _, filenames in os.walk(os.path.join(STATIC, folder)):
+            for filename in sorted(filenames):
+                source = os.path.join(dirpath, filename)
+                relative = os.path.relpath(source, STATIC).replace(os.sep, '/')
+                with open(source, 'rb') as f:
+                    data = f.read()
+                target = hashed_name(relative, data)
+                manifest[relative] = target
+
+                target_path = os.path.join(DIST, target)
+                write(target_path, data)
+                write(target_path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+                sizes = f"{len(data)} B, gz {os.path.getsize(target_path + '.gz')} B"
+                if brotli is not None:
+                    write(target_path + '.br', brotli.compress(data, quality=11))
+                    sizes += f", br {os.path.getsize(target_path + '.br')} B"
+                print(f"✓ {relative} -> dist/{target} ({sizes})")
+
+    # o manifest por último: o app só enxerga o build completo
+    write(os.path.join(DIST, 'manifest.json'), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    if brotli is None:
+        print("⚠ Módulo brotli não instalado: gerados apenas os arquivos .gz")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera os assets com hash e pré-comprimidos')
+    parser.add_argument('--clean', action='store_true', help='apaga static/dist antes do build')
+    args = parser.parse_args()
+    build(clean=args.clean)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -28,6 +28,7 @@ def main():
         '--hidden-import=flask',
         '--hidden-import=flask_cors',
         '--hidden-import=werkzeug',
+        '--noupx',                      # bibliotecas sem UPX: nada a descomprimir a cada execução
         '--clean',                      # Limpar cache
         '--noconfirm',                  # Sobrescrever sem perguntar
         'app.py'
@@ -0,0 +1,175 @@
+"""
+Cache em memória (LRU + TTL) das consultas de carro por modelo
+
+Cada worker tem o seu próprio cache, mas todos compartilham um vetor de
+gerações em memória compartilhada (criado antes do fork pelo preload_app).
+Uma escrita incrementa a geração do slot do modelo e qualquer entrada
+gravada com uma geração anterior passa a ser ignorada em todos os workers.
+Entradas vencidas pelo TTL ficam no LRU até serem substituídas: get_stale()
+as devolve quando o banco está indisponível.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+
+MISS = object()
+
+
+def normalize_modelo(modelo):
+    """Normaliza o modelo aproximando a collation utf8mb4_unicode_ci"""
+    decomposed = unicodedata.normalize('NFKD', str(modelo))
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return stripped.casefold().rstrip(' ')
+
+
+class CarroCache:
+    """Cache LRU com TTL, cache negativo e invalidação entre workers"""
+
+    def __init__(self, maxsize=10000, ttl=60.0, negative_ttl=10.0, slots=4096,
+                 enabled=True):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.enabled = enabled
+        self._slots = slots
+        # gerações por slot e contador global de escritas (memória compartilhada)
+        self._generations = multiprocessing.Array('Q', slots)
+        self._writes = multiprocessing.Value('Q', 0)
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._negative_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._stale = 0
+        self._invalidations = 0
+        self._served_stale = 0
+
+    def _slot(self, key):
+        return zlib.crc32(key.encode('utf-8')) % self._slots
+
+    def generation(self, modelo):
+        """Geração atual do modelo; leia ANTES de consultar o banco"""
+        return self._generations[self._slot(normalize_modelo(modelo))]
+
+    def write_generation(self):
+        """Total de escritas já notificadas (compartilhado entre workers)"""
+        return self._writes.value
+
+    def get(self, modelo):
+        """Retorna o valor em cache (None = não existe) ou MISS"""
+        if not self.enabled:
+            return MISS
+        key = normalize_modelo(modelo)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return MISS
+            value, expires_at, slot, generation, _ = entry
+            if self._generations[slot] != generation:
+                del self._entries[key]
+                self._stale += 1
+                self._misses += 1
+                return MISS
+            if time.monotonic() >= expires_at:
+                # mantida como último valor conhecido (get_stale)
+                self._expirations += 1
+                self._misses += 1
+                return MISS
+            self._entries.move_to_end(key)
+            if value is None:
+                self._negative_hits += 1
+            else:
+                self._hits += 1
+            return value
+
+    def get_stale(self, modelo):
+        """(valor, idade em segundos) ignorando o TTL, ou MISS; só para o banco fora do ar"""
+        if not self.enabled:
+            return MISS
+        key = normalize_modelo(modelo)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+            value, _, slot, generation, stored_at = entry
+            if self._generations[slot] != generation:
+                return MISS
+            self._served_stale += 1
+        return value, time.monotonic() - stored_at
+
+    def set(self, modelo, value, generation):
+        """Armazena o resultado de uma consulta feita na geração informada"""
+        if not self.enabled:
+            return
+        key = normalize_modelo(modelo)
+        slot = self._slot(key)
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (value, now + ttl, slot, generation, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, modelo):
+        """Invalida o modelo em todos os workers; chame DEPOIS do commit"""
+        key = normalize_modelo(modelo)
+        slot = self._slot(key)
+        with self._generations.get_lock():
+            self._generations[slot] += 1
+        with self._writes.get_lock():
+            self._writes.value += 1
+        with self._lock:
+            self._entries.pop(key, None)
+            self._invalidations += 1
+
+    def invalidate_all(self):
+        """Invalida todos os modelos em todos os workers (carga feita por fora do app)"""
+        with self._generations.get_lock():
+            for slot in range(self._slots):
+                self._generations[slot] += 1
+        with self._writes.get_lock():
+            self._writes.value += 1
+        with self._lock:
+            self._entries.clear()
+            self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Contadores do cache deste processo"""
+        with self._lock:
+            lookups = self._hits + self._negative_hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self._hits,
+                'negative_hits': self._negative_hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'stale': self._stale,
+                'invalidations': self._invalidations,
+                'served_stale': self._served_stale,
+                'hit_ratio': round((self._hits + self._negative_hits) / lookups, 4) if lookups else 0.0,
+                'write_generation': self._writes.value,
+            }
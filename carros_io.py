@@ -0,0 +1,551 @@
+#!/usr/bin/env python3
+"""
+Importação e exportação em massa da tabela carro
+
+    python carros_io.py import catalogo.csv              CSV com cabeçalho modelo,preco[,image]
+    python carros_io.py import carros.json               array JSON (ex.: o carros.json)
+    python carros_io.py import - --format ndjson < x     NDJSON pela entrada padrão
+    python carros_io.py export --format csv --out carros.csv
+
+A importação lê o arquivo em fluxo e grava em lotes de --batch linhas, cada
+lote um INSERT multi-linhas (executemany) numa transação; com --load-data o
+lote vai por LOAD DATA LOCAL INFILE para uma tabela temporária e entra na
+carro com um INSERT ... SELECT (exige local_infile=ON no servidor; se o
+LOAD DATA for recusado a importação para com erro, sem cair para INSERT). A
+memória usada é a de um lote, qualquer que seja o tamanho do arquivo.
+
+Linhas inválidas, ou recusadas pelo banco (o lote que falha é refeito linha a
+linha), vão para o arquivo de rejeitadas (NDJSON com linha, erro e dados) e
+não interrompem a carga. Saída: 0 = tudo gravado, 2 = houve rejeitadas,
+1 = erro fatal.
+
+A exportação usa um cursor não bufferizado (as linhas vêm do servidor em
+blocos) e grava num arquivo temporário trocado com os.replace no final.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from decimal import Decimal, InvalidOperation
+
+import mysql.connector
+
+from change_feed import ChangeFeed
+from images import valid_image_name
+
+FORMATS = ('csv', 'ndjson', 'json')
+EXTENSIONS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.json': 'json'}
+
+# limites das colunas da tabela carro
+MODELO_MAX = 255
+PRECO_MAX = Decimal('9999999999.99')
+# maior item aceito num array JSON (o leitor guarda só o item em andamento)
+JSON_ITEM_MAX = 1024 * 1024
+
+UPSERT_SQL = (
+    "INSERT INTO carro (modelo, preco, image) VALUES (%s, %s, %s) "
+    "ON DUPLICATE KEY UPDATE preco = VALUES(preco), image = COALESCE(VALUES(image), image)"
+)
+# modo insert: modelos existentes ficam como estão
+INSERT_SQL = "INSERT INTO carro (modelo, preco, image) VALUES (%s, %s, %s) ON DUPLICATE KEY UPDATE id = id"
+
+# LOAD DATA LOCAL recusado (local_infile desligado no servidor ou no cliente):
+# nenhuma linha tem culpa, então não adianta refazer o lote linha a linha
+LOAD_DATA_ERRNOS = {1148, 2068, 3948}
+
+STAGING_SQL = """
+    CREATE TEMPORARY TABLE IF NOT EXISTS carro_import (
+        seq INT AUTO_INCREMENT PRIMARY KEY,
+        modelo VARCHAR(255) NOT NULL,
+        preco DECIMAL(12, 2) NOT NULL,
+        image VARCHAR(500)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+LOAD_SQL = (
+    "LOAD DATA LOCAL INFILE %s INTO TABLE carro_import CHARACTER SET utf8mb4 "
+    "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' (modelo, preco, image)"
+)
+MERGE_SQL = {
+    'upsert': (
+        "INSERT INTO carro (modelo, preco, image) "
+        "SELECT modelo, preco, image FROM carro_import ORDER BY seq "
+        "ON DUPLICATE KEY UPDATE preco = VALUES(preco), image = COALESCE(VALUES(image), carro.image)"
+    ),
+    'insert': (
+        "INSERT INTO carro (modelo, preco, image) "
+        "SELECT modelo, preco, image FROM carro_import ORDER BY seq "
+        "ON DUPLICATE KEY UPDATE id = carro.id"
+    ),
+}
+
+EXPORT_SQL = "SELECT id, modelo, preco, image FROM carro ORDER BY id"
+EXPORT_COLUMNS = ('id', 'modelo', 'preco', 'image')
+
+
+def db_config(**extra):
+    config = {
+        'host': os.environ.get('DB_HOST', 'localhost'),
+        'port': int(os.environ.get('DB_PORT', 3306)),
+        'database': os.environ.get('DB_NAME', 'carros'),
+        'user': os.environ.get('DB_USER', 'root'),
+        'password': os.environ.get('DB_PASSWORD', 'root'),
+        'charset': 'utf8mb4',
+        'collation': 'utf8mb4_unicode_ci'
+    }
+    config.update(extra)
+    return config
+
+
+def detect_format(path, fmt):
+    if fmt:
+        return fmt
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+# Leitura em fluxo: (número da linha ou do item, registro ou o texto ilegível)
+
+def read_csv(f):
+    reader = csv.DictReader(f)
+    if reader.fieldnames is None or not {'modelo', 'preco'} <= set(reader.fieldnames):
+        raise ValueError('o CSV precisa de cabeçalho com as colunas modelo e preco')
+    for record in reader:
+        yield reader.line_num, record
+
+
+def read_ndjson(f):
+    for number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, line.rstrip('\n')
+
+
+def read_json_array(f, chunk_size=64 * 1024):
+    """Itens de um array JSON lidos aos pedaços (sem carregar o arquivo inteiro)"""
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+    started = False
+    number = 0
+    # depois de um item vem ',' ou ']'; depois de '[' ou ',' vem um item
+    after_item = False
+    after_comma = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        data = f.read(chunk_size)
+        if not data:
+            eof = True
+        buf = buf[pos:] + data
+        pos = 0
+
+    while True:
+        while pos < len(buf) and buf[pos].isspace():
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                raise ValueError('array JSON incompleto' if started else 'arquivo JSON vazio')
+            fill()
+            continue
+        char = buf[pos]
+        if not started:
+            if char != '[':
+                raise ValueError('o arquivo JSON deve conter um array')
+            started = True
+            pos += 1
+            continue
+        if char == ']':
+            if after_comma:
+                raise ValueError(f'vírgula sobrando depois do item {number}')
+            pos += 1
+            break
+        if after_item:
+            if char != ',':
+                raise ValueError(f'esperado , ou ] depois do item {number}')
+            after_item = False
+            after_comma = True
+            pos += 1
+            continue
+        if char == ',':
+            raise ValueError(f'item {number + 1} vazio')
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except ValueError:
+            # item incompleto no buffer; um item enorme é tratado como inválido
+            if eof or len(buf) - pos > JSON_ITEM_MAX:
+                raise ValueError(f'JSON inválido no item {number + 1}')
+            fill()
+            continue
+        if end == len(buf) and not eof:
+            # um número pode continuar no próximo pedaço
+            fill()
+            continue
+        number += 1
+        pos = end
+        after_item = True
+        after_comma = False
+        yield number, item
+
+    # depois do ']' só espaços
+    while True:
+        if buf[pos:].strip():
+            raise ValueError('conteúdo depois do fim do array JSON')
+        if eof:
+            return
+        pos = len(buf)
+        fill()
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson, 'json': read_json_array}
+
+
+def parse_row(record):
+    """(modelo, preço, imagem) do registro; levanta ValueError com o motivo"""
+    if not isinstance(record, dict):
+        raise ValueError('registro inválido')
+    modelo = record.get('modelo')
+    if not isinstance(modelo, str) or not modelo.strip():
+        raise ValueError('modelo não informado')
+    if len(modelo) > MODELO_MAX:
+        raise ValueError(f'modelo com mais de {MODELO_MAX} caracteres')
+
+    preco = record.get('preco')
+    if preco is None or preco == '' or isinstance(preco, bool):
+        raise ValueError('preço não informado')
+    try:
+        preco = Decimal(str(preco).strip())
+    except InvalidOperation:
+        raise ValueError('preço inválido')
+    if not preco.is_finite() or not 0 <= preco <= PRECO_MAX:
+        raise ValueError('preço inválido')
+
+    image = record.get('image') or None
+    if not valid_image_name(image):
+        raise ValueError('imagem inválida')
+    return modelo, preco, image
+
+
+class Progress:
+    """Relatório periódico (stderr) de linhas lidas, gravadas e rejeitadas"""
+
+    def __init__(self, interval, total_bytes=None, position=None, label='lidas'):
+        self.interval = interval
+        self.total_bytes = total_bytes
+        self.position = position
+        self.label = label
+        self.started = time.monotonic()
+        self.next_report = self.started + interval
+        self.read = 0
+        self.written = 0
+        self.rejected = 0
+
+    def line(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        text = (f"{self.read} {self.label}, {self.written} gravadas, {self.rejected} rejeitadas, "
+                f"{self.read / elapsed:,.0f} linhas/s")
+        if self.total_bytes and self.position is not None:
+            text += f", {min(100.0, 100.0 * self.position() / self.total_bytes):.1f}%"
+        return text
+
+    def tick(self):
+        if self.interval and time.monotonic() >= self.next_report:
+            print(f"… {self.line()}", file=sys.stderr, flush=True)
+            self.next_report = time.monotonic() + self.interval
+
+
+class Rejects:
+    """Arquivo NDJSON das linhas rejeitadas, aberto só na primeira"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def add(self, number, error, record):
+        if self._file is None:
+            self._file = open(self.path, 'w', encoding='utf-8')
+        entry = {'line': number, 'error': str(error), 'data': record}
+        self._file.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def tsv_value(value):
+    """Campo no formato padrão do LOAD DATA (\\N = NULL, com escapes)"""
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+class LoadDataUnavailable(RuntimeError):
+    """O servidor (ou o driver) não aceitou o LOAD DATA LOCAL INFILE"""
+
+
+class Importer:
+    """Grava lotes de linhas válidas, isolando as recusadas pelo banco"""
+
+    def __init__(self, connection, mode, load_data, rejects, progress):
+        self.connection = connection
+        self.mode = mode
+        self.load_data = load_data
+        self.rejects = rejects
+        self.progress = progress
+        self.cursor = connection.cursor()
+        if load_data:
+            self.cursor.execute(STAGING_SQL)
+
+    def _write_many(self, rows):
+        if not self.load_data:
+            self.cursor.executemany(UPSERT_SQL if self.mode == 'upsert' else INSERT_SQL, rows)
+            return
+        fd, path = tempfile.mkstemp(suffix='.tsv')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+                for row in rows:
+                    f.write('\t'.join(map(tsv_value, row)) + '\n')
+            self.cursor.execute("DELETE FROM carro_import")
+            self.cursor.execute(LOAD_SQL, (path,))
+            self.cursor.execute(MERGE_SQL[self.mode])
+        finally:
+            os.unlink(path)
+
+    def flush(self, batch):
+        """Grava o lote [(número, registro, linha)] numa transação"""
+        if not batch:
+            return
+        try:
+            self._write_many([row for _, _, row in batch])
+            self.connection.commit()
+            self.progress.written += len(batch)
+            return
+        except mysql.connector.Error as e:
+            self.connection.rollback()
+            if getattr(e, 'errno', None) in (2006, 2013, 2055):
+                raise  # conexão perdida: não adianta refazer linha a linha
+            if self.load_data and getattr(e, 'errno', None) in LOAD_DATA_ERRNOS:
+                raise LoadDataUnavailable(str(e)) from e
+        # alguma linha foi recusada: refaz uma a uma para achar qual
+        sql = UPSERT_SQL if self.mode == 'upsert' else INSERT_SQL
+        for number, record, row in batch:
+            try:
+                self.cursor.execute(sql, row)
+                self.connection.commit()
+                self.progress.written += 1
+            except mysql.connector.Error as e:
+                self.connection.rollback()
+                self.rejects.add(number, e, record)
+                self.progress.rejected += 1
+
+    def close(self):
+        self.cursor.close()
+
+
+def import_file(args):
+    fmt = detect_format(args.path, args.format)
+    if fmt is None:
+        print("✗ Informe --format (csv, ndjson ou json): extensão desconhecida", file=sys.stderr)
+        return 1
+
+    if args.path == '-':
+        raw = sys.stdin.buffer
+        total_bytes = None
+    else:
+        raw = open(args.path, 'rb')
+        total_bytes = os.fstat(raw.fileno()).st_size
+    text = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='' if fmt == 'csv' else None)
+    rejects_path = args.rejects or (
+        'rejeitadas.ndjson' if args.path == '-' else f"{args.path}.rejeitadas.ndjson"
+    )
+    rejects = Rejects(rejects_path)
+    position = (lambda: raw.tell()) if total_bytes else None
+    progress = Progress(args.progress, total_bytes, position)
+
+    connection = None
+    importer = None
+    try:
+        if not args.dry_run:
+            connection = mysql.connector.connect(**db_config(allow_local_infile=args.load_data))
+            importer = Importer(connection, args.mode, args.load_data, rejects, progress)
+
+        batch = []
+        for number, record in READERS[fmt](text):
+            progress.read += 1
+            try:
+                row = parse_row(record)
+            except ValueError as e:
+                rejects.add(number, e, record)
+                progress.rejected += 1
+            else:
+                if importer is None:
+                    progress.written += 1
+                else:
+                    batch.append((number, record, row))
+                    if len(batch) >= args.batch:
+                        importer.flush(batch)
+                        batch = []
+            progress.tick()
+        if importer is not None:
+            importer.flush(batch)
+    except ValueError as e:
+        print(f"✗ Arquivo inválido: {e}", file=sys.stderr)
+        return 1
+    except LoadDataUnavailable as e:
+        print(f"✗ --load-data indisponível: {e} ({progress.line()})", file=sys.stderr)
+        print("  Habilite local_infile=ON no servidor ou importe sem --load-data", file=sys.stderr)
+        return 1
+    except mysql.connector.Error as e:
+        print(f"✗ Erro no banco de dados: {e} ({progress.line()})", file=sys.stderr)
+        return 1
+    finally:
+        progress.position = None
+        rejects.close()
+        if importer is not None:
+            importer.close()
+        if connection is not None:
+            connection.close()
+        text.detach()
+        if raw is not sys.stdin.buffer:
+            raw.close()
+        # também depois de um erro: os lotes já confirmados precisam chegar aos workers
+        if not args.dry_run and progress.written:
+            reset_change_feed()
+
+    verbo = 'validadas' if args.dry_run else 'gravadas'
+    print(f"✓ Importação concluída: {progress.line().replace('gravadas', verbo)}", file=sys.stderr)
+    if progress.rejected:
+        print(f"⚠ Rejeitadas em {rejects_path}", file=sys.stderr)
+    return 2 if progress.rejected else 0
+
+
+def reset_change_feed():
+    """
+    Avisa o app local para recarregar do banco: o feed trocado por um
+    arquivo novo invalida o cache por modelo e a versão da tabela
+    (app.sync_external_writes) e recarrega a busca e os clientes SSE
+    """
+    path = os.environ.get('CHANGE_FEED_PATH') or os.path.join(
+        tempfile.gettempdir(), f"autoprime-{os.environ.get('DB_NAME', 'carros')}-changes.log"
+    )
+    if os.path.exists(path):
+        ChangeFeed(path).reset()
+    else:
+        # sem feed ainda: criá-lo também conta como troca para os workers
+        open(path, 'ab').close()
+
+
+# Exportação
+
+def export_rows(cursor, fmt, out, progress, chunk):
+    if fmt == 'csv':
+        writer = csv.writer(out, lineterminator='\n')
+        writer.writerow(EXPORT_COLUMNS)
+    elif fmt == 'json':
+        out.write('[')
+    first = True
+    while True:
+        rows = cursor.fetchmany(chunk)
+        if not rows:
+            break
+        for row in rows:
+            if fmt == 'csv':
+                writer.writerow(['' if v is None else v for v in row])
+                continue
+            item = json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False,
+                              separators=(',', ':'), default=float)
+            if fmt == 'ndjson':
+                out.write(item + '\n')
+            else:
+                out.write(('\n' if first else ',\n') + item)
+                first = False
+        progress.read += len(rows)
+        progress.written += len(rows)
+        progress.tick()
+    if fmt == 'json':
+        out.write('\n]\n')
+
+
+def export_file(args):
+    fmt = args.format or detect_format(args.out, None) or 'ndjson'
+    to_stdout = args.out == '-'
+    progress = Progress(args.progress, label='lidas')
+    out = None
+    tmp_path = None
+    try:
+        connection = mysql.connector.connect(**db_config())
+    except mysql.connector.Error as e:
+        print(f"✗ Erro ao conectar ao banco de dados: {e}", file=sys.stderr)
+        return 1
+    try:
+        if to_stdout:
+            out = sys.stdout
+        else:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(args.out)),
+                                            prefix='.carros-export-')
+            out = os.fdopen(fd, 'w', encoding='utf-8', newline='')
+        cursor = connection.cursor(buffered=False)
+        try:
+            cursor.execute(EXPORT_SQL)
+            export_rows(cursor, fmt, out, progress, args.batch)
+        finally:
+            cursor.close()
+        if not to_stdout:
+            out.close()
+            os.replace(tmp_path, args.out)
+            tmp_path = None
+    except mysql.connector.Error as e:
+        print(f"✗ Erro no banco de dados: {e} ({progress.line()})", file=sys.stderr)
+        return 1
+    finally:
+        if tmp_path is not None:
+            if out is not None and not out.closed:
+                out.close()
+            os.unlink(tmp_path)
+        connection.close()
+
+    destino = 'stdout' if to_stdout else args.out
+    print(f"✓ {progress.read} carros exportados em {destino} ({fmt})", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Importação e exportação em massa da tabela carro')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('import', help='carrega CSV, NDJSON ou array JSON na tabela carro')
+    p.add_argument('path', help="arquivo de entrada ('-' = entrada padrão)")
+    p.add_argument('--format', choices=FORMATS, help='padrão: pela extensão do arquivo')
+    p.add_argument('--mode', choices=('upsert', 'insert'), default='upsert',
+                   help='insert mantém os modelos que já existem')
+    p.add_argument('--batch', type=int, default=5000, help='linhas por transação')
+    p.add_argument('--load-data', action='store_true',
+                   help='usa LOAD DATA LOCAL INFILE (exige local_infile=ON no servidor)')
+    p.add_argument('--rejects', help='arquivo das rejeitadas (padrão: <arquivo>.rejeitadas.ndjson)')
+    p.add_argument('--dry-run', action='store_true', help='só valida, sem conectar ao banco')
+    p.add_argument('--progress', type=float, default=2.0, help='segundos entre relatórios (0 = nenhum)')
+    p.set_defaults(func=import_file)
+
+    p = sub.add_parser('export', help='grava a tabela carro em CSV, NDJSON ou JSON')
+    p.add_argument('--out', default='-', help="arquivo de saída ('-' = saída padrão)")
+    p.add_argument('--format', choices=FORMATS, help='padrão: pela extensão ou ndjson')
+    p.add_argument('--batch', type=int, default=5000, help='linhas por leitura do cursor')
+    p.add_argument('--progress', type=float, default=2.0, help='segundos entre relatórios (0 = nenhum)')
+    p.set_defaults(func=export_file)
+
+    args = parser.parse_args(argv)
+    if args.batch < 1:
+        parser.error('--batch deve ser positivo')
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
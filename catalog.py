@@ -0,0 +1,203 @@
+"""
+Consultas do catálogo com ordenação e filtros (listarCarros)
+
+Cada ordenação tem o seu índice (criados em migrations.py) e a paginação é
+por cursor sobre (valor da ordenação, id), então cada página é um range
+scan no índice, sem OFFSET nem filesort:
+
+    sort=id          PRIMARY
+    sort=preco       idx_preco_id (preco, id)      + filtro min_preco/max_preco
+    sort=updated_at  idx_updated_id (updated_at, id) + filtro updated_since
+    q                ft_modelo (FULLTEXT, modo booleano com prefixo)
+
+check_plans() roda o EXPLAIN de cada formato de consulta e confere o índice
+escolhido (python migrations.py explain).
+"""
+
+import base64
+import json
+import math
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from cache import normalize_modelo
+
+# ordenação -> índice que atende o ORDER BY
+SORTS = {'id': 'PRIMARY', 'preco': 'idx_preco_id', 'updated_at': 'idx_updated_id'}
+# presença de qualquer um deles troca a listagem para o modo catálogo
+PARAMS = ('sort', 'order', 'min_preco', 'max_preco', 'updated_since', 'q', 'cursor')
+
+_WORD = re.compile(r'\w+')
+
+
+def _parse_preco(value):
+    try:
+        preco = float(value)
+    except ValueError:
+        return None
+    return preco if math.isfinite(preco) else None
+
+
+def encode_cursor(row, sort):
+    """Cursor opaco da próxima página a partir da última linha"""
+    value = row[sort] if sort != 'id' else None
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif value is not None:
+        value = str(value)
+    raw = json.dumps([value, row['id']], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(cursor, sort):
+    """(valor, id) do cursor; levanta ValueError se for inválido para a ordenação"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, id_ = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError('cursor inválido')
+    if not isinstance(id_, int) or (sort == 'id') != (value is None):
+        raise ValueError('cursor inválido')
+    try:
+        if sort == 'preco':
+            value = Decimal(value)
+        elif sort == 'updated_at':
+            value = datetime.fromisoformat(value)
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValueError('cursor inválido')
+    return value, id_
+
+
+def parse_args(args):
+    """Valida os parâmetros do catálogo; retorna (consulta, mensagem de erro)"""
+    sort = args.get('sort', 'id')
+    order = args.get('order', 'asc')
+    if sort not in SORTS or order not in ('asc', 'desc'):
+        return None, f'sort deve ser um de {", ".join(SORTS)} e order asc ou desc'
+
+    query = {'sort': sort, 'descending': order == 'desc', 'min_preco': None, 'max_preco': None,
+             'updated_since': None, 'terms': [], 'after': None}
+    for name in ('min_preco', 'max_preco'):
+        if name in args:
+            query[name] = _parse_preco(args[name])
+            if query[name] is None:
+                return None, 'Preço inválido'
+    if 'updated_since' in args:
+        try:
+            query['updated_since'] = datetime.fromisoformat(args['updated_since'])
+        except ValueError:
+            return None, 'updated_since deve ser uma data ISO 8601'
+    if 'q' in args:
+        query['terms'] = _WORD.findall(normalize_modelo(args['q']))
+        if not query['terms']:
+            return None, 'q deve conter ao menos uma palavra'
+    if args.get('cursor'):
+        try:
+            query['after'] = decode_cursor(args['cursor'], sort)
+        except ValueError as e:
+            return None, str(e)
+    return query, None
+
+
+def build_sql(query, limit):
+    """SELECT parametrizado da página (limit linhas) para a consulta"""
+    sort = query['sort']
+    columns = 'id, modelo, preco, image' + (', updated_at' if sort == 'updated_at' else '')
+    where = []
+    params = []
+    if query['min_preco'] is not None:
+        where.append('preco >= %s')
+        params.append(query['min_preco'])
+    if query['max_preco'] is not None:
+        where.append('preco <= %s')
+        params.append(query['max_preco'])
+    if query['updated_since'] is not None:
+        where.append('updated_at >= %s')
+        params.append(query['updated_since'])
+    if query['terms']:
+        # todas as palavras, cada uma como prefixo
+        where.append('MATCH(modelo) AGAINST (%s IN BOOLEAN MODE)')
+        params.append(' '.join(f'+{term}*' for term in query['terms']))
+
+    direction = 'DESC' if query['descending'] else 'ASC'
+    if query['after'] is not None:
+        value, id_ = query['after']
+        op = '<' if query['descending'] else '>'
+        if sort == 'id':
+            where.append(f'id {op} %s')
+            params.append(id_)
+        else:
+            # (coluna, id) > (valor, id) escrito com limite na primeira coluna do índice
+            where.append(f'{sort} {op}= %s AND ({sort} {op} %s OR id {op} %s)')
+            params.extend((value, value, id_))
+    order_by = f'id {direction}' if sort == 'id' else f'{sort} {direction}, id {direction}'
+
+    sql = f"SELECT {columns} FROM carro"
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += f" ORDER BY {order_by} LIMIT %s"
+    params.append(limit)
+    return sql, tuple(params)
+
+
+def row_matcher(query):
+    """
+    Filtros de preço e texto da consulta como predicado (preço, modelo
+    normalizado) -> bool, para o modo snapshot (sem updated_at)
+    """
+    terms = query['terms']
+    min_preco, max_preco = query['min_preco'], query['max_preco']
+
+    def matches(preco, modelo):
+        if min_preco is not None and preco < min_preco:
+            return False
+        if max_preco is not None and preco > max_preco:
+            return False
+        if terms:
+            words = _WORD.findall(modelo)
+            return all(any(word.startswith(term) for word in words) for term in terms)
+        return True
+
+    return matches
+
+
+def cursor_key(query):
+    """Posição do cursor na ordem (id ou (preço, id)), ou None na primeira página"""
+    if query['after'] is None:
+        return None
+    value, id_ = query['after']
+    return id_ if query['sort'] == 'id' else (float(value), id_)
+
+
+# Formatos de consulta e o índice que cada um deve usar
+EXPLAIN_CASES = (
+    ('sort=id após cursor', {'sort': 'id', 'after': (None, 1000)}, 'PRIMARY'),
+    ('sort=preco, faixa de preço', {'sort': 'preco', 'min_preco': 50000.0, 'max_preco': 150000.0,
+                                    'after': (Decimal('60000.00'), 10)}, 'idx_preco_id'),
+    ('sort=preco desc', {'sort': 'preco', 'descending': True}, 'idx_preco_id'),
+    ('sort=updated_at desc, recentes', {'sort': 'updated_at', 'descending': True,
+                                        'updated_since': datetime(2024, 1, 1)}, 'idx_updated_id'),
+    ('texto (q)', {'terms': ['civic']}, 'ft_modelo'),
+)
+
+
+def check_plans(connection, limit=100):
+    """EXPLAIN de cada formato; retorna [(nome, ok, índice esperado, plano)]"""
+    results = []
+    cursor = connection.cursor(dictionary=True)
+    try:
+        for name, overrides, expected in EXPLAIN_CASES:
+            query = dict({'sort': 'id', 'descending': False, 'min_preco': None, 'max_preco': None,
+                          'updated_since': None, 'terms': [], 'after': None}, **overrides)
+            sql, params = build_sql(query, limit)
+            cursor.execute(f"EXPLAIN {sql}", params)
+            plan = cursor.fetchall()
+            row = plan[0] if plan else {}
+            # com FULLTEXT a ordenação é um filesort só sobre as linhas encontradas
+            sorted_ok = expected == 'ft_modelo' or 'filesort' not in (row.get('Extra') or '')
+            ok = row.get('key') == expected and sorted_ok
+            results.append((name, ok, expected, plan))
+    finally:
+        cursor.close()
+    return results
@@ -0,0 +1,154 @@
+"""
+Feed de alterações da tabela carro compartilhado entre os workers
+
+Cada escrita confirmada acrescenta uma linha JSON a um arquivo local aberto
+com O_APPEND (uma única write() por evento). Os leitores guardam o offset e
+leem só o que foi acrescentado. Quando o arquivo passa do limite ele é
+trocado por um novo (os.replace); o leitor percebe a troca do inode e
+sinaliza reset, e o consumidor se ressincroniza a partir do banco.
+
+A posição "inode:offset" de cada evento também serve de id no stream SSE
+(/api/events), para o cliente retomar com Last-Event-ID.
+"""
+
+import json
+import os
+import time
+
+
+class ChangeFeed:
+    """Publicação de eventos no arquivo compartilhado"""
+
+    def __init__(self, path, max_bytes=8 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def publish(self, event):
+        """Acrescenta um evento; retorna o id (inode:offset) do evento seguinte"""
+        event = dict(event, ts=round(time.time(), 3))
+        line = (json.dumps(event, separators=(',', ':'), default=str) + '\n').encode('utf-8')
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            stat = os.fstat(fd)
+        finally:
+            os.close(fd)
+        if stat.st_size > self.max_bytes:
+            self._rotate(stat.st_ino)
+        return f"{stat.st_ino}:{stat.st_size}"
+
+    def _rotate(self, inode):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            current = os.stat(self.path)
+            if current.st_ino != inode:
+                return  # outro processo já trocou o arquivo
+            open(tmp_path, 'wb').close()
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def reset(self):
+        """
+        Troca o arquivo por um vazio: os leitores sinalizam reset e se
+        ressincronizam do banco (cargas feitas por fora do app)
+        """
+        try:
+            self._rotate(os.stat(self.path).st_ino)
+        except OSError:
+            pass
+
+    def position(self):
+        """Posição (inode:offset) do fim atual do feed"""
+        return self.reader().position
+
+    def reader(self, position=None):
+        """Leitor a partir de uma posição (inode:offset) ou do fim atual"""
+        return FeedReader(self, position)
+
+
+class FeedReader:
+    """Lê incrementalmente os eventos publicados depois de uma posição"""
+
+    def __init__(self, feed, position=None):
+        self.feed = feed
+        self.inode = None
+        self.offset = 0
+        self._partial = b''
+        if position:
+            try:
+                inode, offset = position.split(':', 1)
+                self.inode, self.offset = int(inode), int(offset)
+            except ValueError:
+                self.inode = None
+        if self.inode is None:
+            self.seek_end()
+
+    @property
+    def position(self):
+        # fim do último evento completo lido
+        return f"{self.inode}:{self.offset - len(self._partial)}"
+
+    def _stat(self):
+        try:
+            return os.stat(self.feed.path)
+        except FileNotFoundError:
+            # cria o arquivo para ter um inode estável
+            os.close(os.open(self.feed.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644))
+            return os.stat(self.feed.path)
+
+    def seek_end(self):
+        stat = self._stat()
+        self.inode = stat.st_ino
+        self.offset = stat.st_size
+        self._partial = b''
+
+    def poll(self, max_bytes=1024 * 1024):
+        """
+        Retorna (eventos, reset). reset=True indica que eventos podem ter sido
+        perdidos (arquivo trocado/truncado) e o consumidor deve se ressincronizar;
+        nesse caso o leitor já foi reposicionado no fim do arquivo novo.
+        """
+        entries, reset = self.poll_entries(max_bytes)
+        return [event for _, event in entries], reset
+
+    def poll_entries(self, max_bytes=1024 * 1024):
+        """Como poll(), mas com a posição logo após cada evento: [(posição, evento)]"""
+        stat = self._stat()
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            self.seek_end()
+            return [], True
+        if stat.st_size == self.offset:
+            return [], False
+
+        with open(self.feed.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(min(stat.st_size - self.offset, max_bytes))
+        offset = self.offset - len(self._partial)
+        self.offset += len(data)
+        data = self._partial + data
+        lines = data.split(b'\n')
+        self._partial = lines.pop()
+
+        entries = []
+        for line in lines:
+            offset += len(line) + 1
+            if not line:
+                continue
+            try:
+                entries.append((f"{self.inode}:{offset}", json.loads(line)))
+            except ValueError:
+                continue
+        return entries, False
+
+
+def sse_message(data, event=None, event_id=None):
+    """Mensagem no formato text/event-stream (bytes)"""
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    payload = data if isinstance(data, str) else json.dumps(data, separators=(',', ':'), default=str)
+    lines.extend(f"data: {line}" for line in payload.split('\n'))
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
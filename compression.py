@@ -0,0 +1,116 @@
+"""
+Compressão de respostas e assets pré-comprimidos
+
+Respostas dinâmicas (JSON, texto) acima de min_size são comprimidas com
+brotli ou gzip conforme o Accept-Encoding do cliente. Respostas em streaming,
+arquivos enviados com send_file e corpos pequenos passam direto.
+
+Os assets estáticos são comprimidos uma vez no build (build_assets.py): o
+manifest liga o caminho original ao arquivo com hash no nome, e o .br/.gz
+ao lado é enviado direto, com cache de longa duração.
+"""
+
+import gzip
+import json
+import os
+
+from flask import request
+from werkzeug.http import parse_accept_header
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional; sem ele só gzip
+    brotli = None
+
+COMPRESSIBLE = {
+    'application/json', 'application/x-ndjson', 'application/javascript',
+    'text/javascript', 'text/css', 'text/html', 'text/plain', 'image/svg+xml',
+}
+
+# extensão do arquivo pré-comprimido por encoding, em ordem de preferência
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+
+def accepted_encodings(accept_encoding):
+    """Encodings aceitos pelo cliente (qualidade > 0)"""
+    accept = parse_accept_header(accept_encoding or '')
+    return {value.lower() for value, quality in accept if quality > 0}
+
+
+def choose_encoding(accept_encoding):
+    """Melhor encoding disponível para o Accept-Encoding, ou None"""
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+class Compressor:
+    """Comprime corpos de resposta com nível configurável"""
+
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=4, enabled=True):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.enabled = enabled
+
+    def compress(self, body, encoding):
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def negotiate(self, body, mimetype, accept_encoding):
+        """Retorna (corpo, encoding) — encoding None se não comprimiu"""
+        if not self.enabled or len(body) < self.min_size or mimetype not in COMPRESSIBLE:
+            return body, None
+        encoding = choose_encoding(accept_encoding)
+        if encoding is None:
+            return body, None
+        return self.compress(body, encoding), encoding
+
+    def install(self, app):
+        """Registra o after_request que comprime as respostas do Flask"""
+        @app.after_request
+        def _compress_response(response):
+            if response.direct_passthrough or response.is_streamed or response.status_code != 200 \
+                    or 'Content-Encoding' in response.headers:
+                return response
+            response.vary.add('Accept-Encoding')
+            body, encoding = self.negotiate(response.get_data(), response.mimetype,
+                                            request.headers.get('Accept-Encoding'))
+            if encoding is not None:
+                response.set_data(body)
+                response.headers['Content-Encoding'] = encoding
+                etag, weak = response.get_etag()
+                if etag and not weak:
+                    # os bytes mudaram: a ETag forte deixa de valer
+                    response.set_etag(etag, weak=True)
+            return response
+
+
+class AssetManifest:
+    """Manifest gerado pelo build_assets.py (caminho original -> arquivo com hash)"""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.assets = {}
+        try:
+            with open(os.path.join(folder, 'manifest.json'), encoding='utf-8') as f:
+                self.assets = json.load(f)
+        except (OSError, ValueError):
+            pass  # sem build: os templates usam os arquivos originais
+
+    def get(self, path):
+        return self.assets.get(path)
+
+    def precompressed(self, filename, accept_encoding):
+        """(arquivo, encoding) da melhor variante pré-comprimida existente"""
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, suffix in PRECOMPRESSED:
+            path = safe_join(self.folder, filename + suffix)
+            if encoding in accepted and path and os.path.isfile(path):
+                return filename + suffix, encoding
+        return filename, None
@@ -0,0 +1,273 @@
+"""
+Pool de conexões MySQL por processo
+
+Cada worker do Gunicorn mantém o seu próprio pool. As conexões são criadas
+sob demanda (depois do fork), então o preload_app = True não compartilha
+sockets entre processos.
+
+Se houver query_hooks registrados, as conexões emprestadas vêm embrulhadas
+e cada execute/executemany chama hook(statement, params, duração, cursor, erro).
+
+prepared_cursor() guarda na conexão física um cursor com prepared statement
+por SQL: o statement é preparado no servidor uma vez por conexão e
+reaproveitado em todos os checkouts seguintes.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector.errors import PoolError
+
+
+class InstrumentedCursor:
+    """Cursor que mede cada execução e chama os hooks do pool"""
+
+    def __init__(self, cursor, hooks):
+        self._cursor = cursor
+        self._hooks = hooks
+
+    def _run(self, method, operation, params, args, kwargs):
+        start = time.perf_counter()
+        error = None
+        try:
+            return method(operation, params, *args, **kwargs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            for hook in self._hooks:
+                try:
+                    hook(operation, params, duration, self._cursor, error)
+                except Exception as e:
+                    print(f"Erro no hook de query: {e}")
+
+    def execute(self, operation, params=(), *args, **kwargs):
+        return self._run(self._cursor.execute, operation, params, args, kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        return self._run(self._cursor.executemany, operation, seq_params, args, kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+
+class InstrumentedConnection:
+    """Conexão cujos cursores passam pelos hooks de query"""
+
+    def __init__(self, connection, hooks):
+        self._connection = connection
+        self._hooks = hooks
+
+    @property
+    def raw_connection(self):
+        return self._connection
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs), self._hooks)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+def prepared_cursor(connection, statement):
+    """
+    Cursor preparado para o statement, cacheado na conexão física.
+    Passe sempre o mesmo objeto str (constante): o driver compara por
+    identidade e só prepara de novo se o SQL mudar. Não feche o cursor.
+    """
+    raw = getattr(connection, 'raw_connection', connection)
+    cache = getattr(raw, '_prepared_cursors', None)
+    if cache is None:
+        cache = raw._prepared_cursors = {}
+    cursor = cache.get(statement)
+    if cursor is None:
+        cursor = cache[statement] = connection.cursor(prepared=True)
+    return cursor
+
+
+class ConnectionPool:
+    """Pool de conexões com overflow, timeout de checkout e reciclagem"""
+
+    def __init__(self, config, size=5, max_overflow=10, timeout=30.0,
+                 recycle=1800, ping_idle=5.0):
+        self.config = config
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_idle = ping_idle
+        self.query_hooks = []
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        """Descarta o estado herdado do processo pai (chamado após o fork)"""
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+        # (conexão, criada_em, devolvida_em)
+        self._idle = deque()
+        self._total = 0
+        self._in_use = 0
+        self._waiters = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._invalidated = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _connect(self):
+        connection = mysql.connector.connect(**self.config)
+        self._created += 1
+        return connection, time.monotonic()
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _acquire(self):
+        """Retira uma conexão do pool, criando-a se houver capacidade"""
+        if self._pid != os.getpid():
+            self._reset()
+
+        start = time.monotonic()
+        deadline = start + self.timeout
+        entry = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._total < self.size + self.max_overflow:
+                    self._total += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolError(
+                        f"Tempo esgotado aguardando conexão do pool ({self.timeout}s)"
+                    )
+                self._waiters += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiters -= 1
+            self._in_use += 1
+            self._checkouts += 1
+            waited = time.monotonic() - start
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        try:
+            if entry is None:
+                return self._connect()
+            return self._validate(*entry)
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def _validate(self, connection, created_at, returned_at):
+        """Recicla conexões antigas e testa as que ficaram ociosas"""
+        now = time.monotonic()
+        if self.recycle and now - created_at > self.recycle:
+            self._recycled += 1
+            self._close_quietly(connection)
+            return self._connect()
+        if now - returned_at >= self.ping_idle:
+            try:
+                connection.ping(reconnect=False)
+            except mysql.connector.Error:
+                self._invalidated += 1
+                self._close_quietly(connection)
+                return self._connect()
+        return connection, created_at
+
+    def _release(self, connection, created_at):
+        """Devolve a conexão ao pool, descartando-a se estiver quebrada"""
+        if self._pid != os.getpid():
+            return
+
+        keep = True
+        try:
+            if connection.unread_result:
+                connection.consume_results()
+            if connection.in_transaction:
+                connection.rollback()
+            keep = connection.is_connected()
+        except Exception:
+            keep = False
+
+        with self._cond:
+            self._in_use -= 1
+            # conexões de overflow são fechadas ao voltar
+            if keep and self._total <= self.size:
+                self._idle.append((connection, created_at, time.monotonic()))
+            else:
+                if not keep:
+                    self._invalidated += 1
+                self._total -= 1
+                self._close_quietly(connection)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager que empresta uma conexão do pool"""
+        connection, created_at = self._acquire()
+        try:
+            if self.query_hooks:
+                yield InstrumentedConnection(connection, self.query_hooks)
+            else:
+                yield connection
+        finally:
+            self._release(connection, created_at)
+
+    def stats(self):
+        """Estatísticas do pool deste processo"""
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                'pid': self._pid,
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'open': self._total,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'waiters': self._waiters,
+                'checkouts': checkouts,
+                'timeouts': self._timeouts,
+                'created': self._created,
+                'recycled': self._recycled,
+                'invalidated': self._invalidated,
+                'checkout_wait_avg_ms': round(self._wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+                'checkout_wait_max_ms': round(self._wait_max * 1000, 3),
+            }
+
+    def dispose(self):
+        """Fecha as conexões ociosas"""
+        with self._cond:
+            while self._idle:
+                connection, _, _ = self._idle.pop()
+                self._total -= 1
+                self._close_quietly(connection)
@@ -1,15 +1,39 @@
 """Configuração do Gunicorn para produção"""
 import os
+import shutil
+import sys
+import tempfile
 import multiprocessing
 
+# Métricas Prometheus agregadas entre workers: precisa estar definido antes
+# de o app (e o prometheus_client) ser importado pelo preload_app
+os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'autoprime-prometheus')
+)
+
 # Endereço e porta
 bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
 
 # Número de workers (2-4 x número de CPU cores)
 workers = multiprocessing.cpu_count() * 2 + 1
 
-# Tipo de worker
-worker_class = 'sync'
+# Modo de serviço: 'sync' (Flask/WSGI) ou 'async' (ASGI com Uvicorn + aiomysql)
+SERVER_MODE = os.environ.get('SERVER_MODE', 'sync')
+
+# Tipo de worker e aplicação
+if SERVER_MODE == 'async':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    wsgi_app = 'asgi:app'
+else:
+    # threads: streams SSE (/api/events) ocupam uma thread, não o worker inteiro
+    worker_class = 'gthread'
+    threads = int(os.environ.get('GUNICORN_THREADS', 8))
+    wsgi_app = 'app:app'
+    # limite global de requisições em andamento (app.MAX_IN_FLIGHT): uma thread
+    # livre por worker para responder 503 e os health checks
+    os.environ.setdefault('MAX_IN_FLIGHT', str(workers * max(threads - 1, 1)))
+    # streams SSE prendem uma thread por até SSE_MAX_SECONDS: no máximo metade por worker
+    os.environ.setdefault('SSE_MAX_STREAMS', str(max(threads // 2, 1)))
 
 # Timeout para requisições (em segundos)
 timeout = 120
@@ -34,3 +58,37 @@ proc_name = 'autoprime'
 # Número máximo de requisições por worker antes de reiniciar
 max_requests = 1000
 max_requests_jitter = 50
+
+
+def on_starting(server):
+    """Limpa as métricas de execuções anteriores"""
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def when_ready(server):
+    """Aquece rotas e templates no master: os workers (e os reciclados) herdam no fork"""
+    import app
+    app.warm_up()
+
+
+def post_worker_init(worker):
+    """
+    Verifica o banco e aplica as migrações em segundo plano: até a verificação
+    passar, o /readyz e as rotas que usam o banco respondem 503
+    """
+    import app
+    app.startup_check.start()
+
+
+def child_exit(server, worker):
+    """Remove os gauges 'live' e as requisições em andamento do worker que saiu"""
+    app = sys.modules.get('app')
+    if app is not None:
+        app.admission.in_flight.release_process(worker.pid)
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
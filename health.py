@@ -0,0 +1,110 @@
+"""
+Probes de saúde com resultado em cache
+
+Os load balancers chamam os probes com frequência; o resultado de cada
+verificação é reaproveitado por um intervalo e só uma thread por processo
+refaz a verificação quando ele expira (as outras usam o último resultado).
+"""
+
+import threading
+import time
+
+
+class CachedProbe:
+    """Executa check() no máximo uma vez a cada ttl segundos por processo"""
+
+    def __init__(self, check, ttl):
+        self.check = check
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._value = None
+        self._error = None
+        self._checked_at = None
+
+    def _refresh(self):
+        try:
+            self._value = self.check()
+            self._error = None
+        except Exception as e:
+            # mantém o último valor bom e registra o erro
+            self._error = str(e)
+        self._checked_at = time.monotonic()
+
+    def result(self):
+        """Retorna (ok, valor, erro, idade_em_segundos)"""
+        now = time.monotonic()
+        expired = self._checked_at is None or now - self._checked_at >= self.ttl
+        if expired:
+            if self._checked_at is None:
+                # primeira chamada: todas esperam a primeira verificação
+                with self._lock:
+                    if self._checked_at is None:
+                        self._refresh()
+            elif self._lock.acquire(blocking=False):
+                try:
+                    self._refresh()
+                finally:
+                    self._lock.release()
+        age = time.monotonic() - self._checked_at
+        return self._error is None, self._value, self._error, round(age, 3)
+
+    def invalidate(self):
+        """Expira o resultado em cache (a próxima chamada verifica de novo)"""
+        if self._checked_at is not None:
+            self._checked_at = time.monotonic() - self.ttl
+
+
+class StartupCheck:
+    """
+    Verificação de inicialização (banco, migrações) feita em segundo plano:
+    o processo atende requisições desde o início e o readiness só passa
+    depois que ela termina bem. Se falhar, é refeita a cada retry segundos.
+    """
+
+    def __init__(self, check, retry=5.0):
+        self.check = check
+        self.retry = retry
+        self.on_ready = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._ok = False
+        self._error = 'Verificação inicial em andamento'
+        self._finished_at = None
+
+    def start(self):
+        """Inicia a verificação numa thread (chamar depois do fork)"""
+        with self._lock:
+            if self._ok or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._finished_at = None
+            self._thread = threading.Thread(target=self._run, name='startup-check', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            self.check()
+        except Exception as e:
+            self._error = str(e)
+        else:
+            self._ok = True
+            self._error = None
+            for callback in self.on_ready:
+                callback()
+        self._finished_at = time.monotonic()
+
+    def require(self):
+        """Levanta RuntimeError enquanto a verificação não tiver passado"""
+        if self._ok:
+            return
+        if self._thread is None or (
+                self._finished_at is not None and time.monotonic() - self._finished_at >= self.retry):
+            self.start()
+        if not self._ok:
+            raise RuntimeError(self._error or 'Verificação inicial em andamento')
+
+    @property
+    def ready(self):
+        return self._ok
+
+    def stats(self):
+        return {'ok': self._ok, 'error': self._error}
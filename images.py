@@ -0,0 +1,176 @@
+"""
+Pipeline de imagens dos carros
+
+- O upload é copiado em blocos para um arquivo temporário enquanto o
+  SHA-256 é calculado, com limite de tamanho (nada é lido inteiro na memória).
+- O arquivo final se chama <sha256>.<ext>: uploads repetidos viram um só arquivo.
+- As variantes WebP (thumb e card) são geradas num pool de threads em
+  segundo plano; a requisição não espera o redimensionamento.
+- O Pillow só é importado na primeira variante gerada, não no startup.
+"""
+
+import hashlib
+import importlib.util
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.utils import secure_filename
+
+# Pillow é opcional: sem ele só o original é servido
+PILLOW_AVAILABLE = importlib.util.find_spec('PIL') is not None
+
+CHUNK_SIZE = 64 * 1024
+
+# nome da variante -> largura máxima em pixels
+VARIANTS = {
+    'thumb': 160,
+    'card': 480,
+}
+
+HASHED_NAME = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]+$')
+# tamanho da coluna carro.image
+IMAGE_NAME_MAX = 500
+
+
+class UploadTooLarge(Exception):
+    """O upload ultrapassou o limite configurado"""
+
+
+def store_upload(stream, extension, folder, max_bytes):
+    """
+    Grava o stream em <folder>/<sha256>.<extension>.
+    Retorna (filename, created); created é False se o conteúdo já existia.
+    """
+    os.makedirs(folder, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"Arquivo maior que {max_bytes} bytes")
+                digest.update(chunk)
+                tmp.write(chunk)
+
+        filename = f"{digest.hexdigest()}.{extension}"
+        path = os.path.join(folder, filename)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            return filename, False
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+        return filename, True
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def valid_image_name(image):
+    """Nome de imagem aceito em carro.image: None ou um nome de arquivo simples (sem caminho)"""
+    if image is None:
+        return True
+    return isinstance(image, str) and len(image) <= IMAGE_NAME_MAX and secure_filename(image) == image
+
+
+def is_hashed(filename):
+    """True para arquivos gravados por store_upload (com variantes)"""
+    return bool(filename and HASHED_NAME.match(filename))
+
+
+def variant_filename(filename, variant):
+    stem = filename.rsplit('.', 1)[0]
+    return f"{stem}.{variant}.webp"
+
+
+def variant_urls(filename, url_prefix):
+    """URLs das variantes e o srcset correspondente"""
+    urls = {name: f"{url_prefix}/{variant_filename(filename, name)}" for name in VARIANTS}
+    srcset = ', '.join(f"{urls[name]} {width}w" for name, width in VARIANTS.items())
+    return urls, srcset
+
+
+def generate_variants(path):
+    """Gera as variantes WebP que ainda não existem ao lado do original"""
+    if not PILLOW_AVAILABLE:
+        return []
+    from PIL import Image
+
+    folder, filename = os.path.split(path)
+    pending = [
+        (name, width, os.path.join(folder, variant_filename(filename, name)))
+        for name, width in VARIANTS.items()
+    ]
+    pending = [item for item in pending if not os.path.exists(item[2])]
+    if not pending:
+        return []
+
+    created = []
+    with Image.open(path) as original:
+        original.seek(0)
+        image = original.convert('RGBA' if 'A' in original.getbands() else 'RGB')
+        for name, width, target in pending:
+            variant = image.copy()
+            variant.thumbnail((width, width * 4))
+            # temporário próprio: outro job (thread ou worker) pode gerar a mesma variante
+            fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.variant-')
+            try:
+                with os.fdopen(fd, 'wb') as tmp:
+                    variant.save(tmp, 'WEBP', quality=80, method=4)
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, target)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            created.append(name)
+    return created
+
+
+class VariantWorker:
+    """Pool de threads (criado no primeiro uso, depois do fork) para as variantes"""
+
+    def __init__(self, max_workers=2):
+        self.max_workers = max_workers
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        # caminho -> job ainda não terminado (o mesmo upload repetido não gera outro)
+        self._pending = {}
+
+    def submit(self, path):
+        if not PILLOW_AVAILABLE:
+            return None
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='image-variants')
+                self._pid = os.getpid()
+                self._pending = {}
+            future = self._pending.get(path)
+            if future is not None:
+                return future
+            future = self._executor.submit(generate_variants, path)
+            self._pending[path] = future
+        future.add_done_callback(lambda done: self._finished(path, done))
+        future.add_done_callback(_log_failure)
+        return future
+
+    def _finished(self, path, future):
+        with self._lock:
+            if self._pending.get(path) is future:
+                del self._pending[path]
+
+
+def _log_failure(future):
+    error = future.exception()
+    if error is not None:
+        print(f"Erro ao gerar variantes da imagem: {error}")
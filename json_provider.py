@@ -0,0 +1,89 @@
+"""
+Provider JSON da aplicação
+
+Usa o orjson quando instalado e o json da stdlib caso contrário, com a mesma
+saída compacta nos dois. Decimal (colunas DECIMAL do MySQL) vira número,
+datetime/date viram ISO 8601 e dataclasses (Carro) viram objetos, então os
+handlers devolvem as linhas do banco sem converter campo a campo.
+
+Mede o tempo gasto serializando as respostas para separar serialização de
+tempo de banco nas métricas.
+"""
+
+import dataclasses
+import json
+import time
+import uuid
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def _default(obj):
+    """Tipos que nenhum dos serializadores trata sozinho"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date, dt_time)):
+        return obj.isoformat()
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        # o orjson serializa dataclasses sozinho; isto é para o json da stdlib
+        return {field.name: getattr(obj, field.name) for field in dataclasses.fields(obj)}
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Objeto do tipo {type(obj).__name__} não é serializável em JSON")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumpb(obj):
+        """Serializa para bytes UTF-8"""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    def loads(data):
+        return orjson.loads(data)
+else:
+    _encoder = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(',', ':'))
+
+    def dumpb(obj):
+        """Serializa para bytes UTF-8"""
+        return _encoder.encode(obj).encode('utf-8')
+
+    def loads(data):
+        return json.loads(data)
+
+
+class AppJSONProvider(JSONProvider):
+    """Provider rápido (orjson ou stdlib) com callback de tempo de serialização"""
+
+    # chamado com a duração (segundos) de cada resposta serializada
+    on_serialize = None
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        return dumpb(obj).decode('utf-8')
+
+    def dumpb(self, obj):
+        """Como dumps, mas sem passar por str (respostas e streaming)"""
+        return dumpb(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        start = time.perf_counter() if self.on_serialize is not None else None
+        obj = self._prepare_response_obj(args, kwargs)
+        response = self._app.response_class(dumpb(obj) + b'\n', mimetype=self.mimetype)
+        if start is not None:
+            self.on_serialize(time.perf_counter() - start)
+        return response
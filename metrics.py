@@ -0,0 +1,169 @@
+"""
+Métricas no formato Prometheus (/metrics)
+
+Com PROMETHEUS_MULTIPROC_DIR definido (o gunicorn.conf.py define), cada
+worker grava seus valores em arquivos mmap nesse diretório e o /metrics de
+qualquer worker agrega todos os processos. Sem o prometheus_client
+instalado as métricas ficam desligadas e o /metrics responde 503.
+"""
+
+import os
+import time
+
+from flask import g, has_request_context, request
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+        generate_latest, multiprocess,
+    )
+except ImportError:  # prometheus_client é opcional
+    REGISTRY = None
+
+ENABLED = REGISTRY is not None
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+if ENABLED:
+    REQUESTS = Counter(
+        'autoprime_http_requests_total', 'Requisições HTTP atendidas',
+        ['route', 'method', 'status'],
+    )
+    ERRORS = Counter(
+        'autoprime_http_errors_total', 'Respostas HTTP com status >= 400',
+        ['route', 'status'],
+    )
+    LATENCY = Histogram(
+        'autoprime_http_request_duration_seconds', 'Latência das requisições HTTP',
+        ['route', 'method'], buckets=LATENCY_BUCKETS,
+    )
+    REJECTED = Counter(
+        'autoprime_http_rejected_total', 'Requisições recusadas (rate_limit = 429, overload = 503)',
+        ['route', 'reason'],
+    )
+    IN_PROGRESS = Gauge(
+        'autoprime_http_requests_in_progress', 'Requisições em andamento',
+        ['route'], multiprocess_mode='livesum',
+    )
+    REQUEST_DB_TIME = Histogram(
+        'autoprime_request_db_seconds', 'Tempo de banco (queries) por requisição',
+        ['route'], buckets=LATENCY_BUCKETS,
+    )
+    REQUEST_SERIALIZATION_TIME = Histogram(
+        'autoprime_request_serialization_seconds', 'Tempo de serialização JSON por requisição',
+        ['route'], buckets=LATENCY_BUCKETS,
+    )
+    QUERY_TIME = Histogram(
+        'autoprime_db_query_duration_seconds', 'Duração de cada execução SQL',
+        ['route', 'statement'], buckets=LATENCY_BUCKETS,
+    )
+    POOL_CHECKOUT = Histogram(
+        'autoprime_db_pool_checkout_seconds', 'Espera para obter conexão do pool',
+        buckets=LATENCY_BUCKETS,
+    )
+    POOL_IN_USE = Gauge(
+        'autoprime_db_pool_in_use', 'Conexões emprestadas', multiprocess_mode='livesum',
+    )
+    POOL_OPEN = Gauge(
+        'autoprime_db_pool_open', 'Conexões abertas', multiprocess_mode='livesum',
+    )
+    POOL_WAITERS = Gauge(
+        'autoprime_db_pool_waiters', 'Threads aguardando conexão', multiprocess_mode='livesum',
+    )
+
+
+def current_route():
+    """Rótulo da rota: a regra do Flask (não a URL) para limitar a cardinalidade"""
+    if has_request_context() and request.url_rule is not None:
+        return request.url_rule.rule
+    return 'unmatched' if has_request_context() else 'background'
+
+
+def _statement_kind(statement):
+    return statement.lstrip().split(None, 1)[0].upper() if statement.strip() else '?'
+
+
+def observe_query(statement, params, duration, cursor, error):
+    """Hook do pool: tempo de cada execução SQL, acumulado por requisição"""
+    if not ENABLED:
+        return
+    QUERY_TIME.labels(current_route(), _statement_kind(statement)).observe(duration)
+    if has_request_context():
+        g.metrics_db_seconds = g.get('metrics_db_seconds', 0.0) + duration
+
+
+def observe_serialization(duration):
+    if ENABLED and has_request_context():
+        g.metrics_serialization_seconds = g.get('metrics_serialization_seconds', 0.0) + duration
+
+
+def observe_checkout(duration):
+    if ENABLED:
+        POOL_CHECKOUT.observe(duration)
+
+
+def observe_pool(stats):
+    if ENABLED:
+        POOL_IN_USE.set(stats['in_use'])
+        POOL_OPEN.set(stats['open'])
+        POOL_WAITERS.set(stats['waiters'])
+
+
+def observe_request(route, method, status, duration):
+    """Registra uma requisição concluída (também usado pelo asgi.py)"""
+    if not ENABLED:
+        return
+    REQUESTS.labels(route, method, str(status)).inc()
+    LATENCY.labels(route, method).observe(duration)
+    if status >= 400:
+        ERRORS.labels(route, str(status)).inc()
+
+
+def observe_rejection(route, reason):
+    """Requisição recusada pelo controle de admissão (rate_limit.py)"""
+    if ENABLED:
+        REJECTED.labels(route, reason).inc()
+
+
+def track_in_progress(route, delta):
+    if ENABLED:
+        IN_PROGRESS.labels(route).inc(delta)
+
+
+def install(app, pool):
+    """Registra os hooks before/after/teardown no app Flask"""
+    if not ENABLED:
+        return
+    app.json.on_serialize = observe_serialization
+
+    @app.before_request
+    def _metrics_start():
+        g.metrics_start = time.perf_counter()
+        g.metrics_route = current_route()
+        track_in_progress(g.metrics_route, 1)
+
+    @app.after_request
+    def _metrics_end(response):
+        start = g.get('metrics_start')
+        if start is not None:
+            route = g.metrics_route
+            observe_request(route, request.method, response.status_code, time.perf_counter() - start)
+            REQUEST_DB_TIME.labels(route).observe(g.get('metrics_db_seconds', 0.0))
+            REQUEST_SERIALIZATION_TIME.labels(route).observe(g.get('metrics_serialization_seconds', 0.0))
+            observe_pool(pool.stats())
+        return response
+
+    @app.teardown_request
+    def _metrics_teardown(exc):
+        if g.get('metrics_start') is not None:
+            track_in_progress(g.metrics_route, -1)
+
+
+def render():
+    """Retorna (corpo, content-type) com as métricas de todos os processos"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
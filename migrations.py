@@ -0,0 +1,255 @@
+"""
+Migrações versionadas do schema
+
+As versões aplicadas ficam em schema_migrations. Cada migração é
+idempotente (confere o information_schema antes de criar ou remover um
+índice), então roda sem erro num banco criado pelo setup_database.sql ou
+migrado pela metade. Um GET_LOCK evita que dois hosts (ou workers) migrem
+ao mesmo tempo.
+
+init_database() aplica as pendentes na verificação inicial, em segundo plano
+(no Gunicorn, em cada worker ao subir: o primeiro migra e os outros só
+conferem). Uso manual:
+
+    python migrations.py status     versões aplicadas e pendentes
+    python migrations.py migrate    aplica as pendentes
+    python migrations.py explain    confere os planos das consultas do catálogo
+"""
+
+import argparse
+import os
+import sys
+
+import mysql.connector
+
+import catalog
+
+LOCK_NAME = 'autoprime_schema_migrations'
+LOCK_TIMEOUT = 60
+
+# ER_BINLOG_CREATE_ROUTINE_NEED_SUPER: com o binlog ligado (padrão no MySQL 8),
+# CREATE TRIGGER exige SUPER ou log_bin_trust_function_creators
+BINLOG_TRIGGER_ERRNO = 1419
+BINLOG_TRIGGER_HINT = (
+    "com o binlog ligado o usuário precisa de SUPER para criar os triggers; "
+    "ou ligue log_bin_trust_function_creators (SET GLOBAL log_bin_trust_function_creators = 1 "
+    "ou --log-bin-trust-function-creators=1 no mysqld)"
+)
+
+
+class MigrationError(RuntimeError):
+    """Migração não pôde ser aplicada"""
+
+
+def session_config(config):
+    """Configuração para a conexão das migrações (sem os timeouts de sessão das queries)"""
+    return {k: v for k, v in config.items() if k != 'init_command'}
+
+
+def index_exists(cursor, table, name):
+    cursor.execute(
+        "SELECT 1 FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s LIMIT 1",
+        (table, name)
+    )
+    return cursor.fetchone() is not None
+
+
+def add_index(cursor, table, name, definition):
+    if not index_exists(cursor, table, name):
+        cursor.execute(f"ALTER TABLE {table} ADD {definition}")
+
+
+def drop_index(cursor, table, name):
+    if index_exists(cursor, table, name):
+        cursor.execute(f"ALTER TABLE {table} DROP INDEX {name}")
+
+
+def _carro(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS carro (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            modelo VARCHAR(255) NOT NULL UNIQUE,
+            preco DECIMAL(12, 2) NOT NULL,
+            image VARCHAR(500),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+
+
+def _indices_catalogo(cursor):
+    # idx_modelo repete o índice do UNIQUE(modelo); só sai se o UNIQUE existir
+    cursor.execute(
+        "SELECT 1 FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'carro' AND COLUMN_NAME = 'modelo' "
+        "AND SEQ_IN_INDEX = 1 AND NON_UNIQUE = 0 LIMIT 1"
+    )
+    if cursor.fetchone() is not None:
+        drop_index(cursor, 'carro', 'idx_modelo')
+    add_index(cursor, 'carro', 'idx_preco_id', 'INDEX idx_preco_id (preco, id)')
+    add_index(cursor, 'carro', 'idx_updated_id', 'INDEX idx_updated_id (updated_at, id)')
+    add_index(cursor, 'carro', 'ft_modelo', 'FULLTEXT INDEX ft_modelo (modelo)')
+
+
+def _historico_precos(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS carro_preco_historico (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            carro_id INT NOT NULL,
+            modelo VARCHAR(255) NOT NULL,
+            preco DECIMAL(12, 2) NOT NULL,
+            changed_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+            INDEX idx_modelo_changed (modelo, changed_at, preco)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+    # os triggers cobrem qualquer escrita (rotas, write-behind, lote, SQL manual)
+    create_history_triggers(cursor)
+    # ponto de partida: o preço atual de cada carro
+    cursor.execute("SELECT 1 FROM carro_preco_historico LIMIT 1")
+    if cursor.fetchone() is None:
+        backfill_history(cursor)
+
+
+def drop_history_triggers(cursor):
+    cursor.execute("DROP TRIGGER IF EXISTS carro_preco_historico_ai")
+    cursor.execute("DROP TRIGGER IF EXISTS carro_preco_historico_au")
+
+
+def create_history_triggers(cursor):
+    """(Re)cria os triggers do histórico de preços"""
+    drop_history_triggers(cursor)
+    cursor.execute("""
+        CREATE TRIGGER carro_preco_historico_ai AFTER INSERT ON carro FOR EACH ROW
+        INSERT INTO carro_preco_historico (carro_id, modelo, preco)
+        VALUES (NEW.id, NEW.modelo, NEW.preco)
+    """)
+    cursor.execute("""
+        CREATE TRIGGER carro_preco_historico_au AFTER UPDATE ON carro FOR EACH ROW
+        INSERT INTO carro_preco_historico (carro_id, modelo, preco)
+        SELECT NEW.id, NEW.modelo, NEW.preco FROM DUAL WHERE NOT (OLD.preco <=> NEW.preco)
+    """)
+
+
+def backfill_history(cursor):
+    """Um ponto no histórico com o preço atual de cada carro"""
+    cursor.execute("""
+        INSERT INTO carro_preco_historico (carro_id, modelo, preco, changed_at)
+        SELECT id, modelo, preco, updated_at FROM carro
+    """)
+
+
+# (versão, descrição, função) — nunca altere uma versão já publicada, crie outra
+MIGRATIONS = (
+    (1, 'tabela carro', _carro),
+    (2, 'índices do catálogo: (preco, id), (updated_at, id), FULLTEXT(modelo)', _indices_catalogo),
+    (3, 'histórico de preços (carro_preco_historico + triggers)', _historico_precos),
+)
+
+
+def _ensure_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+
+
+def applied_versions(connection):
+    cursor = connection.cursor()
+    try:
+        _ensure_table(cursor)
+        cursor.execute("SELECT version FROM schema_migrations")
+        return {row[0] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def apply_migrations(connection, log=print):
+    """Aplica as migrações pendentes em ordem; retorna as versões aplicadas"""
+    cursor = connection.cursor()
+    try:
+        _ensure_table(cursor)
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            raise MigrationError(f"Outro processo está migrando o banco (lock {LOCK_NAME})")
+        try:
+            # relido com o lock: outro host pode ter acabado de migrar
+            cursor.execute("SELECT version FROM schema_migrations")
+            applied = {row[0] for row in cursor.fetchall()}
+            done = []
+            for version, name, migrate in MIGRATIONS:
+                if version in applied:
+                    continue
+                try:
+                    migrate(cursor)
+                    cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                                   (version, name))
+                    connection.commit()
+                except mysql.connector.Error as e:
+                    hint = f"; {BINLOG_TRIGGER_HINT}" if e.errno == BINLOG_TRIGGER_ERRNO else ''
+                    raise MigrationError(f"Migração {version:03d} ({name}) falhou: {e}{hint}")
+                log(f"✓ Migração {version:03d} aplicada: {name}")
+                done.append(version)
+            return done
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Migrações do schema do AutoPrime')
+    parser.add_argument('command', choices=('status', 'migrate', 'explain'))
+    args = parser.parse_args(argv)
+
+    db_config = {
+        'host': os.environ.get('DB_HOST', 'localhost'),
+        'port': int(os.environ.get('DB_PORT', 3306)),
+        'database': os.environ.get('DB_NAME', 'carros'),
+        'user': os.environ.get('DB_USER', 'root'),
+        'password': os.environ.get('DB_PASSWORD', 'root'),
+        'charset': 'utf8mb4',
+        'collation': 'utf8mb4_unicode_ci'
+    }
+    try:
+        connection = mysql.connector.connect(**db_config)
+    except mysql.connector.Error as e:
+        print(f"✗ Erro ao conectar ao banco de dados: {e}")
+        return 1
+    try:
+        if args.command == 'status':
+            applied = applied_versions(connection)
+            for version, name, _ in MIGRATIONS:
+                mark = '✓' if version in applied else '·'
+                print(f"{mark} {version:03d} {name}")
+            return 0
+        if args.command == 'migrate':
+            done = apply_migrations(connection)
+            if not done:
+                print("✓ Schema atualizado, nenhuma migração pendente")
+            return 0
+
+        failures = 0
+        for name, ok, expected, plan in catalog.check_plans(connection):
+            row = plan[0] if plan else {}
+            print(f"{'✓' if ok else '✗'} {name}: key={row.get('key')} (esperado {expected}), "
+                  f"type={row.get('type')}, rows={row.get('rows')}, extra={row.get('Extra')}")
+            failures += not ok
+        if failures:
+            print("⚠ Em tabelas pequenas o otimizador pode preferir o scan completo; confira com "
+                  "carga no banco do benchmark (python benchmark.py seed, que popula o BENCH_DB_NAME, "
+                  "padrão carros_bench, e DB_NAME=carros_bench python migrations.py explain)")
+        return 1 if failures else 0
+    except MigrationError as e:
+        print(f"✗ {e}")
+        return 1
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Histórico de preços (carro_preco_historico) e séries agregadas
+
+Os triggers criados na migração 003 registram o preço de cada INSERT e de
+cada UPDATE que muda o preço, venha a escrita de qualquer rota, do
+write-behind, da carga em lote ou de fora do app. O índice
+(modelo, changed_at, preco) cobre a consulta: cada modelo é um range scan
+só no índice.
+
+/api/precoHistorico agrega no MySQL (GROUP BY por bucket de tempo) e
+devolve um ponto por modelo e bucket:
+
+    {"modelo": "Civic", "t": 1719792000, "min": 149000.0, "max": 152000.0,
+     "avg": 150500.0, "count": 3}
+
+t é o início do bucket em segundos Unix (UTC).
+"""
+
+import math
+import re
+import time
+from datetime import datetime, timezone
+
+TABLE = 'carro_preco_historico'
+
+# buckets "redondos" usados quando bucket não é informado
+NICE_BUCKETS = (60, 300, 900, 3600, 6 * 3600, 86400, 7 * 86400, 30 * 86400)
+UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+DEFAULT_RANGE = 90 * 86400
+
+_BUCKET = re.compile(r'^(\d+)([smhdw]?)$')
+
+
+def parse_bucket(value):
+    """Segundos do bucket ('3600', '15m', '1h', '1d', '1w'); None se inválido"""
+    match = _BUCKET.match(value.strip().lower())
+    if not match:
+        return None
+    seconds = int(match.group(1)) * UNITS[match.group(2) or 's']
+    return seconds if seconds > 0 else None
+
+
+def parse_time(value):
+    """ISO 8601 (sem fuso = UTC) ou segundos Unix; retorna segundos Unix ou None"""
+    try:
+        seconds = float(value)
+    except ValueError:
+        pass
+    else:
+        return seconds if math.isfinite(seconds) else None
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def default_bucket(seconds, points):
+    """Menor bucket redondo que divide o intervalo em até points buckets"""
+    target = seconds / points
+    for bucket in NICE_BUCKETS:
+        if bucket >= target:
+            return bucket
+    return int(math.ceil(target))
+
+
+def parse_args(args, max_modelos, default_points):
+    """Valida modelo/from/to/bucket; retorna (consulta, mensagem de erro)"""
+    modelos = []
+    for value in args.getlist('modelo'):
+        if value and value not in modelos:
+            modelos.append(value)
+    if not modelos:
+        return None, 'Informe ao menos um modelo'
+    if len(modelos) > max_modelos:
+        return None, f'Máximo de {max_modelos} modelos por consulta'
+
+    erro = 'from e to devem ser datas ISO 8601 (ou segundos Unix) com from < to'
+    end = parse_time(args['to']) if 'to' in args else time.time()
+    if end is None:
+        return None, erro
+    start = parse_time(args['from']) if 'from' in args else end - DEFAULT_RANGE
+    if start is None or not start < end:
+        return None, erro
+
+    if 'bucket' in args:
+        bucket = parse_bucket(args['bucket'])
+        if bucket is None:
+            return None, 'bucket deve ser um intervalo como 3600, 15m, 1h, 1d ou 1w'
+    else:
+        bucket = default_bucket(end - start, default_points)
+    return {'modelos': modelos, 'start': start, 'end': end, 'bucket': bucket}, None
+
+
+def estimated_points(query):
+    """Máximo de pontos da resposta (buckets no intervalo x modelos)"""
+    start, end, bucket = query['start'], query['end'], query['bucket']
+    buckets = math.floor(end / bucket) - math.floor(start / bucket) + 1
+    return buckets * len(query['modelos'])
+
+
+def build_sql(query):
+    """SELECT agregado por modelo e bucket, em ordem de modelo e tempo"""
+    placeholders = ', '.join(['%s'] * len(query['modelos']))
+    bucket = query['bucket']
+    sql = (
+        "SELECT modelo, CAST(FLOOR(UNIX_TIMESTAMP(changed_at) / %s) AS SIGNED) * %s AS t, "
+        "MIN(preco) AS `min`, MAX(preco) AS `max`, AVG(preco) AS `avg`, COUNT(*) AS `count` "
+        f"FROM {TABLE} "
+        f"WHERE modelo IN ({placeholders}) "
+        "AND changed_at >= FROM_UNIXTIME(%s) AND changed_at < FROM_UNIXTIME(%s) "
+        "GROUP BY modelo, t ORDER BY modelo, t"
+    )
+    return sql, (bucket, bucket, *query['modelos'], query['start'], query['end'])
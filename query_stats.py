@@ -0,0 +1,164 @@
+"""
+Estatísticas por query e log de queries lentas
+
+Registrado como hook do pool (e chamado pelo asgi.py), agrega por
+fingerprint — o SQL sem literais e com listas IN colapsadas — o número de
+execuções, erros, tempo, linhas e as rotas que executaram o comando. Comandos
+acima do limite vão para o log e para um buffer circular; o EXPLAIN da
+última amostra de cada fingerprint é executado só quando pedido no
+/debug/queries. Os dados são do processo (cada worker tem os seus).
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|%\(\w+\)s')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_VALUES_LIST = re.compile(r'\bVALUES\s*(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*',
+                          re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE')
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement):
+    """SQL normalizado: literais e placeholders viram ?, listas IN (?, ...) colapsam"""
+    sql = _SPACES.sub(' ', statement).strip().rstrip(';')
+    sql = _STRING.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _VALUES_LIST.sub(lambda m: f"VALUES {m.group(1)}", sql)
+
+
+def fingerprint_id(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+
+
+class QueryStats:
+    """Agregados por fingerprint e buffer das queries lentas"""
+
+    def __init__(self, slow_ms=200.0, slow_log_size=200, max_fingerprints=500,
+                 route_of=None, enabled=True):
+        self.slow_ms = slow_ms
+        self.max_fingerprints = max_fingerprints
+        self.route_of = route_of or (lambda: 'background')
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._slow = deque(maxlen=slow_log_size)
+        self._dropped = 0
+        self._since = time.time()
+
+    def hook(self, statement, params, duration, cursor, error):
+        """Hook do ConnectionPool: hook(statement, params, duração, cursor, erro)"""
+        if not self.enabled:
+            return
+        rows = getattr(cursor, 'rowcount', -1) if error is None else -1
+        self.record(statement, params, duration, rows, self.route_of(), error)
+
+    def record(self, statement, params, duration, rows, route, error=None):
+        if not self.enabled:
+            return
+        text = fingerprint(statement)
+        duration_ms = duration * 1000
+        with self._lock:
+            entry = self._stats.get(text)
+            if entry is None:
+                if len(self._stats) >= self.max_fingerprints:
+                    self._dropped += 1
+                    return
+                entry = self._stats[text] = {
+                    'id': fingerprint_id(text), 'fingerprint': text, 'count': 0, 'errors': 0,
+                    'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'slow': 0, 'routes': {},
+                    'sample': None,
+                }
+            entry['count'] += 1
+            entry['total_ms'] += duration_ms
+            if duration_ms > entry['max_ms']:
+                entry['max_ms'] = duration_ms
+            if rows and rows > 0:
+                entry['rows'] += rows
+            if error is not None:
+                entry['errors'] += 1
+            entry['routes'][route] = entry['routes'].get(route, 0) + 1
+            # última amostra executável (para o EXPLAIN sob demanda);
+            # de um executemany guarda só a primeira linha
+            if isinstance(params, list) and params and isinstance(params[0], (list, tuple, dict)):
+                params = params[0]
+            entry['sample'] = (statement, params)
+            slow = duration_ms >= self.slow_ms
+            if slow:
+                entry['slow'] += 1
+                self._slow.append({
+                    'ts': round(time.time(), 3),
+                    'id': entry['id'],
+                    'fingerprint': text,
+                    'duration_ms': round(duration_ms, 3),
+                    'rows': rows,
+                    'route': route,
+                    'error': str(error) if error is not None else None,
+                })
+        if slow:
+            print(f"[slow-query] {duration_ms:.1f}ms rows={rows} route={route} {text}")
+
+    def snapshot(self, limit=50):
+        """Fingerprints ordenados por tempo total e as queries lentas recentes"""
+        with self._lock:
+            entries = sorted(self._stats.values(), key=lambda e: e['total_ms'], reverse=True)[:limit]
+            fingerprints = [
+                {
+                    'id': e['id'], 'fingerprint': e['fingerprint'], 'count': e['count'],
+                    'errors': e['errors'], 'slow': e['slow'], 'rows': e['rows'],
+                    'total_ms': round(e['total_ms'], 3),
+                    'avg_ms': round(e['total_ms'] / e['count'], 3) if e['count'] else 0.0,
+                    'max_ms': round(e['max_ms'], 3),
+                    'routes': dict(e['routes']),
+                }
+                for e in entries
+            ]
+            slow = list(self._slow)
+        return {
+            'since': round(self._since, 3),
+            'slow_ms': self.slow_ms,
+            'fingerprints': fingerprints,
+            'dropped': self._dropped,
+            'slow': slow[::-1],
+        }
+
+    def sample(self, fingerprint_id_):
+        """(statement, params) da última execução do fingerprint, ou None"""
+        with self._lock:
+            for entry in self._stats.values():
+                if entry['id'] == fingerprint_id_:
+                    return entry['sample']
+        return None
+
+    def explain(self, connection, fingerprint_id_):
+        """EXPLAIN da última amostra do fingerprint; None se não existir"""
+        sample = self.sample(fingerprint_id_)
+        if sample is None:
+            return None
+        statement, params = sample
+        if statement.lstrip().split(None, 1)[0].upper() not in EXPLAINABLE:
+            raise ValueError('Comando não suporta EXPLAIN')
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute(f"EXPLAIN {statement}", params or ())
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+            self._dropped = 0
+            self._since = time.time()
@@ -0,0 +1,258 @@
+"""
+Limite de requisições por cliente e controle de admissão
+
+Cada cliente (chave de API conhecida ou IP) tem um token bucket por rota:
+a rota tem a sua taxa e rajada (as pesadas, como listagem e upload, mais
+restritas) e as outras usam o limite padrão. Os buckets ficam numa tabela
+em memória compartilhada, criada antes do fork pelo preload_app, então o
+limite vale para o cliente no servidor todo e não por worker. Cada linha da
+tabela tem WAYS posições; um cliente novo ocupa a posição usada há mais tempo.
+
+O InFlight soma as requisições em andamento de todos os workers e recusa as
+novas acima do limite global (503), antes de todas as threads ocuparem.
+
+Formato dos limites: <quantidade>/<s|m|h>[:<rajada>], ex.: 5/s:10 ou 10/m.
+"""
+
+import hashlib
+import math
+import multiprocessing
+import os
+import threading
+import time
+
+UNITS = {'s': 1, 'm': 60, 'h': 3600}
+
+RATE_LIMITED = 'rate_limit'
+OVERLOADED = 'overload'
+
+
+class Rejected(RuntimeError):
+    """Requisição recusada: status 429 (limite do cliente) ou 503 (sobrecarga)"""
+
+    def __init__(self, status, reason, retry_after, message):
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+def parse_limit(spec):
+    """'5/s:10' -> (fichas por segundo, rajada); None para '0' ou 'off'"""
+    spec = spec.strip().lower()
+    if spec in ('0', 'off', 'none'):
+        return None
+    rate, _, burst = spec.partition(':')
+    count, _, unit = rate.partition('/')
+    if unit not in UNITS:
+        raise ValueError(f"Limite inválido: {spec!r} (use <quantidade>/<s|m|h>[:<rajada>])")
+    count = float(count)
+    burst = float(burst) if burst else max(count, 1.0)
+    if count <= 0 or burst < 1:
+        raise ValueError(f"Limite inválido: {spec!r}")
+    return count / UNITS[unit], burst
+
+
+def parse_routes(spec):
+    """'/rota=5/s:10,/outra=10/m' -> {rota: limite}"""
+    routes = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        route, _, limit = item.partition('=')
+        routes[route.strip()] = parse_limit(limit)
+    return routes
+
+
+class TokenBuckets:
+    """Token buckets de todos os workers numa tabela em memória compartilhada"""
+
+    WAYS = 4
+
+    def __init__(self, slots=65536, stripes=64):
+        self._groups = max(slots // self.WAYS, 1)
+        size = self._groups * self.WAYS
+        # impressão digital do cliente+rota, fichas e última atualização por posição
+        self._keys = multiprocessing.RawArray('Q', size)
+        self._tokens = multiprocessing.RawArray('d', size)
+        self._updated = multiprocessing.RawArray('d', size)
+        self._locks = [multiprocessing.Lock() for _ in range(stripes)]
+
+    @staticmethod
+    def _fingerprint(key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') or 1
+
+    def take(self, key, rate, burst, cost=1.0):
+        """
+        Tira cost fichas do bucket (cost negativo devolve).
+        Retorna 0.0 se havia fichas, senão os segundos até haver.
+        """
+        fingerprint = self._fingerprint(key)
+        group = fingerprint % self._groups
+        first = group * self.WAYS
+        keys, tokens, updated = self._keys, self._tokens, self._updated
+        # CLOCK_MONOTONIC é o mesmo para todos os processos da máquina
+        now = time.monotonic()
+        with self._locks[group % len(self._locks)]:
+            index = None
+            oldest = first
+            for i in range(first, first + self.WAYS):
+                if keys[i] == fingerprint:
+                    index = i
+                    break
+                if updated[i] < updated[oldest]:
+                    oldest = i
+            if index is None:
+                index = oldest
+                keys[index] = fingerprint
+                available = burst
+            else:
+                available = min(burst, tokens[index] + (now - updated[index]) * rate)
+            updated[index] = now
+            if available >= cost:
+                tokens[index] = min(burst, available - cost)
+                return 0.0
+            tokens[index] = available
+            return (cost - available) / rate
+
+
+class InFlight:
+    """Requisições em andamento somadas entre os workers"""
+
+    def __init__(self, limit, processes=256):
+        self.limit = limit
+        self._lock = multiprocessing.Lock()
+        self._total = multiprocessing.RawValue('l', 0)
+        # quanto cada processo contribui, para descontar um worker que morreu
+        self._pids = multiprocessing.RawArray('l', processes)
+        self._counts = multiprocessing.RawArray('l', processes)
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._slot = None
+
+    def _own_slot(self):
+        """Posição deste processo (chamado com o lock)"""
+        if self._pid != os.getpid():
+            self._reset()
+        if self._slot is None:
+            for i, pid in enumerate(self._pids):
+                if pid in (0, self._pid):
+                    self._pids[i] = self._pid
+                    self._slot = i
+                    break
+            else:
+                self._slot = -1
+        return self._slot
+
+    def enter(self):
+        """Conta a requisição; False se o limite global já foi atingido"""
+        with self._lock:
+            if self.limit and self._total.value >= self.limit:
+                return False
+            self._total.value += 1
+            slot = self._own_slot()
+            if slot >= 0:
+                self._counts[slot] += 1
+        return True
+
+    def leave(self):
+        with self._lock:
+            self._total.value -= 1
+            slot = self._own_slot()
+            if slot >= 0:
+                self._counts[slot] -= 1
+
+    def release_process(self, pid):
+        """Desconta as requisições de um worker que saiu (child_exit do Gunicorn)"""
+        with self._lock:
+            for i, owner in enumerate(self._pids):
+                if owner == pid:
+                    self._total.value -= self._counts[i]
+                    self._counts[i] = 0
+                    self._pids[i] = 0
+
+    @property
+    def value(self):
+        return self._total.value
+
+
+class AdmissionControl:
+    """Token bucket por cliente e rota mais o limite global de requisições em andamento"""
+
+    def __init__(self, default_limit, route_limits, max_in_flight=0, api_keys=(),
+                 proxy_hops=0, enabled=True, on_reject=None):
+        self.default_limit = default_limit
+        self.route_limits = route_limits
+        self.enabled = enabled
+        self.proxy_hops = proxy_hops
+        self.on_reject = on_reject
+        # só as chaves configuradas identificam o cliente: uma chave inventada não escapa do limite por IP
+        self._api_keys = {key: hashlib.sha256(key.encode('utf-8')).hexdigest()[:16] for key in api_keys}
+        self.buckets = TokenBuckets()
+        self.in_flight = InFlight(max_in_flight)
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._rejected = {RATE_LIMITED: 0, OVERLOADED: 0}
+
+    def client_id(self, api_key, remote_addr, forwarded_for=None):
+        """Chave de API conhecida ou IP (o do X-Forwarded-For atrás de proxy_hops proxies)"""
+        if api_key and api_key in self._api_keys:
+            return f"key:{self._api_keys[api_key]}"
+        if self.proxy_hops and forwarded_for:
+            hops = [hop.strip() for hop in forwarded_for.split(',')]
+            if len(hops) >= self.proxy_hops:
+                return f"ip:{hops[-self.proxy_hops]}"
+        return f"ip:{remote_addr}"
+
+    def limit_for(self, route):
+        return self.route_limits.get(route, self.default_limit)
+
+    def _reject(self, route, status, reason, retry_after, message):
+        with self._lock:
+            self._rejected[reason] += 1
+        if self.on_reject is not None:
+            self.on_reject(route, reason)
+        raise Rejected(status, reason, retry_after, message)
+
+    def admit(self, route, client, track=True):
+        """
+        Tira uma ficha do bucket do cliente na rota e, com track, conta a
+        requisição em andamento (chame done() no fim). Levanta Rejected.
+        """
+        limit = self.limit_for(route) if self.enabled else None
+        if limit is not None:
+            wait = self.buckets.take(f"{route}|{client}", *limit)
+            if wait:
+                retry_after = max(1, math.ceil(wait))
+                self._reject(route, 429, RATE_LIMITED, retry_after,
+                             f"Limite de requisições excedido; tente em {retry_after}s")
+        if track and not self.in_flight.enter():
+            self._reject(route, 503, OVERLOADED, 1, "Servidor sobrecarregado; tente novamente em instantes")
+
+    def done(self):
+        """Fim de uma requisição admitida com track=True"""
+        self.in_flight.leave()
+
+    def refund(self, route, client):
+        """Devolve a ficha de uma requisição que será admitida de novo (repasse do asgi.py)"""
+        limit = self.limit_for(route) if self.enabled else None
+        if limit is not None:
+            self.buckets.take(f"{route}|{client}", *limit, cost=-1.0)
+
+    def stats(self):
+        with self._lock:
+            rejected = dict(self._rejected)
+        return {
+            'enabled': self.enabled,
+            'in_flight': self.in_flight.value,
+            'max_in_flight': self.in_flight.limit,
+            'rejected': rejected,
+            'pid': os.getpid(),
+        }
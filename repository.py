@@ -0,0 +1,181 @@
+"""
+Acesso a dados da tabela carro
+
+Único caminho até o MySQL para as rotas legadas e as /api (app.py) e para
+o flush do write-behind. Os statements são constantes executadas em cursores
+preparados no servidor (um por statement e conexão física, ver
+db_pool.prepared_cursor); consultas com lista IN usam tamanhos fixos
+(potências de 2, completadas repetindo o último valor) para que também
+sejam preparadas uma vez só. As linhas voltam como Carro, uma dataclass com
+__slots__, que o orjson serializa direto.
+"""
+
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Optional, Union
+
+from cache import normalize_modelo
+from db_pool import prepared_cursor
+
+COLUMNS = "id, modelo, preco, image"
+
+SELECT_BY_MODELO = f"SELECT {COLUMNS} FROM carro WHERE modelo = %s"
+SELECT_PAGE = f"SELECT {COLUMNS} FROM carro WHERE id > %s ORDER BY id LIMIT %s"
+SELECT_ALL = f"SELECT {COLUMNS} FROM carro ORDER BY id"
+SELECT_VERSION = "SELECT COUNT(*), MAX(updated_at) FROM carro"
+SELECT_COUNT = "SELECT COUNT(*) FROM carro"
+INSERT = "INSERT INTO carro (modelo, preco, image) VALUES (%s, %s, %s)"
+UPDATE_PRECO = "UPDATE carro SET preco = %s WHERE modelo = %s"
+DELETE = "DELETE FROM carro WHERE modelo = %s"
+
+
+@dataclass
+class Carro:
+    """Linha da tabela carro (instâncias do cache são compartilhadas: não altere)"""
+    # declarado à mão (e não slots=True) para rodar também antes do Python 3.10
+    __slots__ = ('id', 'modelo', 'preco', 'image')
+    id: int
+    modelo: str
+    preco: Union[Decimal, float]
+    image: Optional[str]
+
+    def __getitem__(self, name):
+        # leitura como dict, para o código que também recebe linhas do snapshot
+        return getattr(self, name)
+
+
+_in_statements = {}
+
+
+def in_statement(template, count):
+    """Statement com IN de tamanho fixo (mesmo objeto str para o mesmo tamanho)"""
+    key = (template, count)
+    statement = _in_statements.get(key)
+    if statement is None:
+        statement = _in_statements[key] = template.format(', '.join(['%s'] * count))
+    return statement
+
+
+def in_chunks(values, max_chunk):
+    """Divide values em blocos de até max_chunk, completados até uma potência de 2"""
+    for i in range(0, len(values), max_chunk):
+        chunk = list(values[i:i + max_chunk])
+        size = 1
+        while size < len(chunk):
+            size *= 2
+        yield chunk + [chunk[-1]] * (min(size, max_chunk) - len(chunk))
+
+
+class CarroRepository:
+    """Operações da tabela carro sobre o pool (connect = get_db_connection)"""
+
+    SELECT_IN = f"SELECT {COLUMNS} FROM carro WHERE modelo IN ({{}})"
+    LOCK_IN = "SELECT modelo FROM carro WHERE modelo IN ({}) FOR UPDATE"
+
+    def __init__(self, connect, in_chunk=200):
+        self.connect = connect
+        self.in_chunk = in_chunk
+
+    def get(self, modelo):
+        """Carro pelo modelo (collation do banco) ou None"""
+        with self.connect() as conn:
+            cursor = prepared_cursor(conn, SELECT_BY_MODELO)
+            cursor.execute(SELECT_BY_MODELO, (modelo,))
+            rows = cursor.fetchall()
+        return Carro(*rows[0]) if rows else None
+
+    def get_many(self, modelos):
+        """{modelo normalizado: Carro} dos modelos que existem"""
+        found = {}
+        with self.connect() as conn:
+            for chunk in in_chunks(modelos, self.in_chunk):
+                statement = in_statement(self.SELECT_IN, len(chunk))
+                cursor = prepared_cursor(conn, statement)
+                cursor.execute(statement, chunk)
+                for row in cursor.fetchall():
+                    carro = Carro(*row)
+                    found[normalize_modelo(carro.modelo)] = carro
+        return found
+
+    def page(self, after_id, limit):
+        """Até limit carros com id > after_id, em ordem de id"""
+        with self.connect() as conn:
+            cursor = prepared_cursor(conn, SELECT_PAGE)
+            cursor.execute(SELECT_PAGE, (after_id, limit))
+            return [Carro(*row) for row in cursor.fetchall()]
+
+    def all(self):
+        """A tabela inteira em ordem de id"""
+        with self.connect() as conn:
+            cursor = prepared_cursor(conn, SELECT_ALL)
+            cursor.execute(SELECT_ALL)
+            return [Carro(*row) for row in cursor.fetchall()]
+
+    def table_version(self):
+        """(total, MAX(updated_at))"""
+        with self.connect() as conn:
+            cursor = prepared_cursor(conn, SELECT_VERSION)
+            cursor.execute(SELECT_VERSION)
+            return tuple(cursor.fetchall()[0])
+
+    def count(self):
+        with self.connect() as conn:
+            cursor = prepared_cursor(conn, SELECT_COUNT)
+            cursor.execute(SELECT_COUNT)
+            return cursor.fetchall()[0][0]
+
+    def insert(self, modelo, preco, image=None):
+        """Insere e retorna o Carro criado (IntegrityError se o modelo existir)"""
+        with self.connect() as conn:
+            cursor = prepared_cursor(conn, INSERT)
+            cursor.execute(INSERT, (modelo, preco, image))
+            conn.commit()
+            return Carro(cursor.lastrowid, modelo, preco, image)
+
+    def update_preco(self, modelo, preco, returning=False):
+        """
+        Atualiza o preço; retorna o número de linhas alteradas ou, com
+        returning=True, o Carro atualizado (None se não existir).
+        """
+        with self.connect() as conn:
+            cursor = prepared_cursor(conn, UPDATE_PRECO)
+            cursor.execute(UPDATE_PRECO, (preco, modelo))
+            conn.commit()
+            changed = cursor.rowcount
+            if not returning:
+                return changed
+            if changed <= 0:
+                return None
+            cursor = prepared_cursor(conn, SELECT_BY_MODELO)
+            cursor.execute(SELECT_BY_MODELO, (modelo,))
+            rows = cursor.fetchall()
+        return Carro(*rows[0]) if rows else None
+
+    def update_precos(self, items):
+        """
+        Aplica [(modelo, preço)] numa transação, travando antes os modelos.
+        Retorna o conjunto dos modelos (normalizados) que existiam.
+        """
+        modelos = [modelo for modelo, _ in items]
+        with self.connect() as conn:
+            existentes = set()
+            for chunk in in_chunks(modelos, self.in_chunk):
+                statement = in_statement(self.LOCK_IN, len(chunk))
+                cursor = prepared_cursor(conn, statement)
+                cursor.execute(statement, chunk)
+                existentes.update(normalize_modelo(row[0]) for row in cursor.fetchall())
+            aplicados = [(preco, modelo) for modelo, preco in items if normalize_modelo(modelo) in existentes]
+            if aplicados:
+                cursor = prepared_cursor(conn, UPDATE_PRECO)
+                for params in aplicados:
+                    cursor.execute(UPDATE_PRECO, params)
+            conn.commit()
+        return existentes
+
+    def delete(self, modelo):
+        """Remove o modelo; retorna True se existia"""
+        with self.connect() as conn:
+            cursor = prepared_cursor(conn, DELETE)
+            cursor.execute(DELETE, (modelo,))
+            conn.commit()
+            return cursor.rowcount > 0
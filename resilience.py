@@ -0,0 +1,196 @@
+"""
+Degradação controlada quando o MySQL está lento ou fora do ar
+
+O CircuitBreaker conta, numa janela deslizante, as chamadas ao banco que
+falharam por indisponibilidade (conexão recusada ou perdida, timeout, pool
+esgotado). Passando da taxa de erro configurada o circuito abre e as
+chamadas seguintes falham na hora com CircuitOpen, sem ocupar o worker.
+Depois de open_seconds uma única chamada de teste é liberada (half-open):
+se der certo o circuito fecha, senão abre de novo.
+
+Enquanto isso as leituras são atendidas com os últimos dados bons (cache
+por modelo e StaleResponses para a listagem), marcadas como desatualizadas.
+O estado é de cada processo, como o pool de conexões.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# códigos do MySQL que indicam banco indisponível ou sobrecarregado
+UNAVAILABLE_ERRNOS = {
+    1040,  # too many connections
+    1205,  # lock wait timeout
+    2002, 2003, 2005,  # conexão recusada / host desconhecido
+    2006, 2013, 2055,  # conexão perdida
+    3024,  # max_execution_time excedido
+}
+
+
+class CircuitOpen(RuntimeError):
+    """Circuito aberto: o banco não é chamado até retry_after segundos"""
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f"Banco de dados indisponível (circuito aberto); tente em {retry_after}s")
+
+
+class CircuitBreaker:
+    """Circuit breaker por taxa de erro numa janela de window segundos"""
+
+    def __init__(self, failure_rate=0.5, min_calls=10, window=10.0, open_seconds=5.0, enabled=True):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self.enabled = enabled
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        # [segundo, sucessos, falhas]
+        self._buckets = deque()
+        self._opened_at = 0.0
+        self._probing = False
+        self._opens = 0
+        self._rejected = 0
+
+    def _trim(self, now):
+        while self._buckets and self._buckets[0][0] <= now - self.window:
+            self._buckets.popleft()
+
+    def _open(self, now):
+        self._state = OPEN
+        self._opened_at = now
+        self._probing = False
+        self._buckets.clear()
+        self._opens += 1
+        print(f"[circuit-breaker] aberto por {self.open_seconds}s (pid {os.getpid()})")
+
+    def retry_after(self):
+        """Segundos (inteiros, no mínimo 1) até a próxima chamada de teste"""
+        remaining = self._opened_at + self.open_seconds - time.monotonic()
+        return max(1, int(remaining + 0.999))
+
+    def allow(self):
+        """Libera a chamada ou levanta CircuitOpen; chame record() ao terminar"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self._rejected += 1
+        raise CircuitOpen(self.retry_after())
+
+    def record(self, ok):
+        """Resultado da chamada: True, False (indisponível) ou None (não conta)"""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self._state != CLOSED:
+                if not self._probing:
+                    return
+                if ok is None:
+                    self._probing = False
+                elif ok:
+                    self._state = CLOSED
+                    self._probing = False
+                    self._buckets.clear()
+                    print(f"[circuit-breaker] fechado (pid {os.getpid()})")
+                else:
+                    self._open(now)
+                return
+            if ok is None:
+                return
+            second = int(now)
+            if not self._buckets or self._buckets[-1][0] != second:
+                self._buckets.append([second, 0, 0])
+            self._buckets[-1][1 if ok else 2] += 1
+            self._trim(now)
+            if not ok:
+                failures = sum(b[2] for b in self._buckets)
+                calls = failures + sum(b[1] for b in self._buckets)
+                if calls >= self.min_calls and failures / calls >= self.failure_rate:
+                    self._open(now)
+
+    def is_open(self):
+        """True enquanto as chamadas estão sendo recusadas (sem teste liberado)"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                return self._probing
+            return self._state == OPEN and time.monotonic() - self._opened_at < self.open_seconds
+
+    def stats(self):
+        with self._lock:
+            self._trim(time.monotonic())
+            failures = sum(b[2] for b in self._buckets)
+            calls = failures + sum(b[1] for b in self._buckets)
+            return {
+                'enabled': self.enabled,
+                'state': self._state,
+                'calls': calls,
+                'failures': failures,
+                'failure_rate': round(failures / calls, 4) if calls else 0.0,
+                'opens': self._opens,
+                'rejected': self._rejected,
+                'retry_after': self.retry_after() if self._state != CLOSED else None,
+            }
+
+
+class StaleResponses:
+    """Últimos corpos bons por chave (LRU limitado em bytes) para servir com o banco fora"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        # chave -> (corpo, headers, gravado_em)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._served = 0
+
+    def put(self, key, body, headers=None):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[0])
+            self._entries[key] = (body, dict(headers or {}), time.monotonic())
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, (old, _, _) = self._entries.popitem(last=False)
+                self._bytes -= len(old)
+
+    def get(self, key):
+        """(corpo, headers, idade em segundos) ou None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self._served += 1
+            body, headers, stored_at = entry
+        return body, headers, time.monotonic() - stored_at
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'served': self._served}
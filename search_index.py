@@ -0,0 +1,179 @@
+"""
+Índice de busca em memória sobre modelo e id
+
+- Consultas curtas (< 3 caracteres): prefixo de palavra via lista ordenada + bisect.
+- Consultas maiores: substring via índice de trigramas, confirmada no texto.
+
+O índice é carregado do banco no primeiro uso e depois atualizado
+incrementalmente pelos eventos do feed de alterações (de qualquer worker).
+"""
+
+import threading
+from bisect import bisect_left, insort
+
+from cache import normalize_modelo
+
+SORT_FIELDS = ('modelo', 'preco', 'id')
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class CarroSearchIndex:
+    """Índice de prefixo/trigramas com filtros de preço e ordenação"""
+
+    def __init__(self, load_all, load_modelos, feed):
+        # load_all() -> linhas {id, modelo, preco, image}
+        # load_modelos(modelos) -> as mesmas linhas só para os modelos pedidos
+        self._load_all = load_all
+        self._load_modelos = load_modelos
+        self._feed = feed
+        self._reader = None
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._rows = {}
+        self._words = []
+        self._trigram_keys = {}
+
+    # manutenção do índice
+
+    @staticmethod
+    def _text(row):
+        return f"{normalize_modelo(row['modelo'])} {row['id']}"
+
+    def _add(self, key, row, sorted_words=True):
+        self._rows[key] = row
+        text = self._text(row)
+        for word in set(text.split()):
+            if sorted_words:
+                insort(self._words, (word, key))
+            else:
+                self._words.append((word, key))
+        for trigram in _trigrams(text):
+            self._trigram_keys.setdefault(trigram, set()).add(key)
+
+    def _remove(self, key):
+        row = self._rows.pop(key, None)
+        if row is None:
+            return
+        text = self._text(row)
+        for word in set(text.split()):
+            i = bisect_left(self._words, (word, key))
+            if i < len(self._words) and self._words[i] == (word, key):
+                del self._words[i]
+        for trigram in _trigrams(text):
+            keys = self._trigram_keys.get(trigram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._trigram_keys[trigram]
+
+    @staticmethod
+    def _row(row):
+        return {
+            'id': row['id'],
+            'modelo': row['modelo'],
+            'preco': float(row['preco']) if row.get('preco') is not None else None,
+            'image': row.get('image'),
+        }
+
+    def _put(self, row):
+        row = self._row(row)
+        key = normalize_modelo(row['modelo'])
+        self._remove(key)
+        self._add(key, row)
+
+    def _rebuild(self):
+        # posiciona o leitor antes de ler o banco para não perder escritas
+        self._reader = self._feed.reader()
+        rows = {}
+        for row in self._load_all():
+            row = self._row(row)
+            rows[normalize_modelo(row['modelo'])] = row
+        self._rows = {}
+        self._words = []
+        self._trigram_keys = {}
+        # carga inteira: acumula as palavras e ordena uma vez só (insort linha a linha é O(n²))
+        for key, row in rows.items():
+            self._add(key, row, sorted_words=False)
+        self._words.sort()
+        self._loaded = True
+
+    def _apply(self, events):
+        missing = []
+        for event in events:
+            key = normalize_modelo(event['modelo'])
+            if event['action'] == 'deleted':
+                self._remove(key)
+                continue
+            current = self._rows.get(key)
+            if current is None and event.get('id') is None:
+                missing.append(event['modelo'])
+                continue
+            row = dict(current or {}, **{k: event[k] for k in ('id', 'modelo', 'preco', 'image') if k in event})
+            self._put(row)
+        if missing:
+            for row in self._load_modelos(missing):
+                self._put(row)
+
+    def refresh(self):
+        """Carrega o índice ou aplica os eventos pendentes do feed"""
+        with self._lock:
+            if not self._loaded:
+                self._rebuild()
+                return
+            events, reset = self._reader.poll()
+            if reset:
+                self._rebuild()
+            elif events:
+                self._apply(events)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+
+    # consulta
+
+    def _candidates(self, query):
+        if not query:
+            return list(self._rows)
+        if len(query) < 3:
+            keys = []
+            i = bisect_left(self._words, (query,))
+            while i < len(self._words) and self._words[i][0].startswith(query):
+                keys.append(self._words[i][1])
+                i += 1
+            return list(dict.fromkeys(keys))
+
+        sets = [self._trigram_keys.get(trigram) for trigram in _trigrams(query)]
+        if not sets or any(s is None for s in sets):
+            return []
+        sets.sort(key=len)
+        keys = set(sets[0]).intersection(*sets[1:])
+        return [key for key in keys if query in self._text(self._rows[key])]
+
+    def search(self, query='', limit=50, min_preco=None, max_preco=None, sort='modelo', descending=False):
+        """Retorna (total de resultados, página de linhas)"""
+        self.refresh()
+        query = normalize_modelo(query).strip()
+        with self._lock:
+            rows = [self._rows[key] for key in self._candidates(query)]
+        if min_preco is not None:
+            rows = [row for row in rows if row['preco'] is not None and row['preco'] >= min_preco]
+        if max_preco is not None:
+            rows = [row for row in rows if row['preco'] is not None and row['preco'] <= max_preco]
+
+        if sort == 'modelo':
+            rows.sort(key=lambda row: (normalize_modelo(row['modelo']), row['id']), reverse=descending)
+        else:
+            rows.sort(key=lambda row: (row[sort] if row[sort] is not None else 0, row['id']), reverse=descending)
+        return len(rows), [dict(row) for row in rows[:limit]]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'loaded': self._loaded,
+                'rows': len(self._rows),
+                'trigrams': len(self._trigram_keys),
+            }
@@ -50,4 +50,4 @@ echo "👷 Workers: $(python3 -c 'import multiprocessing; print(multiprocessing.
 echo ""
 
 # Iniciar aplicação com Gunicorn
-exec gunicorn -c gunicorn.conf.py app:app
+exec gunicorn -c gunicorn.conf.py
@@ -17,9 +17,32 @@ CREATE TABLE IF NOT EXISTS carro (
     image VARCHAR(500),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    INDEX idx_modelo (modelo)
+    -- mesmos índices da migração 002 (migrations.py); o app aplica as pendentes no startup
+    INDEX idx_preco_id (preco, id),
+    INDEX idx_updated_id (updated_at, id),
+    FULLTEXT INDEX ft_modelo (modelo)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Histórico de preços, preenchido pelos triggers (migração 003 do migrations.py)
+CREATE TABLE IF NOT EXISTS carro_preco_historico (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    carro_id INT NOT NULL,
+    modelo VARCHAR(255) NOT NULL,
+    preco DECIMAL(12, 2) NOT NULL,
+    changed_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+    INDEX idx_modelo_changed (modelo, changed_at, preco)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+DROP TRIGGER IF EXISTS carro_preco_historico_ai;
+CREATE TRIGGER carro_preco_historico_ai AFTER INSERT ON carro FOR EACH ROW
+    INSERT INTO carro_preco_historico (carro_id, modelo, preco)
+    VALUES (NEW.id, NEW.modelo, NEW.preco);
+
+DROP TRIGGER IF EXISTS carro_preco_historico_au;
+CREATE TRIGGER carro_preco_historico_au AFTER UPDATE ON carro FOR EACH ROW
+    INSERT INTO carro_preco_historico (carro_id, modelo, preco)
+    SELECT NEW.id, NEW.modelo, NEW.preco FROM DUAL WHERE NOT (OLD.preco <=> NEW.preco);
+
 -- Inserir dados de exemplo (opcional)
 INSERT IGNORE INTO carro (modelo, preco) VALUES
 ('Toyota Corolla', 125000.00),
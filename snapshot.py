@@ -0,0 +1,387 @@
+"""
+Snapshot binário da tabela carro para nós somente leitura
+
+O exportador (python snapshot.py export) lê a tabela no MySQL e grava um
+arquivo compacto: registros de tamanho fixo ordenados pelo modelo
+normalizado (busca binária), um vetor com a ordem por id (listagem e
+paginação) e um bloco com as strings. O arquivo novo é escrito ao lado e
+trocado com os.replace, então leitores nunca veem um arquivo pela metade.
+
+Com READ_SNAPSHOT=<arquivo> o app mapeia o snapshot com mmap antes do fork
+(as páginas ficam compartilhadas entre os workers) e atende getCarro,
+/api/getCarro e listarCarros sem conexão com o banco. Cada worker confere o
+arquivo a cada check_interval segundos e remapeia quando a versão muda.
+"""
+
+import argparse
+import hashlib
+import heapq
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from datetime import datetime
+
+import catalog
+from cache import normalize_modelo
+
+MAGIC = b'APSNAP01'
+# magic, versão, criado_em, last_modified (epoch, 0 = nenhum), sha1 do conteúdo, total
+HEADER = struct.Struct('<8sQdd20sI')
+# id, preço em centavos, (offset, tamanho) da chave, do modelo e da imagem
+RECORD = struct.Struct('<qqIHIHIH')
+ID_ORDER = struct.Struct('<I')
+NO_IMAGE = 0xFFFF
+
+
+class SnapshotUnavailable(RuntimeError):
+    """Nenhum snapshot válido carregado"""
+
+
+def build_snapshot(rows, version, last_modified=None):
+    """Serializa as linhas {id, modelo, preco, image}; retorna (bytes, sha1)"""
+    by_key = {}
+    for row in rows:
+        by_key[normalize_modelo(row['modelo']).encode('utf-8')] = row
+    keys = sorted(by_key)
+
+    blob = bytearray()
+
+    def put(value):
+        offset = len(blob)
+        blob.extend(value)
+        return offset, len(value)
+
+    records = bytearray()
+    for key in keys:
+        row = by_key[key]
+        key_ref = put(key)
+        modelo_ref = put(row['modelo'].encode('utf-8'))
+        image_ref = put(row['image'].encode('utf-8')) if row.get('image') else (0, NO_IMAGE)
+        cents = int(round(float(row['preco']) * 100))
+        records += RECORD.pack(row['id'], cents, *key_ref, *modelo_ref, *image_ref)
+
+    id_order = sorted(range(len(keys)), key=lambda i: by_key[keys[i]]['id'])
+    order = b''.join(ID_ORDER.pack(i) for i in id_order)
+
+    body = bytes(records) + order + bytes(blob)
+    digest = hashlib.sha1(body).digest()
+    last_modified = last_modified.timestamp() if last_modified else 0.0
+    header = HEADER.pack(MAGIC, version, time.time(), last_modified, digest, len(keys))
+    return header + body, digest
+
+
+class _Mapped:
+    """Um snapshot mapeado (imutável; trocado inteiro no reload)"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        magic, self.version, self.created_at, last_modified, self.digest, self.count = \
+            HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise SnapshotUnavailable(f"Arquivo de snapshot inválido: {path}")
+        self.last_modified = datetime.fromtimestamp(last_modified) if last_modified else None
+        self.records_at = HEADER.size
+        self.order_at = self.records_at + self.count * RECORD.size
+        self.blob_at = self.order_at + self.count * ID_ORDER.size
+        if self.blob_at > len(self.mm):
+            raise SnapshotUnavailable(f"Snapshot truncado: {path}")
+
+    def _record(self, i):
+        return RECORD.unpack_from(self.mm, self.records_at + i * RECORD.size)
+
+    def _string(self, offset, length):
+        start = self.blob_at + offset
+        return self.mm[start:start + length]
+
+    def _row(self, record):
+        id_, cents, _, _, modelo_off, modelo_len, image_off, image_len = record
+        return {
+            'id': id_,
+            'modelo': self._string(modelo_off, modelo_len).decode('utf-8'),
+            'preco': cents / 100,
+            'image': None if image_len == NO_IMAGE else self._string(image_off, image_len).decode('utf-8'),
+        }
+
+    def find(self, key):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            record = self._record(mid)
+            current = self._string(record[2], record[3])
+            if current < key:
+                lo = mid + 1
+            elif current > key:
+                hi = mid
+            else:
+                return self._row(record)
+        return None
+
+    def _id_at(self, position):
+        i = ID_ORDER.unpack_from(self.mm, self.order_at + position * ID_ORDER.size)[0]
+        return i
+
+    def _first_after(self, after_id):
+        """Primeira posição (na ordem por id) com id > after_id"""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._record(self._id_at(mid))[0] <= after_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def page(self, after_id, limit):
+        lo = self._first_after(after_id)
+        end = self.count if limit is None else min(self.count, lo + limit)
+        return [self._row(self._record(self._id_at(p))) for p in range(lo, end)]
+
+    def select(self, query, limit):
+        """
+        Página do catálogo: filtra e ordena pelos campos fixos dos registros
+        (a chave já é o modelo normalizado) e decodifica só as linhas devolvidas
+        """
+        matches = catalog.row_matcher(query)
+        after = catalog.cursor_key(query)
+        descending = query['descending']
+
+        def keep(record):
+            return matches(record[1] / 100, self._string(record[2], record[3]).decode('utf-8'))
+
+        if query['sort'] == 'id':
+            # a ordem por id já está no arquivo: percorre a partir do cursor até limit linhas
+            if descending:
+                start = self.count if after is None else self._first_after(after - 1)
+                positions = range(start - 1, -1, -1)
+            else:
+                positions = range(0 if after is None else self._first_after(after), self.count)
+            selected = []
+            for p in positions:
+                if len(selected) >= limit:
+                    break
+                record = self._record(self._id_at(p))
+                if keep(record):
+                    selected.append(record)
+        else:
+            def key(record):
+                return record[1] / 100, record[0]
+
+            candidates = (self._record(i) for i in range(self.count))
+            if after is not None:
+                if descending:
+                    candidates = (r for r in candidates if key(r) < after)
+                else:
+                    candidates = (r for r in candidates if key(r) > after)
+            pick = heapq.nlargest if descending else heapq.nsmallest
+            selected = pick(limit, filter(keep, candidates), key=key)
+        return [self._row(record) for record in selected]
+
+    def rows(self):
+        return [self._row(self._record(i)) for i in range(self.count)]
+
+
+class SnapshotReader:
+    """Acesso ao snapshot mapeado, com hot reload quando o arquivo é trocado"""
+
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        # chamados (sem argumentos) depois que uma versão nova é carregada
+        self.on_reload = []
+        self._current = None
+        self._error = None
+        self._checked_at = 0.0
+        self._reloads = 0
+        self._lookups = 0
+        self._lock = threading.Lock()
+        self._load()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # o mapeamento herdado continua válido; só o lock é refeito
+        self._lock = threading.Lock()
+        self._reloads = 0
+        self._lookups = 0
+
+    def _load(self):
+        try:
+            mapped = _Mapped(self.path)
+        except (OSError, struct.error, SnapshotUnavailable) as e:
+            self._error = str(e)
+            print(f"Erro ao carregar snapshot: {e}")
+            return
+        previous = self._current
+        self._current = mapped
+        self._error = None
+        if previous is not None and previous.version != mapped.version:
+            self._reloads += 1
+            for callback in self.on_reload:
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"Erro no callback de reload do snapshot: {e}")
+        # o mapeamento anterior é liberado quando as leituras em andamento terminam
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval or not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+            except OSError as e:
+                self._error = str(e)
+                return
+            current = self._current
+            if current is None or current.identity != (stat.st_ino, stat.st_mtime_ns, stat.st_size):
+                self._load()
+        finally:
+            self._lock.release()
+
+    def _snapshot(self):
+        self._maybe_reload()
+        current = self._current
+        if current is None:
+            raise SnapshotUnavailable(f"Snapshot indisponível: {self._error}")
+        return current
+
+    def get(self, modelo):
+        """Carro pelo modelo (mesma normalização da collation) ou None"""
+        self._lookups += 1
+        return self._snapshot().find(normalize_modelo(modelo).encode('utf-8'))
+
+    def page(self, after_id=0, limit=None):
+        """Carros com id > after_id em ordem de id (todos se limit for None)"""
+        return self._snapshot().page(after_id, limit)
+
+    def rows(self):
+        """Todas as linhas (ordem do modelo normalizado)"""
+        return self._snapshot().rows()
+
+    def select(self, query, limit):
+        """Página do catálogo (consulta de catalog.parse_args), sem decodificar o resto"""
+        return self._snapshot().select(query, limit)
+
+    def table_version(self):
+        """(versão, last_modified) no mesmo formato de carro_table_version()"""
+        current = self._snapshot()
+        return f"snapshot:{current.version}:{current.digest.hex()[:12]}", current.last_modified
+
+    def check(self):
+        """Probe de readiness: o snapshot está carregado"""
+        return self._snapshot().version
+
+    def stats(self):
+        current = self._current
+        return {
+            'path': self.path,
+            'loaded': current is not None,
+            'version': current.version if current else None,
+            'count': current.count if current else 0,
+            'bytes': len(current.mm) if current else 0,
+            'age_seconds': round(time.time() - current.created_at, 3) if current else None,
+            'reloads': self._reloads,
+            'lookups': self._lookups,
+            'error': self._error,
+        }
+
+
+# Exportador
+
+def read_header(path):
+    """Cabeçalho do snapshot atual, ou None se não existir/for inválido"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read(HEADER.size)
+        magic, version, _, _, digest, _ = HEADER.unpack(data)
+    except (OSError, struct.error):
+        return None
+    return (version, digest) if magic == MAGIC else None
+
+
+def export_snapshot(connection, path):
+    """
+    Gera o snapshot a partir do MySQL e troca o arquivo atomicamente.
+    Retorna (versão, total) ou None se o conteúdo não mudou.
+    """
+    cursor = connection.cursor(dictionary=True)
+    cursor.execute("SELECT id, modelo, preco, image FROM carro")
+    rows = cursor.fetchall()
+    cursor.execute("SELECT MAX(updated_at) AS last_modified FROM carro")
+    last_modified = cursor.fetchone()['last_modified']
+    cursor.close()
+
+    previous = read_header(path)
+    version = max(time.time_ns() // 1_000_000, previous[0] + 1 if previous else 0)
+    data, digest = build_snapshot(rows, version, last_modified)
+    if previous and previous[1] == digest:
+        return None
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return version, len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Snapshot da tabela carro para o modo READ_SNAPSHOT')
+    sub = parser.add_subparsers(dest='command', required=True)
+    export = sub.add_parser('export', help='exporta o snapshot do MySQL')
+    export.add_argument('--out', default=os.environ.get('READ_SNAPSHOT', 'carros.snapshot'))
+    export.add_argument('--every', type=float, default=0,
+                        help='repete a exportação a cada N segundos (0 = uma vez)')
+    info = sub.add_parser('info', help='mostra versão e total de um snapshot')
+    info.add_argument('path', nargs='?', default=os.environ.get('READ_SNAPSHOT', 'carros.snapshot'))
+    args = parser.parse_args(argv)
+
+    if args.command == 'info':
+        reader = SnapshotReader(args.path)
+        stats = reader.stats()
+        for key, value in stats.items():
+            print(f"{key}: {value}")
+        return 0 if stats['loaded'] else 1
+
+    import mysql.connector
+
+    db_config = {
+        'host': os.environ.get('DB_HOST', 'localhost'),
+        'port': int(os.environ.get('DB_PORT', 3306)),
+        'database': os.environ.get('DB_NAME', 'carros'),
+        'user': os.environ.get('DB_USER', 'root'),
+        'password': os.environ.get('DB_PASSWORD', 'root'),
+        'charset': 'utf8mb4',
+        'collation': 'utf8mb4_unicode_ci'
+    }
+    while True:
+        try:
+            connection = mysql.connector.connect(**db_config)
+            try:
+                result = export_snapshot(connection, args.out)
+            finally:
+                connection.close()
+            if result:
+                print(f"✓ Snapshot {result[0]} gravado em {args.out} ({result[1]} carros)")
+            else:
+                print(f"✓ Snapshot sem alterações ({args.out})")
+        except mysql.connector.Error as e:
+            print(f"✗ Erro ao exportar snapshot: {e}")
+            if not args.every:
+                return 1
+        if not args.every:
+            return 0
+        time.sleep(args.every)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
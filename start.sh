@@ -46,4 +46,4 @@ echo "✓ Conexão com MySQL estabelecida"
 
 # Iniciar aplicação com Gunicorn
 echo "🚀 Iniciando servidor Gunicorn..."
-gunicorn -c gunicorn.conf.py app:app
+gunicorn -c gunicorn.conf.py
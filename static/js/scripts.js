@@ -2,6 +2,14 @@ const API_URL = '';// local proxy (/api)
 
 // dados em memória para renderização e filtro
 let carrosData = [];
+// última lista completa recebida e seu ETag (GET condicional)
+let listaCache = null;
+let listaEtag = null;
+// a tela mostra a lista completa (e não uma busca) — recebe os cards novos
+let exibindoLista = false;
+// alterações em tempo real (/api/events) a partir da posição do feed da lista
+let eventSource = null;
+let feedPosition = null;
 
 document.addEventListener('DOMContentLoaded', () => {
     const container = document.getElementById('carros-container');
@@ -51,20 +59,29 @@ function toggleListarCarros() {
 function listarCarros() {
     console.log('Iniciando a função listarCarros...');
     showSpinner();
-    fetch(`/api/listarCarros`)
+    const headers = {};
+    if (listaEtag && listaCache) headers['If-None-Match'] = listaEtag;
+    fetch(`/api/listarCarros`, { headers, cache: 'no-store' })
         .then(response => {
             hideSpinner();
             console.log('Resposta recebida:', response);
+            // 304: a lista não mudou desde a última resposta
+            if (response.status === 304 && listaCache) return listaCache;
             if (!response.ok) {
                 throw new Error(`Erro ao listar carros: ${response.statusText}`);
             }
+            listaEtag = response.headers.get('ETag');
+            feedPosition = response.headers.get('X-Change-Feed-Position');
             return response.json();
         })
         .then(data => {
             console.log('Dados recebidos da API:', data);
-            carrosData = Array.isArray(data) ? data : [];
+            listaCache = Array.isArray(data) ? data : [];
+            carrosData = listaCache;
+            exibindoLista = true;
             renderCards(carrosData);
             showToast('success', 'Lista atualizada');
+            assinarAlteracoes(feedPosition);
         })
         .catch(error => {
             hideSpinner();
@@ -88,6 +105,7 @@ function getCarro(modelo) {
         .then(data => {
             console.log('Carro encontrado:', data);
             carrosData = Array.isArray(data) ? data : [];
+            exibindoLista = false;
             renderCards(carrosData);
         })
         .catch(error => console.error('Erro ao buscar carro:', error));
@@ -111,7 +129,7 @@ function saveCarro(modelo, preco) {
             body: JSON.stringify({ modelo, preco: precoNum, image: imageFilename })
         })
         .then(response => { hideSpinner(); if(!response.ok) throw new Error('Falha ao salvar'); return response.json(); })
-        .then(data => { console.log('Carro salvo:', data); showToast('success','Carro salvo'); listarCarros(); if(fileInput) fileInput.value=''; })
+        .then(data => { console.log('Carro salvo:', data); showToast('success','Carro salvo'); atualizarAposEscrita(); if(fileInput) fileInput.value=''; })
         .catch(error => { hideSpinner(); console.error('Erro ao salvar carro:', error); showToast('error','Erro ao salvar'); });
     };
 
@@ -145,7 +163,7 @@ function deleteCarro(modelo) {
         .then(data => {
             console.log('Carro deletado:', data);
             showToast('success','Carro deletado');
-            listarCarros();
+            atualizarAposEscrita();
         })
         .catch(error => { hideSpinner(); console.error('Erro ao deletar carro:', error); showToast('error','Erro ao deletar'); });
 }
@@ -170,7 +188,7 @@ function updateCarro(modelo, preco) {
         .then(data => {
             console.log('Carro atualizado:', data);
             showToast('success','Carro atualizado');
-            listarCarros();
+            atualizarAposEscrita();
         })
         .catch(error => { hideSpinner(); console.error('Erro ao atualizar carro:', error); showToast('error','Erro ao atualizar'); });
 }
@@ -207,38 +225,131 @@ function renderCards(list){
         container.innerHTML = '<div class="empty">Nenhum carro encontrado.</div>';
         return;
     }
-    list.forEach(carro => {
-        const div = document.createElement('div');
-        div.className = 'carro-item';
-        const initials = (carro.modelo || '—').split(' ').map(s => s[0]).filter(Boolean).slice(0,2).join('').toUpperCase();
-        const imageUrl = carro.image ? `/static/uploads/${carro.image}` : null;
-        div.innerHTML = `
-            <div class="carro-thumb" aria-hidden="true">
-                ${imageUrl ? `<img src="${escapeHtml(imageUrl)}" alt="${escapeHtml(carro.modelo || 'imagem do carro')}">` : `<span>${escapeHtml(initials)}</span>`}
-            </div>
-            <div class="carro-details">
-                <div class="carro-title"><strong>${escapeHtml(carro.modelo || '—')}</strong></div>
-                <div class="carro-meta">ID: ${carro.id ?? '—'}</div>
-                <div class="carro-price">${formatPrice(carro.preco)}</div>
-            </div>
-        `;
-        container.appendChild(div);
+    list.forEach(carro => container.appendChild(cardElement(carro)));
+}
+
+function cardElement(carro){
+    const div = document.createElement('div');
+    div.className = 'carro-item';
+    div.dataset.key = chaveModelo(carro.modelo);
+    const initials = (carro.modelo || '—').split(' ').map(s => s[0]).filter(Boolean).slice(0,2).join('').toUpperCase();
+    div.innerHTML = `
+        <div class="carro-thumb" aria-hidden="true">
+            ${carro.image ? thumbImgHtml(carro) : `<span>${escapeHtml(initials)}</span>`}
+        </div>
+        <div class="carro-details">
+            <div class="carro-title"><strong>${escapeHtml(carro.modelo || '—')}</strong></div>
+            <div class="carro-meta">ID: ${carro.id ?? '—'}</div>
+            <div class="carro-price">${formatPrice(carro.preco)}</div>
+        </div>
+    `;
+    return div;
+}
+
+// mesma comparação do banco (sem acento, sem caixa, sem espaços à direita)
+function chaveModelo(modelo){
+    return String(modelo ?? '').normalize('NFKD').replace(/[\u0300-\u036f]/g, '').toLowerCase().replace(/ +$/, '');
+}
+
+/* alterações em tempo real: o servidor envia created/updated/deleted */
+
+function assinarAlteracoes(position){
+    if(eventSource || !window.EventSource) return;
+    const query = position ? `?last_event_id=${encodeURIComponent(position)}` : '';
+    eventSource = new EventSource(`/api/events${query}`);
+    ['created', 'updated', 'deleted'].forEach(tipo => {
+        eventSource.addEventListener(tipo, e => aplicarAlteracao(JSON.parse(e.data)));
     });
+    // eventos perdidos no servidor: recarrega a lista (GET condicional)
+    eventSource.addEventListener('reset', () => listarCarros());
+    // recusado (ex.: 503 sem vaga de stream): volta a atualizar por listagem e assina de novo na próxima
+    eventSource.onerror = () => {
+        if(eventSource && eventSource.readyState === EventSource.CLOSED) eventSource = null;
+    };
+}
+
+function atualizarAposEscrita(){
+    // com o stream ativo a alteração chega pelo /api/events
+    if(eventSource && eventSource.readyState !== EventSource.CLOSED) return;
+    listarCarros();
+}
+
+function aplicarAlteracao(evento){
+    if(!listaCache) return;
+    const chave = chaveModelo(evento.modelo);
+    const idx = listaCache.findIndex(c => chaveModelo(c.modelo) === chave);
+    let carro = null;
+    if(evento.action === 'deleted'){
+        if(idx >= 0) listaCache.splice(idx, 1);
+    } else if(idx >= 0){
+        carro = Object.assign({}, listaCache[idx]);
+        ['id', 'modelo', 'preco', 'image'].forEach(k => { if(k in evento) carro[k] = evento[k]; });
+        listaCache[idx] = carro;
+    } else if(evento.id != null){
+        carro = { id: evento.id, modelo: evento.modelo, preco: evento.preco, image: evento.image ?? null };
+        listaCache.push(carro);
+    } else {
+        return; // atualização de um modelo que não está na lista
+    }
+    if(exibindoLista) carrosData = listaCache;
+    atualizarCard(chave, carro);
+}
+
+function atualizarCard(chave, carro){
+    const container = document.getElementById('carros-container');
+    if(!container) return;
+    const atual = Array.from(container.children).find(el => el.dataset.key === chave);
+    if(!carro){
+        if(atual) atual.remove();
+        if(exibindoLista && listaCache.length === 0) renderCards(listaCache);
+    } else if(atual){
+        atual.replaceWith(cardElement(carro));
+    } else if(exibindoLista){
+        // a lista vazia mostra só a mensagem; os demais casos ganham um card no fim
+        if(listaCache.length === 1) renderCards(listaCache);
+        else container.appendChild(cardElement(carro));
+    }
+}
+
+// imagens com nome por hash (sha256.ext) têm variantes WebP thumb/card
+const HASHED_IMAGE = /^[0-9a-f]{64}\.[a-z0-9]+$/;
+
+function thumbImgHtml(carro){
+    const src = `/static/uploads/${carro.image}`;
+    const alt = escapeHtml(carro.modelo || 'imagem do carro');
+    if(!HASHED_IMAGE.test(carro.image)){
+        return `<img src="${escapeHtml(src)}" alt="${alt}" loading="lazy">`;
+    }
+    const stem = carro.image.replace(/\.[a-z0-9]+$/, '');
+    const srcset = `/static/uploads/${stem}.thumb.webp 160w, /static/uploads/${stem}.card.webp 480w`;
+    // se a variante ainda não foi gerada, volta para o original
+    return `<img src="${escapeHtml(src)}" srcset="${escapeHtml(srcset)}" sizes="76px" alt="${alt}" loading="lazy" decoding="async" onerror="if(this.srcset){this.removeAttribute('srcset');this.src=this.src;}">`;
 }
 
 function escapeHtml(str){
     return String(str).replace(/[&<>"']/g, function(m){ return ({'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;',"'":'&#39;'})[m]; });
 }
 
-// busca client-side: filtra carro por modelo ou id
-function filterByQuery(q){
-    const ql = (q || '').toLowerCase().trim();
-    if(!ql) return carrosData;
-    return carrosData.filter(c => {
-        const modelo = String(c.modelo || '').toLowerCase();
-        const id = String(c.id || '');
-        return modelo.includes(ql) || id.includes(ql);
-    });
+// busca no servidor (/api/searchCarros) por modelo ou id
+let searchController = null;
+
+function searchCarros(q){
+    const query = (q || '').trim();
+    if(searchController) searchController.abort();
+    if(!query){
+        searchController = null;
+        exibindoLista = Boolean(listaCache);
+        renderCards(listaCache || carrosData);
+        return;
+    }
+    searchController = new AbortController();
+    fetch(`/api/searchCarros?q=${encodeURIComponent(query)}`, { signal: searchController.signal })
+        .then(response => {
+            if (!response.ok) throw new Error(`Erro na busca: ${response.status}`);
+            return response.json();
+        })
+        .then(data => { exibindoLista = false; renderCards(Array.isArray(data) ? data : []); })
+        .catch(error => { if (error.name !== 'AbortError') console.error('Erro ao buscar carros:', error); });
 }
 
 // debounce util
@@ -252,9 +363,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const search = document.getElementById('search');
     if(search){
         search.addEventListener('input', debounce(function(e){
-            const q = e.target.value;
-            const filtered = filterByQuery(q);
-            renderCards(filtered);
+            searchCarros(e.target.value);
         }, 180));
     }
 });
\ No newline at end of file
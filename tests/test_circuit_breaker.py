@@ -0,0 +1,132 @@
+"""Transições do circuit breaker com o relógio monotônico controlado pelo teste"""
+
+import pytest
+
+import resilience
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, 'monotonic', clock)
+    return clock
+
+
+def calls(breaker, *results):
+    for ok in results:
+        breaker.allow()
+        breaker.record(ok)
+
+
+def trip(breaker):
+    calls(breaker, *[False] * breaker.min_calls)
+    assert breaker.stats()['state'] == OPEN
+
+
+def test_opens_only_after_min_calls(clock):
+    breaker = CircuitBreaker(failure_rate=0.5, min_calls=4, window=10.0, open_seconds=5.0)
+    calls(breaker, False, False, False)
+    assert breaker.stats()['state'] == CLOSED
+    calls(breaker, False)
+    assert breaker.stats()['state'] == OPEN
+    assert breaker.is_open()
+    with pytest.raises(CircuitOpen) as info:
+        breaker.allow()
+    assert info.value.retry_after == 5
+    assert breaker.stats()['rejected'] == 1
+
+
+def test_failure_rate_threshold(clock):
+    breaker = CircuitBreaker(failure_rate=0.5, min_calls=4, window=10.0)
+    calls(breaker, True, True, True, False, False)
+    # 2 de 5: abaixo de 50%
+    assert breaker.stats()['state'] == CLOSED
+    calls(breaker, False)
+    # 3 de 6: atinge 50%
+    assert breaker.stats()['state'] == OPEN
+
+
+def test_successes_do_not_open_and_ignored_results_do_not_count(clock):
+    breaker = CircuitBreaker(failure_rate=0.5, min_calls=2)
+    calls(breaker, None, None, None, False)
+    assert breaker.stats()['calls'] == 1
+    assert breaker.stats()['state'] == CLOSED
+
+
+def test_failures_outside_the_window_are_forgotten(clock):
+    breaker = CircuitBreaker(failure_rate=0.5, min_calls=4, window=10.0)
+    calls(breaker, False, False, False)
+    clock.now += 11
+    calls(breaker, False)
+    assert breaker.stats()['state'] == CLOSED
+    assert breaker.stats()['calls'] == 1
+
+
+def test_half_open_lets_one_probe_through_and_closes_on_success(clock):
+    breaker = CircuitBreaker(min_calls=2, open_seconds=5.0)
+    trip(breaker)
+    clock.now += 4.5
+    assert breaker.retry_after() == 1
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+
+    clock.now += 0.5
+    assert not breaker.is_open()
+    breaker.allow()
+    assert breaker.stats()['state'] == HALF_OPEN
+    assert breaker.is_open()
+    # só uma chamada de teste por vez
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+    breaker.record(True)
+    assert breaker.stats()['state'] == CLOSED
+    assert breaker.stats()['calls'] == 0
+    calls(breaker, True)
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker(min_calls=2, open_seconds=5.0)
+    trip(breaker)
+    clock.now += 5
+    breaker.allow()
+    breaker.record(False)
+    stats = breaker.stats()
+    assert (stats['state'], stats['opens'], stats['retry_after']) == (OPEN, 2, 5)
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+
+
+def test_inconclusive_probe_frees_the_next_one(clock):
+    breaker = CircuitBreaker(min_calls=2, open_seconds=5.0)
+    trip(breaker)
+    clock.now += 5
+    breaker.allow()
+    breaker.record(None)
+    assert breaker.stats()['state'] == HALF_OPEN
+    breaker.allow()
+    breaker.record(True)
+    assert breaker.stats()['state'] == CLOSED
+
+
+def test_late_results_while_open_are_ignored(clock):
+    breaker = CircuitBreaker(min_calls=2, open_seconds=5.0)
+    trip(breaker)
+    # chamadas liberadas antes de abrir terminando agora
+    breaker.record(True)
+    assert breaker.stats()['state'] == OPEN
+
+
+def test_disabled_never_opens(clock):
+    breaker = CircuitBreaker(min_calls=1, enabled=False)
+    calls(breaker, False, False, False)
+    assert not breaker.is_open()
+    breaker.allow()
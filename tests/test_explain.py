@@ -0,0 +1,90 @@
+"""
+Planos (EXPLAIN) das consultas do catálogo e do histórico de preços
+
+Precisa de um MySQL, configurado pelas mesmas variáveis do app (DB_HOST,
+DB_PORT, DB_USER, DB_PASSWORD, DB_NAME): cria o banco <DB_NAME>_explain,
+aplica as migrações e carrega linhas suficientes para o otimizador preferir
+os índices. Sem banco os testes são pulados.
+
+    python -m pytest tests/test_explain.py
+"""
+
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('mysql.connector')
+
+import mysql.connector
+
+import catalog
+import migrations
+import price_history
+
+ROWS = 20000
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': int(os.environ.get('DB_PORT', 3306)),
+    'user': os.environ.get('DB_USER', 'root'),
+    'password': os.environ.get('DB_PASSWORD', 'root'),
+    'charset': 'utf8mb4',
+    'collation': 'utf8mb4_unicode_ci',
+    'connection_timeout': 5,
+}
+TEST_DB = f"{os.environ.get('DB_NAME', 'carros')}_explain"
+
+
+@pytest.fixture(scope='module')
+def connection():
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+    except mysql.connector.Error as e:
+        pytest.skip(f"MySQL indisponível: {e}")
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP DATABASE IF EXISTS `{TEST_DB}`")
+        cursor.execute(f"CREATE DATABASE `{TEST_DB}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+        cursor.execute(f"USE `{TEST_DB}`")
+        migrations.apply_migrations(conn, log=lambda message: None)
+        # updated_at de 2023 a 2025; o trigger de INSERT grava um ponto do histórico por carro
+        rng = random.Random(1)
+        start = datetime(2023, 1, 1)
+        rows = [(f"Carro {i:06d}", round(rng.uniform(20000, 2000000), 2), start + timedelta(hours=i))
+                for i in range(ROWS)]
+        for i in range(0, ROWS, 1000):
+            cursor.executemany("INSERT INTO carro (modelo, preco, updated_at) VALUES (%s, %s, %s)",
+                               rows[i:i + 1000])
+        conn.commit()
+        cursor.execute("ANALYZE TABLE carro, carro_preco_historico")
+        cursor.fetchall()
+        yield conn
+    finally:
+        cursor.execute(f"DROP DATABASE IF EXISTS `{TEST_DB}`")
+        cursor.close()
+        conn.close()
+
+
+@pytest.fixture(scope='module')
+def plans(connection):
+    return {name: (ok, expected, plan) for name, ok, expected, plan in catalog.check_plans(connection)}
+
+
+@pytest.mark.parametrize('name', [name for name, _, _ in catalog.EXPLAIN_CASES])
+def test_catalog_uses_index(plans, name):
+    ok, expected, plan = plans[name]
+    assert ok, f"{name}: esperado {expected} sem filesort, plano {plan}"
+
+
+def test_price_history_uses_index(connection):
+    query = {'modelos': ['Carro 000010', 'Carro 000020'], 'start': 0, 'end': time.time(), 'bucket': 86400}
+    sql, params = price_history.build_sql(query)
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(f"EXPLAIN {sql}", params)
+        plan = cursor.fetchall()
+    finally:
+        cursor.close()
+    assert plan[0]['key'] == 'idx_modelo_changed', plan
@@ -0,0 +1,146 @@
+"""Token buckets, limite de requisições em andamento e controle de admissão"""
+
+import os
+
+import pytest
+
+import rate_limit
+from rate_limit import AdmissionControl, InFlight, Rejected, TokenBuckets, parse_limit, parse_routes
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, 'monotonic', clock)
+    return clock
+
+
+def test_parse_limit():
+    assert parse_limit('5/s:10') == (5.0, 10.0)
+    assert parse_limit('10/m') == (10 / 60, 10.0)
+    assert parse_limit('1/h') == (1 / 3600, 1.0)
+    assert parse_limit('off') is None
+    for spec in ('5', '5/d', '0/s', '5/s:0'):
+        with pytest.raises(ValueError):
+            parse_limit(spec)
+    assert parse_routes('/a=5/s:10, /b=off') == {'/a': (5.0, 10.0), '/b': None}
+
+
+def test_burst_then_refill(clock):
+    buckets = TokenBuckets(slots=16)
+    assert [buckets.take('c', 1.0, 3.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert buckets.take('c', 1.0, 3.0) == pytest.approx(1.0)
+    clock.now += 0.5
+    assert buckets.take('c', 1.0, 3.0) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert buckets.take('c', 1.0, 3.0) == 0.0
+    # parado por muito tempo: volta só até a rajada
+    clock.now += 3600
+    assert [buckets.take('c', 1.0, 3.0) for _ in range(4)][-1] == pytest.approx(1.0)
+
+
+def test_buckets_are_per_key(clock):
+    buckets = TokenBuckets(slots=16)
+    assert buckets.take('a', 1.0, 1.0) == 0.0
+    assert buckets.take('a', 1.0, 1.0) > 0
+    assert buckets.take('b', 1.0, 1.0) == 0.0
+
+
+def test_negative_cost_refunds(clock):
+    buckets = TokenBuckets(slots=16)
+    buckets.take('c', 1.0, 1.0)
+    assert buckets.take('c', 1.0, 1.0) > 0
+    buckets.take('c', 1.0, 1.0, cost=-1.0)
+    assert buckets.take('c', 1.0, 1.0) == 0.0
+
+
+def test_route_limits_and_default(clock):
+    admission = AdmissionControl((10.0, 10.0), {'/heavy': (1 / 60, 1.0), '/free': None})
+    admission.admit('/heavy', 'ip:1', track=False)
+    with pytest.raises(Rejected) as info:
+        admission.admit('/heavy', 'ip:1', track=False)
+    assert (info.value.status, info.value.reason, info.value.retry_after) == (429, rate_limit.RATE_LIMITED, 60)
+    # outro cliente e outra rota têm os próprios buckets
+    admission.admit('/heavy', 'ip:2', track=False)
+    for _ in range(10):
+        admission.admit('/light', 'ip:1', track=False)
+    with pytest.raises(Rejected):
+        admission.admit('/light', 'ip:1', track=False)
+    for _ in range(100):
+        admission.admit('/free', 'ip:1', track=False)
+    assert admission.stats()['rejected'] == {rate_limit.RATE_LIMITED: 2, rate_limit.OVERLOADED: 0}
+
+
+def test_disabled_skips_buckets_but_keeps_in_flight(clock):
+    admission = AdmissionControl((1 / 60, 1.0), {}, max_in_flight=1, enabled=False)
+    admission.admit('/x', 'ip:1', track=False)
+    admission.admit('/x', 'ip:1')
+    with pytest.raises(Rejected) as info:
+        admission.admit('/x', 'ip:1')
+    assert info.value.status == 503
+
+
+def test_refund_returns_the_token(clock):
+    admission = AdmissionControl((1 / 60, 1.0), {})
+    admission.admit('/x', 'ip:1', track=False)
+    admission.refund('/x', 'ip:1')
+    admission.admit('/x', 'ip:1', track=False)
+    with pytest.raises(Rejected):
+        admission.admit('/x', 'ip:1', track=False)
+
+
+def test_in_flight_limit(clock):
+    rejected = []
+    admission = AdmissionControl(None, {}, max_in_flight=2,
+                                 on_reject=lambda route, reason: rejected.append((route, reason)))
+    admission.admit('/x', 'ip:1')
+    admission.admit('/x', 'ip:1')
+    with pytest.raises(Rejected) as info:
+        admission.admit('/x', 'ip:1')
+    assert (info.value.status, info.value.reason) == (503, rate_limit.OVERLOADED)
+    assert rejected == [('/x', rate_limit.OVERLOADED)]
+    admission.done()
+    admission.admit('/x', 'ip:1')
+    assert admission.stats()['in_flight'] == 2
+
+
+def test_client_id():
+    admission = AdmissionControl(None, {}, api_keys=('segredo',), proxy_hops=1)
+    key_id = admission.client_id('segredo', '10.0.0.1')
+    assert key_id.startswith('key:') and 'segredo' not in key_id
+    # chave desconhecida não escapa do limite por IP
+    assert admission.client_id('inventada', '10.0.0.1') == 'ip:10.0.0.1'
+    assert admission.client_id(None, '10.0.0.1', '1.1.1.1, 2.2.2.2') == 'ip:2.2.2.2'
+    assert admission.client_id(None, '10.0.0.1') == 'ip:10.0.0.1'
+
+    two_hops = AdmissionControl(None, {}, proxy_hops=2)
+    assert two_hops.client_id(None, '10.0.0.1', 'forjado, 1.1.1.1, 2.2.2.2') == 'ip:1.1.1.1'
+    assert two_hops.client_id(None, '10.0.0.1', '2.2.2.2') == 'ip:10.0.0.1'
+
+    direct = AdmissionControl(None, {})
+    assert direct.client_id(None, '10.0.0.1', '1.1.1.1') == 'ip:10.0.0.1'
+
+
+def test_release_process_discounts_dead_worker():
+    in_flight = InFlight(limit=10)
+    in_flight.enter()
+    pid = os.fork()
+    if pid == 0:
+        # worker que morre com duas requisições em andamento
+        in_flight.enter()
+        in_flight.enter()
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert in_flight.value == 3
+    in_flight.release_process(pid)
+    assert in_flight.value == 1
+    in_flight.leave()
+    assert in_flight.value == 0
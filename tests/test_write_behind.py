@@ -0,0 +1,181 @@
+"""Fila write-behind sobre um journal SQLite temporário, sem MySQL"""
+
+import threading
+
+import pytest
+
+import write_behind
+from write_behind import WriteBehindQueue
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeApply:
+    """apply_batch falso: registra os lotes e responde como o app"""
+
+    def __init__(self, existing=None, error=None):
+        self.existing = existing
+        self.error = error
+        self.batches = []
+
+    def __call__(self, items):
+        self.batches.append(items)
+        if self.error is not None:
+            raise self.error
+        return {chave: 'applied' if self.existing is None or modelo in self.existing else 'not_found'
+                for chave, modelo, _ in items}
+
+
+def _in_flusher_thread():
+    # a thread de flush fica parada: os testes chamam flush() na thread principal
+    return threading.current_thread().name == 'write-behind'
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(write_behind.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def make_queue(tmp_path, clock):
+    queues = []
+
+    def make(apply_batch, **options):
+        queue = WriteBehindQueue(str(tmp_path / 'journal.db'), apply_batch, paused=_in_flusher_thread,
+                                 **options)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.stop()
+
+
+def status_of(queue, ticket):
+    return queue.status([ticket])[0]
+
+
+def test_enqueue_supersedes_queued_ticket_of_same_modelo(make_queue, clock):
+    apply = FakeApply()
+    queue = make_queue(apply)
+    first = queue.enqueue('Civic', 100.0)
+    clock.now += 1
+    second = queue.enqueue('CIVIC', 200.0)
+    other = queue.enqueue('Onix', 50.0)
+
+    assert status_of(queue, first)['status'] == 'superseded'
+    assert status_of(queue, first)['superseded_by'] == second
+    assert queue.flush() == 2
+    assert apply.batches == [[('civic', 'CIVIC', 200.0), ('onix', 'Onix', 50.0)]]
+    assert status_of(queue, second)['status'] == 'applied'
+    assert status_of(queue, other)['status'] == 'applied'
+    assert queue.flush() == 0
+
+
+def test_missing_modelo_is_not_found(make_queue):
+    queue = make_queue(FakeApply(existing={'Civic'}))
+    found = queue.enqueue('Civic', 100.0)
+    missing = queue.enqueue('Fusca', 10.0)
+    queue.flush()
+    assert status_of(queue, found)['status'] == 'applied'
+    assert status_of(queue, missing)['status'] == 'not_found'
+
+
+def test_failed_batch_is_retried_until_max_attempts(make_queue):
+    apply = FakeApply(error=RuntimeError('banco fora'))
+    queue = make_queue(apply, max_attempts=3)
+    ticket = queue.enqueue('Civic', 100.0)
+
+    for attempts in (1, 2):
+        assert queue.flush() == 0
+        item = status_of(queue, ticket)
+        assert (item['status'], item['attempts']) == ('queued', attempts)
+    queue.flush()
+    item = status_of(queue, ticket)
+    assert (item['status'], item['attempts'], item['error']) == ('failed', 3, 'banco fora')
+    assert len(apply.batches) == 3
+    assert queue.flush() == 0
+
+
+def test_expired_lease_is_reclaimed(make_queue, clock):
+    apply = FakeApply()
+    queue = make_queue(apply, lease=60.0)
+    ticket = queue.enqueue('Civic', 100.0)
+    # um worker reservou o lote e morreu antes de terminar
+    assert [row['id'] for row in queue._claim()] == [ticket]
+    assert status_of(queue, ticket)['status'] == 'flushing'
+
+    clock.now += 59
+    assert queue.flush() == 0
+    assert apply.batches == []
+
+    clock.now += 2
+    assert queue.flush() == 1
+    assert status_of(queue, ticket)['status'] == 'applied'
+
+
+def test_modelo_being_flushed_waits_for_the_running_batch(make_queue, clock):
+    apply = FakeApply()
+    queue = make_queue(apply)
+    first = queue.enqueue('Civic', 100.0)
+    rows = queue._claim()
+    clock.now += 1
+    second = queue.enqueue('Civic', 200.0)
+
+    # o ticket em flush não é substituído e o novo espera o lote terminar
+    assert status_of(queue, first)['status'] == 'flushing'
+    assert queue.flush() == 0
+
+    # o lote falhou: o ticket antigo volta para a fila e perde para o mais novo
+    queue._finish(rows, None, error=RuntimeError('timeout'))
+    assert queue.flush() == 1
+    assert apply.batches == [[('civic', 'Civic', 200.0)]]
+    assert status_of(queue, first)['status'] == 'superseded'
+    assert status_of(queue, first)['superseded_by'] == second
+    assert status_of(queue, second)['status'] == 'applied'
+
+
+def test_finish_ignores_tickets_no_longer_flushing(make_queue, clock):
+    queue = make_queue(FakeApply(), lease=60.0)
+    ticket = queue.enqueue('Civic', 100.0)
+    stale_rows = queue._claim()
+    clock.now += 61
+    # outro worker recuperou o lease e aplicou
+    assert queue.flush() == 1
+    queue._finish(stale_rows, None, error=RuntimeError('atrasado'))
+    item = status_of(queue, ticket)
+    assert (item['status'], item['attempts']) == ('applied', 0)
+
+
+def test_batch_size_limits_claim(make_queue):
+    apply = FakeApply()
+    queue = make_queue(apply, batch_size=2)
+    for modelo in ('A', 'B', 'C'):
+        queue.enqueue(modelo, 1.0)
+    assert queue.flush() == 2
+    assert queue.flush() == 1
+    assert [len(batch) for batch in apply.batches] == [2, 1]
+
+
+def test_prune_removes_only_old_terminal_tickets(make_queue, clock):
+    queue = make_queue(FakeApply(), retention=3600.0)
+    old = queue.enqueue('Civic', 100.0)
+    queue.flush()
+    clock.now += 3000
+    recent = queue.enqueue('Onix', 50.0)
+    queue.flush()
+    pending = queue.enqueue('Gol', 30.0)
+
+    clock.now += 700
+    queue._last_prune = 0.0
+    queue._prune()
+    assert queue.status([old, recent, pending]) == [status_of(queue, recent), status_of(queue, pending)]
+    assert queue.stats()['tickets'] == {'applied': 1, 'queued': 1}
@@ -0,0 +1,274 @@
+"""
+Fila write-behind para atualizações de preço
+
+Com WRITE_BEHIND=1 o updateCarro só grava a intenção num journal SQLite
+local (compartilhado pelos workers) e responde 202 com um ticket. Uma thread
+por worker junta as atualizações pendentes e aplica no MySQL em lote quando
+a fila atinge batch_size ou a cada interval segundos. Por modelo vale só a
+última escrita: tickets anteriores ainda não aplicados ficam 'superseded'.
+
+Estados do ticket: queued, flushing, superseded, applied, not_found, failed.
+O journal sobrevive ao restart do worker; tickets presos em 'flushing' por
+um worker que morreu voltam para a fila quando o lease expira.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from cache import normalize_modelo
+
+TERMINAL = ('superseded', 'applied', 'not_found', 'failed')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    id TEXT PRIMARY KEY,
+    chave TEXT NOT NULL,
+    modelo TEXT NOT NULL,
+    preco REAL NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    superseded_by TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claimed_at REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tickets_status ON tickets (status, chave);
+CREATE INDEX IF NOT EXISTS idx_tickets_updated ON tickets (updated_at);
+"""
+
+
+class WriteBehindQueue:
+    """Journal de tickets e flusher em segundo plano"""
+
+    def __init__(self, path, apply_batch, batch_size=500, interval=0.5,
+                 max_attempts=5, lease=60.0, retention=3600.0, paused=None):
+        # apply_batch([(chave, modelo, preco)]) -> {chave: 'applied' | 'not_found'}
+        self.path = path
+        self.apply_batch = apply_batch
+        # paused() -> True adia o flush (ex.: banco indisponível)
+        self.paused = paused
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.retention = retention
+        self._local = threading.local()
+        self._pid = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._last_prune = 0.0
+        self.flushes = 0
+        self.flushed = 0
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _db(self):
+        """Conexão SQLite da thread atual (refeita depois do fork)"""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.conn = self._connect()
+            local.pid = os.getpid()
+        return local.conn
+
+    def start(self):
+        """Garante a thread de flush neste processo (barato se já está rodando)"""
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._pid = os.getpid()
+            self._wakeup = threading.Event()
+            self._stopping = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Para a thread depois de um último flush"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def enqueue(self, modelo, preco):
+        """Registra a atualização e retorna o id do ticket"""
+        ticket = uuid.uuid4().hex
+        chave = normalize_modelo(modelo)
+        now = time.time()
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute(
+                "UPDATE tickets SET status = 'superseded', superseded_by = ?, updated_at = ? "
+                "WHERE chave = ? AND status = 'queued'",
+                (ticket, now, chave),
+            )
+            db.execute(
+                "INSERT INTO tickets (id, chave, modelo, preco, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (ticket, chave, modelo, preco, now, now),
+            )
+            pending = db.execute("SELECT COUNT(*) FROM tickets WHERE status = 'queued'").fetchone()[0]
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        self.start()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+        return ticket
+
+    def status(self, tickets):
+        """Estado de cada ticket conhecido, na ordem pedida"""
+        if not tickets:
+            return []
+        placeholders = ', '.join('?' * len(tickets))
+        rows = self._db().execute(
+            "SELECT id, modelo, preco, status, error, superseded_by, attempts, created_at, updated_at "
+            f"FROM tickets WHERE id IN ({placeholders})",
+            list(tickets),
+        ).fetchall()
+        by_id = {row['id']: row for row in rows}
+        result = []
+        for ticket in tickets:
+            row = by_id.get(ticket)
+            if row:
+                item = dict(row)
+                item['ticket'] = item.pop('id')
+                result.append(item)
+        return result
+
+    def _claim(self):
+        """Reserva um lote de tickets pendentes (um por modelo) para este worker"""
+        now = time.time()
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            # leases vencidos: o worker que reservou morreu no meio do flush
+            db.execute(
+                "UPDATE tickets SET status = 'queued', claimed_at = NULL "
+                "WHERE status = 'flushing' AND claimed_at < ?",
+                (now - self.lease,),
+            )
+            # modelos com flush em andamento ficam para depois (mantém a ordem)
+            rows = db.execute(
+                "SELECT id, chave, modelo, preco, attempts FROM tickets "
+                "WHERE status = 'queued' AND chave NOT IN "
+                "(SELECT chave FROM tickets WHERE status = 'flushing') "
+                "ORDER BY created_at LIMIT ?",
+                (self.batch_size,),
+            ).fetchall()
+            # um ticket que voltou de uma falha pode ter um mais novo do mesmo modelo
+            latest = {row['chave']: row for row in rows}
+            superseded = [(latest[row['chave']]['id'], now, row['id'])
+                          for row in rows if latest[row['chave']] is not row]
+            rows = list(latest.values())
+            if superseded:
+                db.executemany(
+                    "UPDATE tickets SET status = 'superseded', superseded_by = ?, updated_at = ? WHERE id = ?",
+                    superseded,
+                )
+            if rows:
+                db.executemany(
+                    "UPDATE tickets SET status = 'flushing', claimed_at = ? WHERE id = ?",
+                    [(now, row['id']) for row in rows],
+                )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return rows
+
+    def _finish(self, rows, outcomes, error=None):
+        now = time.time()
+        updates = []
+        for row in rows:
+            if error is None:
+                status, message, attempts = outcomes.get(row['chave'], 'not_found'), None, row['attempts']
+            else:
+                attempts = row['attempts'] + 1
+                status = 'failed' if attempts >= self.max_attempts else 'queued'
+                message = str(error)
+            updates.append((status, message, attempts, now, row['id']))
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany(
+                "UPDATE tickets SET status = ?, error = ?, attempts = ?, claimed_at = NULL, "
+                "updated_at = ? WHERE id = ? AND status = 'flushing'",
+                updates,
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def flush(self):
+        """Aplica um lote pendente; retorna quantos tickets foram processados"""
+        if self.paused is not None and self.paused():
+            return 0
+        rows = self._claim()
+        if not rows:
+            return 0
+        try:
+            outcomes = self.apply_batch([(row['chave'], row['modelo'], row['preco']) for row in rows])
+        except Exception as e:
+            print(f"Erro ao aplicar lote write-behind: {e}")
+            self._finish(rows, None, error=e)
+            return 0
+        self._finish(rows, outcomes)
+        self.flushes += 1
+        self.flushed += len(rows)
+        return len(rows)
+
+    def _prune(self):
+        now = time.time()
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        self._db().execute(
+            f"DELETE FROM tickets WHERE status IN ({', '.join('?' * len(TERMINAL))}) AND updated_at < ?",
+            (*TERMINAL, now - self.retention),
+        )
+
+    def _run(self):
+        while True:
+            stopping = self._stopping.is_set()
+            try:
+                # esvazia enquanto houver lotes cheios
+                while self.flush() >= self.batch_size:
+                    pass
+                self._prune()
+            except Exception as e:
+                print(f"Erro no flusher write-behind: {e}")
+            if stopping:
+                return
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def stats(self):
+        """Contagem de tickets por estado e totais deste processo"""
+        rows = self._db().execute("SELECT status, COUNT(*) FROM tickets GROUP BY status").fetchall()
+        return {
+            'tickets': {status: total for status, total in rows},
+            'flushes': self.flushes,
+            'flushed': self.flushed,
+            'batch_size': self.batch_size,
+            'interval': self.interval,
+        }